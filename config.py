@@ -24,6 +24,21 @@ DEFAULT_CANNY_THRESHOLD2 = 255
 #
 RULER_SPACING = 25  # 标尺间距（像素）
 
+# 模板匹配金字塔层数（-1 表示自动，0 表示原分辨率整图匹配）
+DEFAULT_PYRAMID_LEVELS = -1
+MAX_PYRAMID_LEVELS = 6
+
+# 位姿（旋转/缩放）搜索步长
+POSE_ANGLE_STEP = 5.0
+POSE_SCALE_STEP = 0.05
+
+# 实时预览防抖时间（毫秒）
+LIVE_PREVIEW_DEBOUNCE_MS = 200
+
+# 算子剖析：跟踪文件（JSONL，None 表示不写）和是否统计峰值内存（tracemalloc 有明显开销）
+OPERATOR_TRACE_FILE = None
+PROFILE_MEMORY = False
+
 # 日志栏高度
 STATS_PANEL_HEIGHT = 300
 
@@ -3,6 +3,10 @@
 """
 
 from .operators import OPERATORS, MorphologyOperator, EdgeDetectionOperator, ContourOperator, SkeletonOperator, DistanceOperator, TemplateMatchingOperator
+from .cache import CACHED_OPERATORS, RESULT_CACHE, OperatorCache
+from .tiling import tiled_apply
+from .template_matching import TemplateBank
+from .profiling import PROFILER, OperatorProfiler, instrument_registry, stage
 
 __all__ = [
     "OPERATORS",
@@ -11,5 +15,14 @@ __all__ = [
     "ContourOperator",
     "SkeletonOperator",
     "DistanceOperator",
-    "TemplateMatchingOperator"
+    "TemplateMatchingOperator",
+    "CACHED_OPERATORS",
+    "RESULT_CACHE",
+    "OperatorCache",
+    "tiled_apply",
+    "TemplateBank",
+    "PROFILER",
+    "OperatorProfiler",
+    "instrument_registry",
+    "stage"
 ]
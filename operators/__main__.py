@@ -0,0 +1,27 @@
+"""
+命令行入口
+用法: python -m operators <子命令> ...
+"""
+
+import argparse
+import sys
+
+from . import batch, benchmark, search
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="python -m operators", description="OpenCV算子命令行工具")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    batch.add_parser(subparsers)
+    benchmark.add_parser(subparsers)
+    search.add_parser(subparsers)
+    return parser
+
+
+def main(argv=None) -> int:
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
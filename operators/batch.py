@@ -0,0 +1,283 @@
+"""
+批处理
+用进程池把 OPERATORS 中的算子批量应用到图像目录，
+结果图像和统计信息（JSONL/CSV）由独立的写入线程输出
+"""
+
+import ast
+import csv
+import json
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from collections import Counter
+from functools import partial
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .image_io import collect_inputs, encode_image, read_image
+from .operators import OPERATORS
+from .tiling import supports_tiling, tiled_apply
+
+
+def resolve_operator(op_path: str) -> Callable:
+    """按 "分类/算子" 路径查找算子，例如 "形态学操作/腐蚀" """
+    category, sep, op_name = op_path.partition("/")
+    if not sep or category not in OPERATORS or op_name not in OPERATORS[category]:
+        available = ", ".join(f"{c}/{n}" for c, ops in OPERATORS.items() for n in ops)
+        raise ValueError(f"未知算子: {op_path}（可用: {available}）")
+    return OPERATORS[category][op_name]
+
+
+def parse_params(items: List[str]) -> Dict[str, Any]:
+    """解析 key=value 形式的参数，值按 Python 字面量解析，失败时保留为字符串"""
+    params = {}
+    for item in items or []:
+        key, sep, value = item.partition("=")
+        if not sep or not key:
+            raise ValueError(f"参数格式应为 key=value: {item}")
+        try:
+            params[key] = ast.literal_eval(value)
+        except (ValueError, SyntaxError):
+            params[key] = value
+    return params
+
+
+def to_jsonable(value: Any) -> Any:
+    """把统计信息中的 numpy 类型转换为 JSON 可序列化的值"""
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, dict):
+        return {k: to_jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_jsonable(v) for v in value]
+    return value
+
+
+# ===== 工作进程 =====
+
+_worker_state = {}
+
+
+def _init_worker(op_path: str, params: Dict[str, Any], output_ext: str, tile_size: Optional[int] = None):
+    """工作进程初始化：解析算子并限制 OpenCV 内部线程，避免与进程池争抢核心"""
+    cv2.setNumThreads(1)
+    func = resolve_operator(op_path)
+    if tile_size and supports_tiling(func):
+        # 大图分块处理，进程内单线程执行以限制峰值内存
+        params = dict(params, tile_size=tile_size, workers=1)
+        func = partial(tiled_apply, func)
+    _worker_state["func"] = func
+    _worker_state["params"] = params
+    _worker_state["ext"] = output_ext
+
+
+def _process_one(path: str) -> Dict[str, Any]:
+    """处理单个文件，返回统计记录和编码后的结果图像"""
+    record = {"file": path, "status": "ok"}
+    start = time.perf_counter()
+    try:
+        image = read_image(path)
+        result, stats = _worker_state["func"](image, **_worker_state["params"])
+        record["stats"] = to_jsonable(stats)
+        record["data"] = encode_image(result, _worker_state["ext"])
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = str(e)
+    record["time_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return record
+
+
+# ===== 写入线程 =====
+
+class ResultWriter(threading.Thread):
+    """独立写入线程：保存结果图像并追加统计记录"""
+
+    CSV_FIELDS = ["file", "output", "status", "time_ms", "error", "stats"]
+
+    def __init__(self, output_dir: str, input_root: str, output_ext: str,
+                 stats_path: Optional[str], stats_format: str = "jsonl", max_pending: int = 256,
+                 inputs: Sequence[str] = ()):
+        super().__init__(daemon=True)
+        self.output_dir = output_dir
+        self.input_root = input_root
+        self.output_ext = output_ext
+        # 去掉扩展名后同名的输入（a.png 与 a.npy），输出时保留原扩展名
+        stems = Counter(os.path.splitext(self._relative(path))[0] for path in inputs)
+        self.ambiguous = {stem for stem, count in stems.items() if count > 1}
+        # 已写出的结果路径 -> 输入文件
+        self.claimed = {}
+        self.stats_path = stats_path
+        self.stats_format = stats_format
+        self.queue = queue.Queue(maxsize=max_pending)
+        self.written = 0
+        self.failed = 0
+        self.error = None
+
+    def _relative(self, path: str) -> str:
+        rel = os.path.relpath(path, self.input_root) if self.input_root else os.path.basename(path)
+        if rel.startswith(os.pardir):
+            rel = os.path.basename(path)
+        return rel
+
+    def output_path(self, path: str) -> str:
+        """结果文件路径：保持输入的相对目录结构，替换扩展名
+
+        多个输入只有扩展名不同时保留原扩展名（a.png -> a.png.png，a.npy -> a.npy.png），避免互相覆盖
+        """
+        rel = self._relative(path)
+        stem = os.path.splitext(rel)[0]
+        if stem in self.ambiguous:
+            stem = rel
+        return os.path.join(self.output_dir, stem + self.output_ext)
+
+    def put(self, record: Dict[str, Any]):
+        self.queue.put(record)
+
+    def close(self):
+        """发送结束标记并等待写入完成"""
+        self.queue.put(None)
+        self.join()
+        if self.error is not None:
+            raise self.error
+
+    def run(self):
+        stats_file = None
+        csv_writer = None
+        try:
+            if self.stats_path:
+                stats_file = open(self.stats_path, "w", encoding="utf-8", newline="")
+                if self.stats_format == "csv":
+                    csv_writer = csv.DictWriter(stats_file, fieldnames=self.CSV_FIELDS)
+                    csv_writer.writeheader()
+            while True:
+                record = self.queue.get()
+                if record is None:
+                    break
+                self._write_record(record, stats_file, csv_writer)
+        except Exception as e:
+            self.error = e
+            # 继续取走剩余记录，避免生产者阻塞
+            while self.queue.get() is not None:
+                pass
+        finally:
+            if stats_file is not None:
+                stats_file.close()
+
+    def _write_record(self, record, stats_file, csv_writer):
+        data = record.pop("data", None)
+        out_path = self.output_path(record["file"]) if data is not None else None
+        if out_path in self.claimed:
+            # 输入根目录之外的同名文件等仍然冲突时不覆盖已写出的结果
+            record["status"] = "error"
+            record["error"] = f"输出文件 {out_path} 与 {self.claimed[out_path]} 的结果冲突"
+            data = None
+        if data is not None:
+            self.claimed[out_path] = record["file"]
+            os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+            with open(out_path, "wb") as f:
+                f.write(data)
+            record["output"] = out_path
+            self.written += 1
+        else:
+            self.failed += 1
+        if stats_file is None:
+            return
+        if csv_writer is not None:
+            row = {k: record.get(k, "") for k in self.CSV_FIELDS}
+            row["stats"] = json.dumps(record.get("stats", {}), ensure_ascii=False)
+            csv_writer.writerow(row)
+        else:
+            stats_file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+
+# ===== 批处理入口 =====
+
+def default_chunksize(n_items: int, workers: int) -> int:
+    """任务分块大小：每个工作进程约分到 4 块，单块不超过 64 个文件"""
+    return max(1, min(64, n_items // (workers * 4)))
+
+
+def run_batch(inputs: List[str], op_path: str, params: Dict[str, Any], output_dir: str,
+              input_root: str = "", workers: Optional[int] = None, chunksize: Optional[int] = None,
+              stats_path: Optional[str] = None, stats_format: str = "jsonl",
+              output_ext: str = ".png", tile_size: Optional[int] = None) -> Dict[str, Any]:
+    """批量处理图像文件，返回汇总信息
+
+    tile_size 不为空时，支持分块的算子按该图块大小分块处理
+    """
+    resolve_operator(op_path)  # 提前检查算子路径
+    workers = workers or os.cpu_count() or 1
+    chunksize = chunksize or default_chunksize(len(inputs), workers)
+    os.makedirs(output_dir, exist_ok=True)
+
+    writer = ResultWriter(output_dir, input_root, output_ext, stats_path, stats_format, inputs=inputs)
+    writer.start()
+    start = time.perf_counter()
+    try:
+        with multiprocessing.Pool(workers, initializer=_init_worker,
+                                  initargs=(op_path, params, output_ext, tile_size)) as pool:
+            for record in pool.imap_unordered(_process_one, inputs, chunksize=chunksize):
+                writer.put(record)
+    finally:
+        writer.close()
+    elapsed = time.perf_counter() - start
+
+    return {
+        "文件数": len(inputs),
+        "成功": writer.written,
+        "失败": writer.failed,
+        "进程数": workers,
+        "任务块大小": chunksize,
+        "总耗时(s)": round(elapsed, 3),
+        "吞吐量(文件/s)": round(len(inputs) / elapsed, 2) if elapsed > 0 else 0,
+    }
+
+
+def add_parser(subparsers):
+    """注册 batch 子命令"""
+    parser = subparsers.add_parser("batch", help="批量处理图像目录")
+    parser.add_argument("input", help="输入目录或通配符模式（如 'masks/**/*.png'）")
+    parser.add_argument("operator", help="算子路径，如 形态学操作/腐蚀")
+    parser.add_argument("output", help="输出目录")
+    parser.add_argument("-p", "--param", action="append", default=[], metavar="KEY=VALUE",
+                        help="算子参数，可重复，如 -p kernel_size=5")
+    parser.add_argument("-t", "--template", help="模板图像路径（模板匹配算子的 template_image 参数）")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="进程数（默认 CPU 核数）")
+    parser.add_argument("--chunksize", type=int, default=None, help="每次分发给工作进程的文件数")
+    parser.add_argument("--stats", default=None, help="统计信息输出文件（默认 输出目录/stats.jsonl）")
+    parser.add_argument("--stats-format", choices=("jsonl", "csv"), default="jsonl")
+    parser.add_argument("--ext", default=".png", help="输出图像格式扩展名")
+    parser.add_argument("--tile", type=int, default=None, help="分块大小（仅对支持分块的局部算子生效）")
+    parser.set_defaults(func=main)
+    return parser
+
+
+def main(args) -> int:
+    """batch 子命令入口"""
+    inputs = collect_inputs(args.input)
+    if not inputs:
+        print(f"没有找到输入文件: {args.input}")
+        return 1
+
+    params = parse_params(args.param)
+    if args.template:
+        params["template_image"] = read_image(args.template)
+    input_root = args.input if os.path.isdir(args.input) else os.path.commonpath([os.path.dirname(p) for p in inputs])
+    stats_path = args.stats or os.path.join(args.output, f"stats.{args.stats_format}")
+    ext = args.ext if args.ext.startswith(".") else "." + args.ext
+
+    summary = run_batch(inputs, args.operator, params, args.output, input_root=input_root,
+                        workers=args.workers, chunksize=args.chunksize,
+                        stats_path=stats_path, stats_format=args.stats_format, output_ext=ext,
+                        tile_size=args.tile)
+    for key, value in summary.items():
+        print(f"{key}: {value}")
+    print(f"统计信息: {stats_path}")
+    return 0 if summary["失败"] == 0 else 2
@@ -0,0 +1,311 @@
+"""
+算子性能基准
+按图像尺寸、核大小、前景密度和点数量组成的参数网格为 OPERATORS 中的每个算子计时，
+输出冷/热启动耗时、分位数和吞吐量，并可与保存的基线结果比较。
+冷启动每次先清空算子内部的全局缓存（响应图、KMeans 热启动、可达性排序、增量 DBSCAN）并复制输入，计时的是完整计算；
+热启动在同一输入上连续调用、不清空缓存，反映界面中重复运行时的耗时
+"""
+
+import json
+import os
+import platform
+import time
+from typing import Any, Dict, Iterator, List, Optional
+
+import cv2
+import numpy as np
+
+from .clustering import WARM_START
+from .incremental import INCREMENTAL_DBSCAN
+from .operators import OPERATORS
+from .optics import REACHABILITY_CACHE
+from .template_matching import RESPONSE_CACHE, TemplateBank
+
+
+DEFAULT_SIZES = (256, 512, 1024, 2048, 4096, 8192)
+DEFAULT_KERNELS = (3, 7, 15)
+DEFAULT_DENSITIES = (0.05, 0.25, 0.5)
+DEFAULT_POINTS = (100, 1000, 10000)
+DEFAULT_TEMPLATE_SIZES = (16, 32, 96)
+DEFAULT_REPEAT = 5
+
+# 比较时耗时增加超过该比例视为变慢
+DEFAULT_THRESHOLD = 0.10
+
+# 与基线比较时默认使用的耗时列
+DEFAULT_COMPARE_KEY = "cold_median_ms"
+
+# 同一源图像批量匹配的模板数量
+BANK_TEMPLATES = 8
+
+
+# ===== 批量模板匹配 =====
+
+def _bank_match(source: np.ndarray, templates: List[np.ndarray]):
+    """TemplateBank：源图像频谱只计算一次（包括建库耗时）"""
+    return TemplateBank(source).match_all(templates), {}
+
+
+def _each_match(source: np.ndarray, templates: List[np.ndarray]):
+    """对照：每个模板一次 cv2.matchTemplate"""
+    return [cv2.minMaxLoc(cv2.matchTemplate(source, t, cv2.TM_CCOEFF_NORMED)) for t in templates], {}
+
+
+# 不属于界面算子、只用于基准比较的用例
+EXTRA_OPERATORS = {
+    "模板库": {
+        "TemplateBank": _bank_match,
+        "逐个matchTemplate": _each_match,
+    },
+}
+
+
+# ===== 测试数据 =====
+
+def make_mask(size: int, density: float, seed: int = 0) -> np.ndarray:
+    """生成指定前景密度的块状二值图（0/255）"""
+    rng = np.random.default_rng(seed)
+    coarse = rng.random((max(2, size // 16), max(2, size // 16)), dtype=np.float32)
+    field = cv2.resize(coarse, (size, size), interpolation=cv2.INTER_CUBIC)
+    threshold = np.quantile(field[::4, ::4], 1.0 - density)
+    return np.where(field > threshold, 255, 0).astype(np.uint8)
+
+
+def make_points(size: int, n_points: int, seed: int = 0) -> np.ndarray:
+    """生成聚类测试点集 (n_points, 2)，由若干高斯簇组成，坐标在图像范围内"""
+    rng = np.random.default_rng(seed)
+    centers = rng.uniform(0.15 * size, 0.85 * size, (5, 2))
+    points = centers[rng.integers(0, len(centers), n_points)] + rng.normal(0, size * 0.05, (n_points, 2))
+    return np.clip(points, 0, size - 1).astype(np.float32)
+
+
+# ===== 参数网格 =====
+
+def iter_cases(sizes=DEFAULT_SIZES, kernels=DEFAULT_KERNELS, densities=DEFAULT_DENSITIES,
+               points=DEFAULT_POINTS, ops: Optional[List[str]] = None,
+               template_sizes=DEFAULT_TEMPLATE_SIZES) -> Iterator[Dict[str, Any]]:
+    """枚举基准用例，每个用例只包含对该算子有意义的参数维度"""
+    for category, operators in {**OPERATORS, **EXTRA_OPERATORS}.items():
+        for op_name in operators:
+            path = f"{category}/{op_name}"
+            if ops and not any(o in path for o in ops):
+                continue
+            for size in sizes:
+                if category == "模板库":
+                    for t in template_sizes:
+                        if t < size:
+                            yield {"op": path, "size": size, "template": t, "templates": BANK_TEMPLATES}
+                    continue
+                if category == "聚类算法":
+                    for n in points:
+                        yield {"op": path, "size": size, "points": n}
+                    continue
+                for density in densities:
+                    if category == "形态学操作":
+                        for kernel in kernels:
+                            yield {"op": path, "size": size, "density": density, "kernel": kernel}
+                    elif op_name in ("Sobel X", "Sobel Y", "Laplacian"):
+                        for kernel in sorted({min(k, 7) for k in kernels}):
+                            yield {"op": path, "size": size, "density": density, "kernel": kernel}
+                    else:
+                        yield {"op": path, "size": size, "density": density}
+
+
+def case_id(case: Dict[str, Any]) -> str:
+    """用例标识，用于和基线结果对齐"""
+    parts = [case["op"]] + [f"{k}={case[k]}" for k in ("size", "kernel", "density", "points", "template") if k in case]
+    return "|".join(parts)
+
+
+def prepare_case(case: Dict[str, Any]):
+    """构造用例的调用参数，返回 (位置参数, 关键字参数)"""
+    category, op_name = case["op"].split("/", 1)
+    size = case["size"]
+    if category == "模板库":
+        image = cv2.GaussianBlur(make_mask(size, 0.25), (5, 5), 1.5)
+        t = case["template"]
+        offsets = np.linspace(0, size - t, case["templates"]).astype(int)
+        return (image, [image[o:o + t, size - t - o:size - o].copy() for o in offsets]), {}
+    if category == "聚类算法":
+        # 直接传入点集，使点数与用例一致（不经过从图像提取点）；图像只决定结果图大小
+        image = np.full((size, size), 255, dtype=np.uint8)
+        points = make_points(size, case["points"])
+        if op_name == "KMeans":
+            return (image,), {"k": 5, "points": points}
+        return (image,), {"eps": size * 0.03, "min_samples": 5, "points": points}
+
+    image = make_mask(size, case["density"])
+    if category == "模板匹配":
+        t = max(8, size // 8)
+        template = image[size // 3:size // 3 + t, size // 3:size // 3 + t].copy()
+        return (image, template), {"show_heatmap": False}
+    if op_name == "Canny":
+        return (image, 100, 200), {}
+    if op_name in ("Sobel X", "Sobel Y", "Laplacian"):
+        return (image,), {"ksize": case["kernel"]}
+    if "kernel" in case:
+        return (image,), {"kernel_size": case["kernel"]}
+    return (image,), {}
+
+
+# ===== 计时 =====
+
+def clear_operator_caches():
+    """清空算子使用的全局缓存，使下一次调用完整计算"""
+    for cache in (RESPONSE_CACHE, WARM_START, REACHABILITY_CACHE, INCREMENTAL_DBSCAN):
+        cache.clear()
+
+
+def _copy_args(args: tuple, kwargs: dict):
+    """复制数组参数，使每次调用使用新的输入缓冲区"""
+    copy = lambda v: v.copy() if isinstance(v, np.ndarray) else v
+    return tuple(copy(a) for a in args), {k: copy(v) for k, v in kwargs.items()}
+
+
+def _sample(func, args: tuple, kwargs: dict) -> float:
+    """调用一次，返回耗时（毫秒）"""
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return (time.perf_counter() - start) * 1000
+
+
+def _cold_sample(func, args: tuple, kwargs: dict) -> float:
+    """清空缓存并复制输入后调用一次，返回耗时（毫秒）"""
+    clear_operator_caches()
+    return _sample(func, *_copy_args(args, kwargs))
+
+
+def time_case(case: Dict[str, Any], repeat: int = DEFAULT_REPEAT) -> Dict[str, Any]:
+    """对单个用例计时
+
+    冷启动：repeat 次，每次清空算子缓存并使用新复制的输入；
+    热启动：先在同一份输入上调用一次（不计时），其后 repeat 次重复调用、不清空缓存
+    """
+    category, op_name = case["op"].split("/", 1)
+    func = {**OPERATORS, **EXTRA_OPERATORS}[category][op_name]
+    args, kwargs = prepare_case(case)
+
+    cold = np.array([_cold_sample(func, args, kwargs) for _ in range(repeat)])
+    clear_operator_caches()
+    func(*args, **kwargs)
+    warm = np.array([_sample(func, args, kwargs) for _ in range(repeat)])
+    clear_operator_caches()
+    median = float(np.median(cold))
+    mpix = case["size"] * case["size"] / 1e6
+
+    result = dict(case)
+    result.update({
+        "id": case_id(case),
+        "cold_median_ms": round(median, 3),
+        "cold_min_ms": round(float(cold.min()), 3),
+        "cold_max_ms": round(float(cold.max()), 3),
+        "cold_p90_ms": round(float(np.percentile(cold, 90)), 3),
+        "warm_median_ms": round(float(np.median(warm)), 3),
+        "warm_min_ms": round(float(warm.min()), 3),
+        "warm_p90_ms": round(float(np.percentile(warm, 90)), 3),
+        "mpix_per_s": round(mpix / (median / 1000), 2) if median > 0 else None,
+    })
+    if "templates" in case:
+        result["per_template_ms"] = round(median / case["templates"], 3)
+    return result
+
+
+def environment_info() -> Dict[str, Any]:
+    """运行环境信息"""
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "opencv": cv2.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv_threads": cv2.getNumThreads(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+    }
+
+
+def run_benchmark(cases, repeat: int = DEFAULT_REPEAT, verbose: bool = True) -> Dict[str, Any]:
+    """运行全部用例"""
+    results = []
+    for case in cases:
+        result = time_case(case, repeat)
+        results.append(result)
+        if verbose:
+            print(f"{result['id']:<60} 冷 {result['cold_median_ms']:>10.2f} ms  "
+                  f"热 {result['warm_median_ms']:>10.2f} ms  {result['mpix_per_s'] or 0:>9.2f} MP/s")
+    return {"meta": environment_info(), "repeat": repeat, "results": results}
+
+
+# ===== 与基线比较 =====
+
+def compare_results(current: Dict[str, Any], baseline: Dict[str, Any],
+                    threshold: float = DEFAULT_THRESHOLD, key: str = DEFAULT_COMPARE_KEY) -> List[Dict[str, Any]]:
+    """按用例标识对齐两次结果，计算耗时比例并标记变慢的用例（默认比较冷启动中位数，即完整计算的耗时）"""
+    base = {r["id"]: r for r in baseline["results"]}
+    rows = []
+    for r in current["results"]:
+        b = base.get(r["id"])
+        if b is None or not b.get(key):
+            continue
+        ratio = r[key] / b[key]
+        rows.append({
+            "id": r["id"],
+            "baseline_ms": b[key],
+            "current_ms": r[key],
+            "ratio": round(ratio, 3),
+            "regression": ratio > 1.0 + threshold,
+        })
+    return rows
+
+
+def print_comparison(rows: List[Dict[str, Any]]):
+    for row in rows:
+        flag = "  ⚠ 变慢" if row["regression"] else ""
+        print(f"{row['id']:<60} {row['baseline_ms']:>10.2f} -> {row['current_ms']:>10.2f} ms  x{row['ratio']:.3f}{flag}")
+    n_slow = sum(row["regression"] for row in rows)
+    print(f"\n比较用例: {len(rows)}，变慢: {n_slow}")
+
+
+# ===== 命令行 =====
+
+def add_parser(subparsers):
+    """注册 bench 子命令"""
+    parser = subparsers.add_parser("bench", help="算子性能基准")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="图像边长")
+    parser.add_argument("--kernels", type=int, nargs="+", default=list(DEFAULT_KERNELS), help="核大小")
+    parser.add_argument("--densities", type=float, nargs="+", default=list(DEFAULT_DENSITIES), help="前景密度")
+    parser.add_argument("--points", type=int, nargs="+", default=list(DEFAULT_POINTS), help="聚类点数量")
+    parser.add_argument("--template-sizes", type=int, nargs="+", default=list(DEFAULT_TEMPLATE_SIZES),
+                        help="批量模板匹配（模板库）用例的模板边长")
+    parser.add_argument("--ops", nargs="+", default=None, help="只运行路径包含这些字符串的算子")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="冷启动和热启动各自的重复次数")
+    parser.add_argument("-o", "--output", default=None, help="结果保存路径（JSON）")
+    parser.add_argument("--load", default=None, help="不运行基准，直接加载已有结果")
+    parser.add_argument("--baseline", default=None, help="与该基线结果比较")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="判定变慢的耗时增幅")
+    parser.add_argument("--compare-key", default=DEFAULT_COMPARE_KEY,
+                        choices=["cold_median_ms", "warm_median_ms"], help="与基线比较的耗时列")
+    parser.set_defaults(func=main)
+    return parser
+
+
+def main(args) -> int:
+    """bench 子命令入口"""
+    if args.load:
+        with open(args.load, encoding="utf-8") as f:
+            report = json.load(f)
+    else:
+        cases = iter_cases(args.sizes, args.kernels, args.densities, args.points, args.ops, args.template_sizes)
+        report = run_benchmark(cases, args.repeat)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, ensure_ascii=False, indent=2)
+            print(f"\n结果已保存: {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        rows = compare_results(report, baseline, args.threshold, args.compare_key)
+        print()
+        print_comparison(rows)
+        return 1 if any(row["regression"] for row in rows) else 0
+    return 0
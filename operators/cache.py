@@ -0,0 +1,143 @@
+"""
+算子结果缓存
+以图像内容摘要 + 算子名 + 规范化参数为键的 LRU 缓存，按字节预算淘汰。
+计算键需要对整幅输入图像做摘要（3840x2160 约 15 ms），因此比摘要还快的算子不经过缓存；
+结果依赖全局状态的算子（KMeans 热启动、模板匹配的响应图缓存）也不缓存，否则命中时会重放旧的统计信息。
+"""
+
+import inspect
+import threading
+from collections import OrderedDict
+from functools import wraps
+from typing import Any, Callable, Dict, Tuple
+
+import numpy as np
+
+from .image_io import image_digest
+from .operators import OPERATORS
+
+
+# 默认缓存容量（字节）
+DEFAULT_CACHE_BYTES = 256 * 1024 * 1024
+
+# 不缓存的算子分类：结果或统计信息依赖全局状态的，以及计算比图像摘要更快的
+STATEFUL_CATEGORIES = ("聚类算法", "模板匹配")
+CHEAP_CATEGORIES = ("形态学操作",)
+
+
+def _normalize_value(value: Any) -> Any:
+    """把参数值转换为可哈希、与调用方式无关的形式"""
+    if isinstance(value, np.ndarray):
+        return ("ndarray", image_digest(value))
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, (list, tuple)):
+        return tuple(_normalize_value(v) for v in value)
+    if isinstance(value, dict):
+        return tuple(sorted((k, _normalize_value(v)) for k, v in value.items()))
+    return value
+
+
+def _result_nbytes(result: Tuple[Any, Dict]) -> int:
+    """估算一条缓存结果占用的字节数"""
+    image, stats = result
+    nbytes = image.nbytes if isinstance(image, np.ndarray) else 0
+    return nbytes + 64 * (len(stats) + 1)
+
+
+class OperatorCache:
+    """线程安全的 LRU 结果缓存"""
+
+    def __init__(self, max_bytes: int = DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def make_key(self, name: str, func: Callable, args: tuple, kwargs: dict) -> tuple:
+        """按函数签名绑定参数并补齐默认值，使位置参数和关键字参数得到相同的键"""
+        try:
+            bound = inspect.signature(func).bind(*args, **kwargs)
+            bound.apply_defaults()
+            params = bound.arguments.items()
+        except (TypeError, ValueError):
+            params = list(enumerate(args)) + sorted(kwargs.items())
+        return (name,) + tuple((k, _normalize_value(v)) for k, v in params)
+
+    def get(self, key: tuple):
+        """查找缓存，命中时移动到最近使用端"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: tuple, result: Tuple[Any, Dict]):
+        """写入缓存并淘汰最久未使用的条目直到不超过字节预算"""
+        nbytes = _result_nbytes(result)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[1]
+            self._entries[key] = (result, nbytes)
+            self.current_bytes += nbytes
+            while self.current_bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.current_bytes -= evicted
+
+    def clear(self):
+        """清空缓存和计数"""
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def info(self) -> Dict:
+        """缓存统计信息"""
+        with self._lock:
+            return {
+                "命中": self.hits,
+                "未命中": self.misses,
+                "条目数": len(self._entries),
+                "占用字节": self.current_bytes,
+            }
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        """包装一个算子函数，返回带缓存的版本"""
+        @wraps(func)
+        def cached(*args, **kwargs):
+            key = self.make_key(name, func, args, kwargs)
+            result = self.get(key)
+            if result is None:
+                image, stats = func(*args, **kwargs)
+                # 缓存中的图像被多个调用方共享，设为只读防止被原地修改
+                # （算子原样返回输入图像时不改动调用方数组）
+                if isinstance(image, np.ndarray) and not any(image is a for a in (*args, *kwargs.values())):
+                    image.flags.writeable = False
+                result = (image, stats)
+                self.put(key, result)
+            image, stats = result
+            return image, dict(stats)
+        return cached
+
+
+# 全局结果缓存
+RESULT_CACHE = OperatorCache()
+
+# 带缓存的算子注册表，结构与 OPERATORS 相同（不缓存的分类为原函数）
+CACHED_OPERATORS = {
+    category: {
+        op_name: (op_func if category in STATEFUL_CATEGORIES + CHEAP_CATEGORIES
+                  else RESULT_CACHE.wrap(f"{category}/{op_name}", op_func))
+        for op_name, op_func in operators.items()
+    }
+    for category, operators in OPERATORS.items()
+}
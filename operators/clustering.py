@@ -0,0 +1,303 @@
+"""
+KMeans 聚类
+k-means++ 初始化、完整批量 Lloyd 迭代和大点集的 Mini-Batch 迭代；
+多次重启在线程池中并行执行，取紧致度最小的结果；
+上一次运行的中心按点集缓存，点集几乎不变时（如调整 K 或增删少量点）从缓存中心热启动。
+"""
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+
+# 点数不少于该值时使用 Mini-Batch KMeans
+MINIBATCH_MIN_POINTS = 20000
+MINIBATCH_SIZE = 2048
+
+# k-means++ 初始化最多使用的点数（大点集先均匀抽样）
+SEEDING_SAMPLE = 10000
+
+# 与 cv2.kmeans 原有终止条件一致：最多 100 次迭代，或中心移动不超过 0.2 像素
+MAX_ITER = 100
+CENTER_TOL = 0.2
+
+# 当前点集与缓存点集的重合比例不低于该值时热启动
+WARM_START_OVERLAP = 0.9
+
+# 重启：先让所有重启各迭代 ABORT_CHECK_ITER 次，紧致度比当前最优差 ABORT_MARGIN 以上的提前终止
+DEFAULT_ATTEMPTS = 10
+ABORT_CHECK_ITER = 5
+ABORT_MARGIN = 0.1
+
+# 距离计算分块行数，限制 N × K 距离矩阵的内存
+ASSIGN_BLOCK = 65536
+
+
+class KMeansResult(NamedTuple):
+    labels: np.ndarray
+    centers: np.ndarray
+    inertia: float
+    iterations: int
+    mode: str
+    aborted: int = 0
+
+
+def assign(points: np.ndarray, centers: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """把每个点分配到最近的中心，返回 (标签, 到中心的平方距离)"""
+    n = len(points)
+    labels = np.empty(n, dtype=np.int32)
+    dist = np.empty(n, dtype=np.float64)
+    center_sq = np.einsum("ij,ij->i", centers, centers)
+    for start in range(0, n, ASSIGN_BLOCK):
+        block = points[start:start + ASSIGN_BLOCK]
+        d = center_sq - 2.0 * block @ centers.T
+        labels[start:start + len(block)] = np.argmin(d, axis=1)
+        best = d[np.arange(len(block)), labels[start:start + len(block)]]
+        dist[start:start + len(block)] = np.maximum(best + np.einsum("ij,ij->i", block, block), 0)
+    return labels, dist
+
+
+def _cluster_sums(points: np.ndarray, labels: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    counts = np.bincount(labels, minlength=k).astype(np.float64)
+    sums = np.stack([np.bincount(labels, weights=points[:, j], minlength=k) for j in range(points.shape[1])], axis=1)
+    return sums, counts
+
+
+def kmeans_plus_plus(points: np.ndarray, k: int, rng: np.random.Generator,
+                     initial: Optional[np.ndarray] = None) -> np.ndarray:
+    """k-means++ 初始化；initial 不为空时保留这些中心，只补足剩余的中心"""
+    if len(points) > SEEDING_SAMPLE:
+        points = points[rng.choice(len(points), SEEDING_SAMPLE, replace=False)]
+    centers = [] if initial is None else [c for c in np.asarray(initial, dtype=np.float64)]
+    if not centers:
+        centers.append(points[rng.integers(len(points))].astype(np.float64))
+    d2 = assign(points, np.array(centers))[1]
+    while len(centers) < k:
+        total = d2.sum()
+        idx = rng.choice(len(points), p=d2 / total) if total > 0 else rng.integers(len(points))
+        centers.append(points[idx].astype(np.float64))
+        d2 = np.minimum(d2, np.sum((points - points[idx]) ** 2, axis=1))
+    return np.array(centers)
+
+
+def _lloyd(points: np.ndarray, centers: np.ndarray, max_iter: int,
+           tol: float) -> Tuple[np.ndarray, np.ndarray, float, int, bool]:
+    """Lloyd 迭代，额外返回是否已收敛（用于分段执行）"""
+    centers = centers.copy()
+    k = len(centers)
+    iterations = 0
+    converged = False
+    for iterations in range(1, max_iter + 1):
+        labels, dist = assign(points, centers)
+        sums, counts = _cluster_sums(points, labels, k)
+        new_centers = centers.copy()
+        filled = counts > 0
+        new_centers[filled] = sums[filled] / counts[filled, None]
+        for empty in np.flatnonzero(~filled):
+            far = int(np.argmax(dist))
+            new_centers[empty] = points[far]
+            dist[far] = 0
+        shift = np.max(np.abs(new_centers - centers))
+        centers = new_centers
+        if shift <= tol:
+            converged = True
+            break
+    labels, dist = assign(points, centers)
+    return labels, centers, float(dist.sum()), iterations, converged
+
+
+def lloyd(points: np.ndarray, centers: np.ndarray, max_iter: int = MAX_ITER,
+          tol: float = CENTER_TOL) -> Tuple[np.ndarray, np.ndarray, float, int]:
+    """完整批量 Lloyd 迭代，返回 (标签, 中心, 紧致度, 迭代次数)；空簇移到离其中心最远的点"""
+    return _lloyd(points, centers, max_iter, tol)[:4]
+
+
+def restart_rng(seed: int, attempt: int) -> np.random.Generator:
+    """第 attempt 次重启的随机数生成器，只由 (seed, attempt) 决定，与执行顺序和线程数无关"""
+    return np.random.default_rng([seed, attempt])
+
+
+def _best_of(attempts: int, workers: Optional[int], first_round: Callable[[int], tuple],
+             finish: Callable[[tuple], tuple]) -> Tuple[tuple, int]:
+    """并行执行 attempts 次重启，返回 (紧致度最小的运行, 提前终止的次数)
+
+    每次运行为 (标签, 中心, 紧致度, 迭代次数, 是否收敛, ...) 元组。所有重启先执行 first_round，
+    紧致度比这一轮最优差 ABORT_MARGIN 以上且未收敛的提前终止，其余由 finish 继续迭代到收敛。
+    比较只在同一轮之后进行、得分相同时取序号小的重启，因此结果与线程数和完成顺序无关。
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, attempts))
+    executor = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    run_all = executor.map if executor is not None else map
+    try:
+        runs = list(run_all(first_round, range(attempts)))
+        limit = min(run[2] for run in runs) * (1 + ABORT_MARGIN)
+        survivors = [i for i, run in enumerate(runs) if run[4] or run[2] <= limit]
+        for i, run in zip(survivors, run_all(finish, [runs[i] for i in survivors])):
+            runs[i] = run
+    finally:
+        if executor is not None:
+            executor.shutdown()
+
+    best = min(survivors, key=lambda i: (runs[i][2], i))
+    return runs[best], attempts - len(survivors)
+
+
+def restarts(points: np.ndarray, k: int, attempts: int = DEFAULT_ATTEMPTS, seed: int = 0,
+             workers: Optional[int] = None) -> KMeansResult:
+    """多次 k-means++ 初始化 + Lloyd 迭代，并行执行，返回紧致度最小的结果
+
+    所有重启先各迭代 ABORT_CHECK_ITER 次，落后的提前终止（见 _best_of），同一 seed 的结果与线程数无关。
+    """
+    def first_round(attempt):
+        init = kmeans_plus_plus(points, k, restart_rng(seed, attempt))
+        return _lloyd(points, init, ABORT_CHECK_ITER, CENTER_TOL)
+
+    def finish(run):
+        labels, centers, inertia, iterations, converged = run
+        if converged:
+            return run
+        more = _lloyd(points, centers, MAX_ITER - iterations, CENTER_TOL)
+        return more[:3] + (iterations + more[3], more[4])
+
+    (labels, centers, inertia, iterations, _), aborted = _best_of(attempts, workers, first_round, finish)
+    return KMeansResult(labels, centers, inertia, iterations, mode="多次重启", aborted=aborted)
+
+
+def _minibatch(points: np.ndarray, centers: np.ndarray, rng: np.random.Generator, totals: np.ndarray,
+               batch_size: int, max_iter: int, tol: float) -> Tuple[np.ndarray, np.ndarray, float, int, bool]:
+    """Mini-Batch 迭代，totals（各中心累计样本数）原地更新以便分段执行；额外返回是否已收敛"""
+    centers = centers.copy()
+    k = len(centers)
+    iterations = 0
+    converged = False
+    for iterations in range(1, max_iter + 1):
+        batch = points[rng.integers(0, len(points), batch_size)]
+        labels, _ = assign(batch, centers)
+        sums, counts = _cluster_sums(batch, labels, k)
+        totals += counts
+        hit = counts > 0
+        rate = (counts[hit] / totals[hit])[:, None]
+        new_centers = centers.copy()
+        new_centers[hit] = (1 - rate) * centers[hit] + rate * sums[hit] / counts[hit, None]
+        shift = np.max(np.abs(new_centers - centers))
+        centers = new_centers
+        if shift <= tol:
+            converged = True
+            break
+    labels, dist = assign(points, centers)
+    return labels, centers, float(dist.sum()), iterations, converged
+
+
+def minibatch(points: np.ndarray, centers: np.ndarray, rng: np.random.Generator,
+              batch_size: int = MINIBATCH_SIZE, max_iter: int = MAX_ITER,
+              tol: float = CENTER_TOL) -> Tuple[np.ndarray, np.ndarray, float, int]:
+    """Mini-Batch KMeans：每次迭代只用一小批随机点，按各中心累计样本数递减学习率更新
+
+    返回值与 lloyd 相同，标签和紧致度在全部点上计算
+    """
+    return _minibatch(points, centers, rng, np.zeros(len(centers)), batch_size, max_iter, tol)[:4]
+
+
+def minibatch_restarts(points: np.ndarray, k: int, attempts: int = DEFAULT_ATTEMPTS, seed: int = 0,
+                       workers: Optional[int] = None, batch_size: int = MINIBATCH_SIZE) -> KMeansResult:
+    """多次 k-means++ 初始化 + Mini-Batch 迭代，提前终止规则与 restarts 相同
+
+    每次重启的初始化和小批抽样都使用 restart_rng(seed, attempt)，结果与线程数无关。
+    """
+    def first_round(attempt):
+        rng = restart_rng(seed, attempt)
+        init = kmeans_plus_plus(points, k, rng)
+        totals = np.zeros(k)
+        return _minibatch(points, init, rng, totals, batch_size, ABORT_CHECK_ITER, CENTER_TOL) + (rng, totals)
+
+    def finish(run):
+        labels, centers, inertia, iterations, converged, rng, totals = run
+        if converged:
+            return run
+        more = _minibatch(points, centers, rng, totals, batch_size, MAX_ITER - iterations, CENTER_TOL)
+        return more[:3] + (iterations + more[3], more[4], rng, totals)
+
+    (labels, centers, inertia, iterations, *_), aborted = _best_of(attempts, workers, first_round, finish)
+    return KMeansResult(labels, centers, inertia, iterations, mode="Mini-Batch 多次重启", aborted=aborted)
+
+
+def _point_keys(points: np.ndarray) -> np.ndarray:
+    """点坐标按 0.5 像素取整后的一维键，用于比较点集"""
+    q = np.round(points[:, :2].astype(np.float64) * 2).astype(np.int64)
+    return np.unique((q[:, 0] << 32) ^ (q[:, 1] & 0xFFFFFFFF))
+
+
+class WarmStartCache:
+    """保存上一次运行的点集和中心"""
+
+    def __init__(self):
+        self._keys = None
+        self._centers = None
+        self._sizes = None
+        self._lock = threading.Lock()
+
+    def lookup(self, points: np.ndarray) -> Tuple[Optional[np.ndarray], Optional[np.ndarray], np.ndarray]:
+        """点集与缓存点集几乎相同时返回 (缓存中心, 各簇大小, 点集键)，否则中心为 None"""
+        keys = _point_keys(points)
+        with self._lock:
+            cached_keys, centers, sizes = self._keys, self._centers, self._sizes
+        if cached_keys is None or len(keys) == 0:
+            return None, None, keys
+        common = np.count_nonzero(np.isin(keys, cached_keys, assume_unique=True))
+        if common < WARM_START_OVERLAP * max(len(keys), len(cached_keys)):
+            return None, None, keys
+        return centers, sizes, keys
+
+    def store(self, keys: np.ndarray, centers: np.ndarray, labels: np.ndarray):
+        sizes = np.bincount(labels, minlength=len(centers))
+        with self._lock:
+            self._keys, self._centers, self._sizes = keys, centers.copy(), sizes
+
+    def clear(self):
+        with self._lock:
+            self._keys = self._centers = self._sizes = None
+
+
+# 全局热启动缓存（界面中连续运行 KMeans 时共用）
+WARM_START = WarmStartCache()
+
+
+def _warm_centers(centers: np.ndarray, sizes: np.ndarray, points: np.ndarray, k: int,
+                  rng: np.random.Generator) -> np.ndarray:
+    """把缓存中心调整为 k 个：K 减小时保留最大的簇，K 增大时用 k-means++ 补足"""
+    if k <= len(centers):
+        keep = np.sort(np.argsort(-sizes, kind="stable")[:k])
+        return centers[keep]
+    return kmeans_plus_plus(points, k, rng, initial=centers)
+
+
+def kmeans(points: np.ndarray, k: int, seed: int = 0, warm_start: bool = False,
+           attempts: int = DEFAULT_ATTEMPTS, workers: Optional[int] = None,
+           cache: WarmStartCache = WARM_START) -> KMeansResult:
+    """KMeans 聚类
+
+    warm_start 为 True 且点集与上一次运行几乎相同时从缓存中心热启动（只需少量迭代）；
+    否则并行执行 attempts 次 k-means++ 初始化的重启取最优，大点集每次重启使用 Mini-Batch 迭代。
+    """
+    points = np.asarray(points, dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    centers, sizes, keys = cache.lookup(points) if warm_start else (None, None, None)
+    large = len(points) >= MINIBATCH_MIN_POINTS
+
+    if centers is not None:
+        init = _warm_centers(centers, sizes, points, k, rng)
+        if large:
+            result = KMeansResult(*minibatch(points, init, rng), mode="热启动 Mini-Batch")
+        else:
+            result = KMeansResult(*lloyd(points, init), mode="热启动")
+    elif large:
+        result = minibatch_restarts(points, k, attempts, seed, workers)
+    else:
+        result = restarts(points, k, attempts, seed, workers)
+
+    if warm_start:
+        cache.store(keys, result.centers, result.labels)
+    return result
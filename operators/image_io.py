@@ -0,0 +1,110 @@
+"""
+图像读写
+无 GUI 的读写入口，支持中文路径。
+.npy 和带 JSON 头文件的原始 uint8 数据以内存映射方式只读加载，不经过解码和复制。
+"""
+
+import glob
+import hashlib
+import json
+import os
+from typing import List
+
+import cv2
+import numpy as np
+
+
+# 内存映射加载的数组格式
+ARRAY_EXTENSIONS = (".npy", ".raw")
+
+# 支持的图像扩展名
+IMAGE_EXTENSIONS = (".png", ".jpg", ".jpeg", ".bmp", ".tif", ".tiff") + ARRAY_EXTENSIONS
+
+# 原始数据头文件后缀：mask.raw 对应 mask.raw.json，内容如 {"shape": [h, w], "dtype": "uint8", "offset": 0}
+RAW_HEADER_SUFFIX = ".json"
+
+
+def is_array_file(path: str) -> bool:
+    """是否为按内存映射加载的数组文件"""
+    return path.lower().endswith(ARRAY_EXTENSIONS)
+
+
+def _as_mask(array: np.ndarray, path: str) -> np.ndarray:
+    """检查数组是否可直接作为二值/灰度图使用；bool 数组转换为 0/255"""
+    if array.ndim != 2:
+        raise ValueError(f"仅支持二维数组: {path} 的形状为 {array.shape}")
+    if array.dtype == np.bool_:
+        return array.view(np.uint8) * np.uint8(255)
+    if array.dtype != np.uint8:
+        raise ValueError(f"仅支持 uint8 或 bool 数组: {path} 的类型为 {array.dtype}")
+    return array
+
+
+def load_array(path: str) -> np.ndarray:
+    """以只读内存映射方式加载 .npy 或 .raw（需要头文件）"""
+    if path.lower().endswith(".npy"):
+        array = np.load(path, mmap_mode="r")
+    else:
+        header_path = path + RAW_HEADER_SUFFIX
+        if not os.path.exists(header_path):
+            raise ValueError(f"缺少原始数据头文件: {header_path}")
+        with open(header_path, encoding="utf-8") as f:
+            header = json.load(f)
+        array = np.memmap(path, dtype=np.dtype(header.get("dtype", "uint8")), mode="r",
+                          offset=int(header.get("offset", 0)), shape=tuple(header["shape"]))
+    return _as_mask(array, path)
+
+
+def image_digest(image: np.ndarray) -> str:
+    """计算图像内容摘要（形状、类型和像素数据）"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{image.shape}|{image.dtype.str}".encode())
+    h.update(memoryview(np.ascontiguousarray(image)).cast("B"))
+    return h.hexdigest()
+
+
+def write_raw(path: str, image: np.ndarray):
+    """保存为原始数据和 JSON 头文件"""
+    image = np.ascontiguousarray(image)
+    image.tofile(path)
+    with open(path + RAW_HEADER_SUFFIX, "w", encoding="utf-8") as f:
+        json.dump({"shape": list(image.shape), "dtype": image.dtype.str, "offset": 0}, f)
+
+
+def read_image(path: str) -> np.ndarray:
+    """读取灰度图像；数组文件以内存映射方式加载"""
+    if is_array_file(path):
+        return load_array(path)
+    data = np.fromfile(path, dtype=np.uint8)
+    image = cv2.imdecode(data, cv2.IMREAD_GRAYSCALE)
+    if image is None:
+        raise ValueError(f"无法加载图像: {path}")
+    return image
+
+
+def encode_image(image: np.ndarray, ext: str = ".png") -> bytes:
+    """把图像编码为文件内容"""
+    ok, buf = cv2.imencode(ext, image)
+    if not ok:
+        raise ValueError(f"无法编码图像为 {ext}")
+    return buf.tobytes()
+
+
+def write_image(path: str, image: np.ndarray):
+    """保存图像（扩展名决定格式）"""
+    data = encode_image(image, os.path.splitext(path)[1] or ".png")
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def collect_inputs(pattern: str) -> List[str]:
+    """展开输入目录（递归查找图像文件）或通配符模式，返回排序后的文件列表"""
+    if os.path.isdir(pattern):
+        paths = []
+        for root, _, files in os.walk(pattern):
+            for name in files:
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    paths.append(os.path.join(root, name))
+    else:
+        paths = [p for p in glob.glob(pattern, recursive=True) if os.path.isfile(p)]
+    return sorted(paths)
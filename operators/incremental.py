@@ -0,0 +1,348 @@
+"""
+增量 DBSCAN
+在两次运行之间保留网格邻域索引、每个点的邻居数量（决定核心点）和簇标签；
+点集只增删少量点时只做局部更新：插入只会把相邻的簇合并，删除只需重新扩展受影响的簇。
+参数变化或改动较多时整体重建（eps 被连续调整后标签取自 OPTICS 可达性缓存）。
+"""
+
+import threading
+from collections import deque
+from typing import Dict, List, Tuple
+
+import numpy as np
+
+from .image_io import image_digest
+from .optics import REACHABILITY_CACHE, ReachabilityModel
+from .spatial import GridIndex
+
+
+# 一次同步中增删的点数超过该值（或超过点数的四分之一）时整体重建
+INCREMENTAL_MAX_CHANGES = 256
+
+
+def _point_keys(points: np.ndarray) -> np.ndarray:
+    """按 float32 坐标的二进制表示生成一维键（两个坐标完全相同才视为同一点）"""
+    return np.ascontiguousarray(points, dtype=np.float32).view(np.int64).ravel()
+
+
+class IncrementalDBSCAN:
+    """可增量更新的 DBSCAN
+
+    内部按稳定的点编号保存状态（删除的编号不再复用），每次 update 按坐标与上次的点集比较得到增删的点。
+    """
+
+    def __init__(self):
+        self.eps = None
+        self.min_samples = None
+        self._lock = threading.Lock()
+        self._reset(np.empty((0, 2), dtype=np.float32))
+
+    # ===== 状态 =====
+
+    def _reset(self, points: np.ndarray):
+        n = len(points)
+        capacity = max(64, n)
+        self.coords = np.zeros((capacity, 2))
+        self.keys = np.zeros(capacity, dtype=np.int64)
+        self.alive = np.zeros(capacity, dtype=bool)
+        self.counts = np.zeros(capacity, dtype=np.int64)
+        self.labels = np.full(capacity, -1, dtype=np.int64)
+        self.size = n
+        self.coords[:n] = points
+        self.keys[:n] = _point_keys(points)
+        self.alive[:n] = True
+        self.grid: Dict[Tuple[int, int], List[int]] = {}
+        self.next_label = 0
+        # 上次输入的点键和对应编号（按输入顺序）
+        self._input_keys = self.keys[:n].copy()
+        self._input_ids = np.arange(n)
+
+    def _grow(self):
+        capacity = 2 * len(self.keys)
+        for name, fill in (("coords", 0.0), ("keys", 0), ("alive", False), ("counts", 0), ("labels", -1)):
+            old = getattr(self, name)
+            new = np.full((capacity,) + old.shape[1:], fill, dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+
+    def _cell(self, x: float, y: float) -> Tuple[int, int]:
+        return int(np.floor(x / self.cell_size)), int(np.floor(y / self.cell_size))
+
+    def _neighbors(self, x: float, y: float) -> np.ndarray:
+        """距离 (x, y) 不超过 eps 的存活点编号"""
+        cx, cy = self._cell(x, y)
+        cand = []
+        for dx in (-1, 0, 1):
+            for dy in (-1, 0, 1):
+                members = self.grid.get((cx + dx, cy + dy))
+                if members:
+                    cand.extend(members)
+        cand = np.array(cand, dtype=np.int64)
+        if len(cand) == 0:
+            return cand
+        d2 = np.sum((self.coords[cand] - (x, y)) ** 2, axis=1)
+        return cand[d2 <= self.eps * self.eps]
+
+    def _is_core(self, ids: np.ndarray) -> np.ndarray:
+        return self.counts[ids] >= self.min_samples
+
+    # ===== 重建 =====
+
+    def rebuild(self, points: np.ndarray, eps: float, min_samples: int):
+        """按新的点集和参数整体重建"""
+        self.eps = float(eps)
+        self.min_samples = int(min_samples)
+        self.cell_size = max(self.eps, 1e-6) * (1 + 1e-6)
+        self._reset(points)
+        n = len(points)
+        if n == 0:
+            return
+
+        cells = np.floor(self.coords[:n] / self.cell_size).astype(np.int64)
+        order = np.lexsort((cells[:, 1], cells[:, 0]))
+        unique_cells, starts = np.unique(cells[order], axis=0, return_index=True)
+        groups = np.split(order, starts[1:])
+        self.grid = {(int(c[0]), int(c[1])): g.tolist() for c, g in zip(unique_cells, groups)}
+
+        self.counts[:n] = GridIndex(points, eps).neighbor_counts()
+
+        digest = image_digest(points)
+        model = REACHABILITY_CACHE.lookup(digest, min_samples, eps)
+        if model is None:
+            max_eps = REACHABILITY_CACHE.observe(digest, min_samples, eps, points)
+            if max_eps is None:
+                # eps 还没有被连续调整：直接在网格上扩展全部核心点
+                self._expand_region(np.arange(n), None)
+                return
+            model = ReachabilityModel(points, min_samples, max_eps)
+            REACHABILITY_CACHE.store(digest, model)
+        labels, n_clusters = model.dbscan(eps)
+        self.labels[:n] = labels
+        self.next_label = n_clusters
+
+    # ===== 局部更新 =====
+
+    def insert(self, x: float, y: float, key: int) -> int:
+        """插入一个点，返回其编号；新出现的核心点把相邻的簇合并"""
+        if self.size == len(self.keys):
+            self._grow()
+        i = self.size
+        self.size += 1
+        self.coords[i] = (x, y)
+        self.keys[i] = key
+        self.alive[i] = True
+        self.grid.setdefault(self._cell(x, y), []).append(i)
+
+        neighbors = self._neighbors(x, y)
+        others = neighbors[neighbors != i]
+        self.counts[others] += 1
+        self.counts[i] = len(neighbors)
+        m = self.min_samples
+        new_cores = others[self.counts[others] == m].tolist()
+        if self.counts[i] >= m:
+            new_cores.append(i)
+
+        if not new_cores:
+            core_neighbors = others[self._is_core(others)]
+            if len(core_neighbors):
+                self.labels[i] = self.labels[core_neighbors[0]]
+            return i
+
+        # 新核心点、与之相邻的核心点所在的已有簇作为并查集的节点（簇记为 ("簇", 标签)），连通的合并为一个簇
+        parent = {c: c for c in new_cores}
+
+        def find(node):
+            while parent[node] != node:
+                parent[node] = parent[parent[node]]
+                node = parent[node]
+            return node
+
+        def union(a, b):
+            parent.setdefault(a, a)
+            parent.setdefault(b, b)
+            parent[find(a)] = find(b)
+
+        borders = {}
+        for c in new_cores:
+            cn = self._neighbors(*self.coords[c])
+            core = self._is_core(cn)
+            for q in cn[core].tolist():
+                if q in parent:
+                    union(q, c)
+                elif self.labels[q] != -1:
+                    union(("簇", int(self.labels[q])), c)
+            borders[c] = cn[~core & (self.labels[cn] == -1)]
+
+        components = {}
+        for node in list(parent):
+            components.setdefault(find(node), []).append(node)
+        for nodes in components.values():
+            members = [node for node in nodes if not isinstance(node, tuple)]
+            labels = [node[1] for node in nodes if isinstance(node, tuple)]
+            if labels:
+                target = min(labels)
+                merged = [label for label in labels if label != target]
+                if merged:
+                    self.labels[:self.size][np.isin(self.labels[:self.size], merged)] = target
+            else:
+                target = self.next_label
+                self.next_label += 1
+            self.labels[members] = target
+            for c in members:
+                self.labels[borders[c]] = target
+        return i
+
+    def remove(self, i: int):
+        """删除编号为 i 的点
+
+        失去的核心点（被删除的核心点和邻居数量降到阈值以下的点）原来相邻的核心点若仍然连通，
+        簇不会分裂，只需重新判断这些点附近的边界点；否则重新扩展该簇。
+        """
+        x, y = self.coords[i]
+        self.grid[self._cell(x, y)].remove(i)
+        self.alive[i] = False
+        was_core = self.counts[i] >= self.min_samples
+        old_label = int(self.labels[i])
+        self.labels[i] = -1
+
+        neighbors = self._neighbors(x, y)
+        self.counts[neighbors] -= 1
+        demoted = neighbors[self.counts[neighbors] == self.min_samples - 1]
+        lost = [(c, int(self.labels[c])) for c in demoted.tolist()]
+        if was_core:
+            lost.append((i, old_label))
+        if not lost:
+            return
+
+        anchors = {}
+        recheck = set(demoted.tolist())
+        for c, _ in lost:
+            nb = self._neighbors(*self.coords[c])
+            core = self._is_core(nb)
+            for q in nb[core].tolist():
+                anchors.setdefault(int(self.labels[q]), []).append(q)
+            recheck.update(nb[~core].tolist())
+
+        for label in {label for _, label in lost}:
+            if not self._connected(anchors.get(label, [])):
+                region = np.flatnonzero(self.alive[:self.size] & (self.labels[:self.size] == label))
+                self._expand_region(region, label)
+
+        for q in recheck:
+            nb = self._neighbors(*self.coords[q])
+            core = nb[self._is_core(nb)]
+            self.labels[q] = self.labels[core[0]] if len(core) else -1
+
+    def _connected(self, anchors: List[int]) -> bool:
+        """从第一个锚点沿核心点广度优先扩展，全部锚点都能到达时返回 True（到达后立即停止）"""
+        if not anchors:
+            return False
+        remaining = set(anchors[1:])
+        visited = {anchors[0]}
+        queue = deque([anchors[0]])
+        while queue and remaining:
+            q = queue.popleft()
+            nb = self._neighbors(*self.coords[q])
+            for r in nb[self._is_core(nb)].tolist():
+                if r not in visited:
+                    visited.add(r)
+                    remaining.discard(r)
+                    queue.append(r)
+        return not remaining
+
+    def _expand_region(self, region: np.ndarray, reuse_label):
+        """清除区域内的标签后从核心点重新扩展；区域外的核心点不受影响"""
+        self.labels[region] = -1
+        for seed in region[self._is_core(region)].tolist():
+            if self.labels[seed] != -1:
+                continue
+            if reuse_label is not None:
+                label, reuse_label = reuse_label, None
+            else:
+                label = self.next_label
+                self.next_label += 1
+            self.labels[seed] = label
+            stack = [seed]
+            while stack:
+                q = stack.pop()
+                nb = self._neighbors(*self.coords[q])
+                fresh = nb[self.labels[nb] == -1]
+                self.labels[fresh] = label
+                stack.extend(fresh[self._is_core(fresh)].tolist())
+        # 区域内仍无簇的边界点可能属于区域外的簇
+        for q in region[self.labels[region] == -1].tolist():
+            nb = self._neighbors(*self.coords[q])
+            core = nb[self._is_core(nb)]
+            if len(core):
+                self.labels[q] = self.labels[core[0]]
+
+    # ===== 同步 =====
+
+    def _diff(self, keys: np.ndarray):
+        """与上次输入比较，返回 (新增的行, 删除的编号, 各行的编号（新增行为 -1）)；有重复坐标时返回 None
+
+        画布只在末尾追加一个点或删除一个点，这两种情况按顺序直接比较，其余情况按键排序匹配
+        """
+        last_keys, last_ids = self._input_keys, self._input_ids
+        n, m = len(keys), len(last_keys)
+        if m <= n <= m + 16 and np.array_equal(keys[:m], last_keys):
+            added = np.arange(m, n)
+            ids = np.concatenate([last_ids, np.full(n - m, -1, dtype=np.int64)])
+            if any(np.any(last_keys == k) or np.count_nonzero(keys[m:] == k) > 1 for k in keys[m:]):
+                return None
+            return added, np.empty(0, dtype=np.int64), ids
+        if n == m - 1:
+            mismatch = np.flatnonzero(keys != last_keys[:n])
+            j = mismatch[0] if len(mismatch) else n
+            if np.array_equal(keys[j:], last_keys[j + 1:]):
+                return np.empty(0, dtype=np.int64), last_ids[j:j + 1], np.delete(last_ids, j)
+
+        if len(np.unique(keys)) != n:
+            return None
+        sorter = np.argsort(last_keys)
+        pos = np.minimum(np.searchsorted(last_keys[sorter], keys), max(m - 1, 0))
+        found = last_keys[sorter][pos] == keys if m else np.zeros(n, dtype=bool)
+        ids = np.full(n, -1, dtype=np.int64)
+        ids[found] = last_ids[sorter[pos[found]]]
+        removed = last_ids[~np.isin(last_keys, keys)]
+        return np.flatnonzero(~found), removed, ids
+
+    def update(self, points: np.ndarray, eps: float, min_samples: int) -> Tuple[np.ndarray, int, str]:
+        """与上次的点集比较并更新，返回 (labels, 簇数量, 更新方式)；labels 与 points 顺序一致"""
+        points = np.asarray(points, dtype=np.float32).reshape(-1, 2)
+        with self._lock:
+            keys = _point_keys(points)
+            diff = self._diff(keys) if eps == self.eps and min_samples == self.min_samples else None
+            if (diff is None
+                    or len(diff[0]) + len(diff[1]) > min(INCREMENTAL_MAX_CHANGES, max(1, len(points) // 4))
+                    or self.size > 2 * len(points) + 1024):
+                self.rebuild(points, eps, min_samples)
+                ids = np.arange(len(points))
+                mode = "重建"
+            else:
+                added, removed, ids = diff
+                for i in removed.tolist():
+                    self.remove(i)
+                for row in added.tolist():
+                    ids[row] = self.insert(float(points[row, 0]), float(points[row, 1]), int(keys[row]))
+                mode = f"增量 (+{len(added)} / -{len(removed)})"
+            self._input_keys, self._input_ids = keys, ids
+
+            labels = self.labels[ids]
+            # 标签压缩为 0..簇数量-1（按内部标签顺序）
+            present = np.zeros(self.next_label + 1, dtype=bool)
+            present[labels[labels >= 0]] = True
+        remap = np.cumsum(present) - 1
+        result = np.where(labels >= 0, remap[labels], -1)
+        return result, int(present.sum()), mode
+
+    def clear(self):
+        """丢弃保存的状态，下一次 update 整体重建"""
+        with self._lock:
+            self.eps = None
+            self.min_samples = None
+            self._reset(np.empty((0, 2), dtype=np.float32))
+
+
+# 全局增量 DBSCAN 状态（界面中逐点编辑时共用）
+INCREMENTAL_DBSCAN = IncrementalDBSCAN()
@@ -5,8 +5,19 @@ OpenCV算子集合
 
 import cv2
 import numpy as np
+from collections import deque
 from typing import Dict, Tuple, Any
 
+from . import clustering
+from .image_io import image_digest
+from .incremental import INCREMENTAL_DBSCAN
+from .optics import REACHABILITY_CACHE, ReachabilityModel
+from .points import MAX_EXTRACT_POINTS, as_points, draw_clusters, extract_points
+from .profiling import stage
+from .spatial import GridIndex
+from .template_matching import (HEATMAP_RENDERER, RESPONSE_CACHE, auto_levels, draw_boxes, draw_pose,
+                                match_instances, pose_grid, pose_match, pyramid_match)
+
 
 class MorphologyOperator:
     """形态学操作类"""
@@ -14,13 +25,17 @@ class MorphologyOperator:
     @staticmethod
     def erode(image: np.ndarray, kernel_size: int = 5) -> Tuple[np.ndarray, Dict]:
         """腐蚀操作"""
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
-        result = cv2.erode(image, kernel, iterations=1)
+        with stage("构建核"):
+            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
+        with stage("计算"):
+            result = cv2.erode(image, kernel, iterations=1)
+        with stage("统计"):
+            white_pixels = np.sum(result > 0)
         
         stats = {
             "操作": "腐蚀",
             "核大小": f"{kernel_size}x{kernel_size}",
-            "白色像素数": np.sum(result > 0),
+            "白色像素数": white_pixels,
             "图像大小": f"{image.shape[0]}x{image.shape[1]}"
         }
         return result, stats
@@ -28,13 +43,17 @@ class MorphologyOperator:
     @staticmethod
     def dilate(image: np.ndarray, kernel_size: int = 5) -> Tuple[np.ndarray, Dict]:
         """膨胀操作"""
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
-        result = cv2.dilate(image, kernel, iterations=1)
+        with stage("构建核"):
+            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
+        with stage("计算"):
+            result = cv2.dilate(image, kernel, iterations=1)
+        with stage("统计"):
+            white_pixels = np.sum(result > 0)
         
         stats = {
             "操作": "膨胀",
             "核大小": f"{kernel_size}x{kernel_size}",
-            "白色像素数": np.sum(result > 0),
+            "白色像素数": white_pixels,
             "图像大小": f"{image.shape[0]}x{image.shape[1]}"
         }
         return result, stats
@@ -42,13 +61,17 @@ class MorphologyOperator:
     @staticmethod
     def open(image: np.ndarray, kernel_size: int = 5) -> Tuple[np.ndarray, Dict]:
         """开运算（先腐蚀后膨胀）"""
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
-        result = cv2.morphologyEx(image, cv2.MORPH_OPEN, kernel)
+        with stage("构建核"):
+            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
+        with stage("计算"):
+            result = cv2.morphologyEx(image, cv2.MORPH_OPEN, kernel)
+        with stage("统计"):
+            white_pixels = np.sum(result > 0)
         
         stats = {
             "操作": "开运算",
             "核大小": f"{kernel_size}x{kernel_size}",
-            "白色像素数": np.sum(result > 0),
+            "白色像素数": white_pixels,
             "图像大小": f"{image.shape[0]}x{image.shape[1]}"
         }
         return result, stats
@@ -56,13 +79,17 @@ class MorphologyOperator:
     @staticmethod
     def close(image: np.ndarray, kernel_size: int = 5) -> Tuple[np.ndarray, Dict]:
         """闭运算（先膨胀后腐蚀）"""
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
-        result = cv2.morphologyEx(image, cv2.MORPH_CLOSE, kernel)
+        with stage("构建核"):
+            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
+        with stage("计算"):
+            result = cv2.morphologyEx(image, cv2.MORPH_CLOSE, kernel)
+        with stage("统计"):
+            white_pixels = np.sum(result > 0)
         
         stats = {
             "操作": "闭运算",
             "核大小": f"{kernel_size}x{kernel_size}",
-            "白色像素数": np.sum(result > 0),
+            "白色像素数": white_pixels,
             "图像大小": f"{image.shape[0]}x{image.shape[1]}"
         }
         return result, stats
@@ -70,13 +97,17 @@ class MorphologyOperator:
     @staticmethod
     def gradient(image: np.ndarray, kernel_size: int = 5) -> Tuple[np.ndarray, Dict]:
         """形态学梯度（膨胀-腐蚀）"""
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
-        result = cv2.morphologyEx(image, cv2.MORPH_GRADIENT, kernel)
+        with stage("构建核"):
+            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
+        with stage("计算"):
+            result = cv2.morphologyEx(image, cv2.MORPH_GRADIENT, kernel)
+        with stage("统计"):
+            white_pixels = np.sum(result > 0)
         
         stats = {
             "操作": "形态学梯度",
             "核大小": f"{kernel_size}x{kernel_size}",
-            "白色像素数": np.sum(result > 0),
+            "白色像素数": white_pixels,
             "图像大小": f"{image.shape[0]}x{image.shape[1]}"
         }
         return result, stats
@@ -85,16 +116,24 @@ class MorphologyOperator:
 class EdgeDetectionOperator:
     """边缘检测操作类"""
     
+    @staticmethod
+    def _abs_response(response: np.ndarray) -> np.ndarray:
+        """梯度响应取绝对值并转为 uint8（逐像素操作，可分块执行）"""
+        return np.uint8(np.absolute(response))
+    
     @staticmethod
     def canny(image: np.ndarray, threshold1: int = 100, threshold2: int = 200) -> Tuple[np.ndarray, Dict]:
         """Canny边缘检测"""
-        result = cv2.Canny(image, threshold1, threshold2)
+        with stage("计算"):
+            result = cv2.Canny(image, threshold1, threshold2)
+        with stage("统计"):
+            white_pixels = np.sum(result > 0)
         
         stats = {
             "操作": "Canny边缘检测",
             "低阈值": threshold1,
             "高阈值": threshold2,
-            "白色像素数": np.sum(result > 0),
+            "白色像素数": white_pixels,
             "图像大小": f"{image.shape[0]}x{image.shape[1]}"
         }
         return result, stats
@@ -102,14 +141,18 @@ class EdgeDetectionOperator:
     @staticmethod
     def sobel_x(image: np.ndarray, ksize: int = 3) -> Tuple[np.ndarray, Dict]:
         """Sobel X方向边缘检测"""
-        result = cv2.Sobel(image, cv2.CV_32F, 1, 0, ksize=ksize)
-        result = np.uint8(np.absolute(result))
-        result = cv2.normalize(result, None, 0, 255, cv2.NORM_MINMAX)
+        with stage("计算"):
+            result = cv2.Sobel(image, cv2.CV_32F, 1, 0, ksize=ksize)
+            result = EdgeDetectionOperator._abs_response(result)
+        with stage("归一化"):
+            result = cv2.normalize(result, None, 0, 255, cv2.NORM_MINMAX)
+        with stage("统计"):
+            mean_value = np.mean(result)
         
         stats = {
             "操作": "Sobel X",
             "核大小": ksize,
-            "平均灰度值": np.mean(result),
+            "平均灰度值": mean_value,
             "图像大小": f"{image.shape[0]}x{image.shape[1]}"
         }
         return result, stats
@@ -117,14 +160,18 @@ class EdgeDetectionOperator:
     @staticmethod
     def sobel_y(image: np.ndarray, ksize: int = 3) -> Tuple[np.ndarray, Dict]:
         """Sobel Y方向边缘检测"""
-        result = cv2.Sobel(image, cv2.CV_32F, 0, 1, ksize=ksize)
-        result = np.uint8(np.absolute(result))
-        result = cv2.normalize(result, None, 0, 255, cv2.NORM_MINMAX)
+        with stage("计算"):
+            result = cv2.Sobel(image, cv2.CV_32F, 0, 1, ksize=ksize)
+            result = EdgeDetectionOperator._abs_response(result)
+        with stage("归一化"):
+            result = cv2.normalize(result, None, 0, 255, cv2.NORM_MINMAX)
+        with stage("统计"):
+            mean_value = np.mean(result)
         
         stats = {
             "操作": "Sobel Y",
             "核大小": ksize,
-            "平均灰度值": np.mean(result),
+            "平均灰度值": mean_value,
             "图像大小": f"{image.shape[0]}x{image.shape[1]}"
         }
         return result, stats
@@ -132,14 +179,18 @@ class EdgeDetectionOperator:
     @staticmethod
     def laplacian(image: np.ndarray, ksize: int = 1) -> Tuple[np.ndarray, Dict]:
         """Laplacian边缘检测"""
-        result = cv2.Laplacian(image, cv2.CV_32F, ksize=ksize)
-        result = np.uint8(np.absolute(result))
-        result = cv2.normalize(result, None, 0, 255, cv2.NORM_MINMAX)
+        with stage("计算"):
+            result = cv2.Laplacian(image, cv2.CV_32F, ksize=ksize)
+            result = EdgeDetectionOperator._abs_response(result)
+        with stage("归一化"):
+            result = cv2.normalize(result, None, 0, 255, cv2.NORM_MINMAX)
+        with stage("统计"):
+            mean_value = np.mean(result)
         
         stats = {
             "操作": "Laplacian",
             "核大小": ksize,
-            "平均灰度值": np.mean(result),
+            "平均灰度值": mean_value,
             "图像大小": f"{image.shape[0]}x{image.shape[1]}"
         }
         return result, stats
@@ -151,15 +202,19 @@ class ContourOperator:
     @staticmethod
     def find_contours(image: np.ndarray, kernel_size: int = 5) -> Tuple[np.ndarray, Dict]:
         """轮廓检测"""
-        contours, hierarchy = cv2.findContours(image, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        with stage("查找轮廓"):
+            contours, hierarchy = cv2.findContours(image, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
         
-        result = np.zeros_like(image)
-        cv2.drawContours(result, contours, -1, 255, 1)
+        with stage("绘制"):
+            result = np.zeros_like(image)
+            cv2.drawContours(result, contours, -1, 255, 1)
+        with stage("统计"):
+            white_pixels = np.sum(result > 0)
         
         stats = {
             "操作": "轮廓检测",
             "轮廓数量": len(contours),
-            "白色像素数": np.sum(result > 0),
+            "白色像素数": white_pixels,
             "图像大小": f"{image.shape[0]}x{image.shape[1]}"
         }
         return result, stats
@@ -167,18 +222,22 @@ class ContourOperator:
     @staticmethod
     def convex_hull(image: np.ndarray, kernel_size: int = 5) -> Tuple[np.ndarray, Dict]:
         """凸包检测"""
-        contours, _ = cv2.findContours(image, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+        with stage("查找轮廓"):
+            contours, _ = cv2.findContours(image, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
         
-        result = np.zeros_like(image)
-        for cnt in contours:
-            if len(cnt) > 2:
-                hull = cv2.convexHull(cnt)
-                cv2.drawContours(result, [hull], 0, 255, 1)
+        with stage("绘制"):
+            result = np.zeros_like(image)
+            for cnt in contours:
+                if len(cnt) > 2:
+                    hull = cv2.convexHull(cnt)
+                    cv2.drawContours(result, [hull], 0, 255, 1)
+        with stage("统计"):
+            white_pixels = np.sum(result > 0)
         
         stats = {
             "操作": "凸包",
             "轮廓数量": len(contours),
-            "白色像素数": np.sum(result > 0),
+            "白色像素数": white_pixels,
             "图像大小": f"{image.shape[0]}x{image.shape[1]}"
         }
         return result, stats
@@ -187,26 +246,123 @@ class ContourOperator:
 class SkeletonOperator:
     """骨架提取操作类"""
     
+    # 8 邻域偏移顺序：P2(北) P3(东北) P4(东) P5(东南) P6(南) P7(西南) P8(西) P9(西北)
+    _NEIGHBOR_OFFSETS = ((-1, 0), (-1, 1), (0, 1), (1, 1), (1, 0), (1, -1), (0, -1), (-1, -1))
+    _thinning_luts = None
+    # 一轮删除的像素少于 像素数 / (该值 × OpenCV 线程数) 时从整图处理切换为只检查候选像素
+    # （按单线程下两种方式在 4096x4096 掩码上的实测耗时选取）
+    _DENSE_RATIO = 40
+    
     @staticmethod
-    def skeleton(image: np.ndarray, kernel_size: int = 5) -> Tuple[np.ndarray, Dict]:
-        """骨架提取"""
-        result = image.copy()
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-        skeleton = np.zeros_like(image)
+    def _build_thinning_luts() -> Tuple[np.ndarray, np.ndarray]:
+        """构建 Zhang-Suen 两个子迭代的删除查找表（以 8 邻域编码为索引）"""
+        luts = (np.zeros(256, dtype=bool), np.zeros(256, dtype=bool))
+        for code in range(256):
+            p = [(code >> k) & 1 for k in range(8)]  # p[0]..p[7] 对应 P2..P9
+            b = sum(p)
+            a = sum(1 for k in range(8) if p[k] == 0 and p[(k + 1) % 8] == 1)
+            if not (2 <= b <= 6 and a == 1):
+                continue
+            p2, p4, p6, p8 = p[0], p[2], p[4], p[6]
+            luts[0][code] = p2 * p4 * p6 == 0 and p4 * p6 * p8 == 0
+            luts[1][code] = p2 * p4 * p8 == 0 and p2 * p6 * p8 == 0
+        return luts
+    
+    @staticmethod
+    def _thinning(binary: np.ndarray) -> Tuple[np.ndarray, int]:
+        """Zhang-Suen 细化
         
+        删除的像素较多时（开始的若干轮）整图处理：filter2D 一次算出所有像素的 8 邻域编码，
+        再用查找表判定并删除，全部为 OpenCV 调用（多核时并行）；
+        删除数降到阈值以下后改为只检查候选像素：每个子迭代只重新检查上一轮被删除像素的 3x3 邻域，
+        用查找表一次性判定整批候选像素。两种方式结果相同，返回 (0/1 细化结果, 迭代次数)
+        """
+        if SkeletonOperator._thinning_luts is None:
+            SkeletonOperator._thinning_luts = SkeletonOperator._build_thinning_luts()
+        luts = SkeletonOperator._thinning_luts
+        
+        h, w = binary.shape
+        stride = w + 2
+        # 预分配带 1 像素边框的工作缓冲区，按一维下标访问
+        padded = np.zeros((h + 2, w + 2), dtype=np.uint8)
+        padded[1:-1, 1:-1] = binary
+        flat = padded.ravel()
+        offsets = np.array([dy * stride + dx for dy, dx in SkeletonOperator._NEIGHBOR_OFFSETS], dtype=np.intp)
+        
+        # 整图阶段：第 k 位权重为 2^k 的相关核得到邻域编码（最大 255，uint8 精确）
+        kernel = np.zeros((3, 3), dtype=np.float32)
+        for bit, (dy, dx) in enumerate(SkeletonOperator._NEIGHBOR_OFFSETS):
+            kernel[dy + 1, dx + 1] = 1 << bit
+        dense_luts = [lut.astype(np.uint8).reshape(1, 256) for lut in luts]
+        codes = np.empty_like(padded)
+        switch = padded.size / (SkeletonOperator._DENSE_RATIO * max(1, cv2.getNumThreads()))
+        
+        iterations = 0
+        if cv2.countNonZero(padded) == 0:
+            return padded[1:-1, 1:-1], iterations
         while True:
-            eroded = cv2.erode(result, kernel)
-            dilated = cv2.dilate(eroded, kernel)
-            diff = cv2.subtract(result, dilated)
-            skeleton = cv2.bitwise_or(skeleton, diff)
-            result = eroded
-            
-            if cv2.countNonZero(result) == 0:
+            iterations += 1
+            deleted = 0
+            for step in (0, 1):
+                cv2.filter2D(padded, cv2.CV_8U, kernel, dst=codes, borderType=cv2.BORDER_CONSTANT)
+                cv2.LUT(codes, dense_luts[step], dst=codes)
+                cv2.bitwise_and(codes, padded, dst=codes)
+                deleted += cv2.countNonZero(codes)
+                cv2.subtract(padded, codes, dst=padded)
+            if deleted == 0:
+                return padded[1:-1, 1:-1], iterations
+            if deleted < switch:
                 break
         
+        # 候选阶段：当前所有边界像素（邻居不全为前景）是下一轮可能被删除的像素的超集；
+        # queued[step] 标记已在该子迭代候选列表中的像素，追加时据此去重
+        cv2.filter2D(padded, cv2.CV_8U, kernel, dst=codes, borderType=cv2.BORDER_CONSTANT)
+        boundary = np.flatnonzero(flat & (codes.ravel() != 255))
+        queued = (np.zeros(flat.size, dtype=bool), np.zeros(flat.size, dtype=bool))
+        queued[0][boundary] = queued[1][boundary] = True
+        pending = [boundary, boundary]
+        
+        while len(pending[0]) or len(pending[1]):
+            iterations += 1
+            for step in (0, 1):
+                cand = pending[step]
+                queued[step][cand] = False
+                cand = cand[flat[cand] == 1]
+                if len(cand) == 0:
+                    pending[step] = cand
+                    continue
+                codes = flat[cand + offsets[0]].copy()
+                for bit in range(1, 8):
+                    codes |= flat[cand + offsets[bit]] << bit
+                deleted = cand[luts[step][codes]]
+                flat[deleted] = 0
+                # 被删像素仍为前景的 8 邻居需要在两个子迭代中重新检查（同一偏移下不会重复，跨偏移用 queued 去重）
+                touched = []
+                for offset in offsets:
+                    neighbors = deleted + offset
+                    neighbors = neighbors[(flat[neighbors] == 1) & ~queued[step][neighbors]]
+                    queued[step][neighbors] = True
+                    touched.append(neighbors)
+                pending[step] = touched = np.concatenate(touched)
+                other = touched[~queued[1 - step][touched]]
+                queued[1 - step][other] = True
+                pending[1 - step] = np.concatenate((pending[1 - step], other))
+        
+        return padded[1:-1, 1:-1], iterations
+    
+    @staticmethod
+    def skeleton(image: np.ndarray, kernel_size: int = 5) -> Tuple[np.ndarray, Dict]:
+        """骨架提取（Zhang-Suen 细化）"""
+        with stage("细化"):
+            thinned, iterations = SkeletonOperator._thinning((image > 0).view(np.uint8))
+        with stage("统计"):
+            skeleton = thinned * np.uint8(255)
+            white_pixels = int(np.count_nonzero(thinned))
+        
         stats = {
             "操作": "骨架提取",
-            "白色像素数": np.sum(skeleton > 0),
+            "白色像素数": white_pixels,
+            "迭代次数": iterations,
             "图像大小": f"{image.shape[0]}x{image.shape[1]}"
         }
         return skeleton, stats
@@ -218,14 +374,19 @@ class DistanceOperator:
     @staticmethod
     def distance_transform(image: np.ndarray, kernel_size: int = 5) -> Tuple[np.ndarray, Dict]:
         """欧氏距离变换"""
-        dist = cv2.distanceTransform(image, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
-        dist_norm = cv2.normalize(dist, None, 0, 255, cv2.NORM_MINMAX)
-        result = np.uint8(dist_norm)
+        with stage("距离变换"):
+            dist = cv2.distanceTransform(image, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+        with stage("归一化"):
+            dist_norm = cv2.normalize(dist, None, 0, 255, cv2.NORM_MINMAX)
+            result = np.uint8(dist_norm)
+        with stage("统计"):
+            max_dist = np.max(dist)
+            mean_dist = np.mean(dist[dist > 0]) if np.any(dist > 0) else 0
         
         stats = {
             "操作": "距离变换",
-            "最大距离": np.max(dist),
-            "平均距离": np.mean(dist[dist > 0]) if np.any(dist > 0) else 0,
+            "最大距离": max_dist,
+            "平均距离": mean_dist,
             "图像大小": f"{image.shape[0]}x{image.shape[1]}"
         }
         return result, stats
@@ -235,36 +396,64 @@ class TemplateMatchingOperator:
     """模板匹配操作类"""
     
     @staticmethod
-    def template_match(source_image: np.ndarray, template_image: np.ndarray = None, show_heatmap: bool = False) -> Tuple[np.ndarray, Dict]:
-        """模板匹配"""
+    def template_match(source_image: np.ndarray, template_image: np.ndarray = None, show_heatmap: bool = False,
+                       pyramid_levels: int = 0, max_matches: int = 1, score_threshold: float = 0.8,
+                       nms_iou: float = 0.3, rotation_range: float = 0.0, angle_step: float = 5.0,
+                       scale_range: float = 0.0, scale_step: float = 0.05) -> Tuple[np.ndarray, Dict]:
+        """模板匹配
+
+        pyramid_levels > 0 时使用金字塔由粗到精搜索（大图、大模板时快一个数量级），
+        得分仍为原分辨率下的归一化相关系数；热力图为最粗层响应图。
+        pyramid_levels < 0 时自动选择层数，使最粗层源图像不超过显示尺寸。
+        max_matches 不为 1 时为多目标模式：只计算一次响应图，提取得分不低于 score_threshold 的峰值，
+        经 NMS（IoU 阈值 nms_iou）去重后取前 max_matches 个（0 表示不限），此模式不使用金字塔。
+        rotation_range / scale_range 大于 0 时为位姿模式：在 ±rotation_range 度（步长 angle_step）、
+        1 ± scale_range（步长 scale_step）范围内搜索，返回最佳位姿 (x, y, 角度, 缩放)，不显示热力图
+        """
         if template_image is None or template_image.size == 0:
             raise ValueError("模板图像为空，请先指定模板区域")
         
         if source_image.shape[0] < template_image.shape[0] or source_image.shape[1] < template_image.shape[1]:
             raise ValueError("模板图像大于源图像，无法进行匹配")
         
-        # 使用归一化相关系数匹配
-        match_result = cv2.matchTemplate(source_image, template_image, cv2.TM_CCOEFF_NORMED)
+        if rotation_range > 0 or scale_range > 0:
+            return TemplateMatchingOperator._match_pose(
+                source_image, template_image, pyramid_levels, rotation_range, angle_step, scale_range, scale_step)
+        
+        if max_matches != 1:
+            return TemplateMatchingOperator._match_instances(
+                source_image, template_image, show_heatmap, max_matches, score_threshold, nms_iou)
+        
+        if pyramid_levels < 0:
+            pyramid_levels = auto_levels(source_image.shape)
         
-        # 找到最优匹配位置
-        min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(match_result)
-        top_left = max_loc
+        # 使用归一化相关系数匹配（响应按源图像/模板缓冲区缓存，只切换显示模式时不重新计算）
+        if pyramid_levels > 0:
+            with stage("匹配"):
+                (max_val, top_left, match_result, levels), cached = RESPONSE_CACHE.get_or_compute(
+                    source_image, template_image, ("金字塔", pyramid_levels),
+                    lambda: pyramid_match(source_image, template_image, pyramid_levels))
+        else:
+            with stage("匹配"):
+                match_result, cached = TemplateMatchingOperator._full_response(source_image, template_image)
+            
+            # 找到最优匹配位置
+            with stage("定位"):
+                min_val, max_val, min_loc, max_loc = cv2.minMaxLoc(match_result)
+            top_left = max_loc
+            levels = 0
         score = max_val  # 使用 max_val 作为置信度分数
         bottom_right = (top_left[0] + template_image.shape[1], top_left[1] + template_image.shape[0])
         
-        if show_heatmap:
-            # 归一化到 0-255 并转为 uint8
-            heatmap = cv2.normalize(match_result, None, 0, 255, cv2.NORM_MINMAX)
-            heatmap = np.uint8(heatmap)
-            # 应用伪彩色 colormap
-            result_image = cv2.applyColorMap(heatmap, cv2.COLORMAP_JET)
-            # 调整热力图大小以便于观看（如果太小）
-            if result_image.shape[0] < source_image.shape[0] or result_image.shape[1] < source_image.shape[1]:
-                 result_image = cv2.resize(result_image, (source_image.shape[1], source_image.shape[0]))
-        else:
-            # 在源图像上绘制匹配框（转为 BGR 彩色图以保留绿色）
-            result_image = cv2.cvtColor(source_image, cv2.COLOR_GRAY2BGR)
-            cv2.rectangle(result_image, top_left, bottom_right, (0, 255, 0), 2)
+        with stage("绘制"):
+            if show_heatmap:
+                # 归一化到 0-255 后经查找表映射为伪彩色，太小时放大到源图像大小以便于观看
+                result_image = HEATMAP_RENDERER.render(match_result, (source_image.shape[1], source_image.shape[0]))
+            else:
+                # 在源图像上绘制匹配框（转为 BGR 彩色图以保留绿色）
+                result_image = cv2.cvtColor(source_image, cv2.COLOR_GRAY2BGR)
+                cv2.rectangle(result_image, top_left, bottom_right, (0, 255, 0),
+                              TemplateMatchingOperator._box_thickness(source_image))
         
         # 返回 BGR 彩色图
         stats = {
@@ -272,197 +461,298 @@ class TemplateMatchingOperator:
             "模式": "热力图" if show_heatmap else "框选",
             "置信度 (Score)": f"{max_val:.4f}",
             "匹配位置": f"({top_left[0]}, {top_left[1]})",
+            "金字塔层数": levels,
+            "响应图缓存": "命中" if cached else "未命中",
             "模板大小": f"{template_image.shape[1]}x{template_image.shape[0]}",
             "源图像大小": f"{source_image.shape[1]}x{source_image.shape[0]}"
         }
         return result_image, stats
 
-
-class ClusterOperator:
-    """聚类算法类"""
-
     @staticmethod
-    def _extract_points(image: np.ndarray) -> np.ndarray:
-        """从二值图像中提取黑色点的中心坐标 (x, y)
-        使用距离变换 + 局部极大值检测来分离重叠的点
+    def find(source_image: np.ndarray, template_image: np.ndarray, pyramid_levels: int = 0, max_matches: int = 1,
+             score_threshold: float = 0.8, nms_iou: float = 0.3) -> Tuple[np.ndarray, np.ndarray]:
+        """只定位不绘制，也不使用响应图缓存（供批量搜索使用）
+
+        返回 (框 (n, 4) 的 [x, y, w, h], 得分)；max_matches 为 1 时返回唯一的最佳匹配（不论得分），
+        否则与多目标模式相同
         """
-        # 假设背景为白(255)，前景为黑(0)
-        # 如果是灰度图，先二值化
-        _, binary = cv2.threshold(image, 127, 255, cv2.THRESH_BINARY_INV)
+        if template_image is None or template_image.size == 0:
+            raise ValueError("模板图像为空，请先指定模板区域")
+        if source_image.shape[0] < template_image.shape[0] or source_image.shape[1] < template_image.shape[1]:
+            raise ValueError("模板图像大于源图像，无法进行匹配")
         
-        # 使用距离变换找到点的中心
-        dist_transform = cv2.distanceTransform(binary, cv2.DIST_L2, 5)
+        th, tw = template_image.shape[:2]
+        if max_matches != 1:
+            response = cv2.matchTemplate(source_image, template_image, cv2.TM_CCOEFF_NORMED)
+            return match_instances(response, template_image.shape, score_threshold, max_matches, nms_iou)
         
-        # 归一化距离变换结果
-        if dist_transform.max() > 0:
-            dist_normalized = dist_transform / dist_transform.max()
+        if pyramid_levels < 0:
+            pyramid_levels = auto_levels(source_image.shape)
+        if pyramid_levels > 0:
+            score, (x, y), _, _ = pyramid_match(source_image, template_image, pyramid_levels)
         else:
-            dist_normalized = dist_transform
-        
-        # 找到局部极大值作为点的中心
-        # 使用膨胀操作找局部极大值
-        kernel_size = 7  # 调整此值可改变检测灵敏度
-        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
-        dilated = cv2.dilate(dist_transform, kernel)
+            _, score, _, (x, y) = cv2.minMaxLoc(cv2.matchTemplate(source_image, template_image, cv2.TM_CCOEFF_NORMED))
+        return np.array([[x, y, tw, th]], dtype=np.int32), np.array([score], dtype=np.float32)
+
+    @staticmethod
+    def _full_response(source_image: np.ndarray, template_image: np.ndarray):
+        """原分辨率响应图（带缓存），返回 (响应图, 是否命中缓存)"""
+        return RESPONSE_CACHE.get_or_compute(
+            source_image, template_image, "整图",
+            lambda: cv2.matchTemplate(source_image, template_image, cv2.TM_CCOEFF_NORMED))
+
+    @staticmethod
+    def _box_thickness(source_image: np.ndarray) -> int:
+        """匹配框线宽随图像尺寸增加，原始分辨率大图缩小显示后仍清晰可见"""
+        return max(2, max(source_image.shape[:2]) // 300)
+
+    @staticmethod
+    def _match_pose(source_image: np.ndarray, template_image: np.ndarray, pyramid_levels: int,
+                    rotation_range: float, angle_step: float, scale_range: float,
+                    scale_step: float) -> Tuple[np.ndarray, Dict]:
+        """旋转/缩放容忍的模板匹配"""
+        angles, scales = pose_grid(rotation_range, angle_step, scale_range, scale_step)
         
-        # 局部极大值：距离变换值等于膨胀后的值，且距离大于阈值
-        threshold = 0.3 * dist_transform.max() if dist_transform.max() > 0 else 0
-        local_max = (dist_transform == dilated) & (dist_transform > threshold)
+        with stage("匹配"):
+            pose = pose_match(source_image, template_image, angles, scales, pyramid_levels)
         
-        # 获取局部极大值的坐标
-        ys, xs = np.where(local_max)
-        points = np.column_stack((xs, ys))
+        with stage("绘制"):
+            result_image = draw_pose(cv2.cvtColor(source_image, cv2.COLOR_GRAY2BGR), template_image.shape, pose,
+                                     thickness=TemplateMatchingOperator._box_thickness(source_image))
         
-        # 如果没有找到点，退回到轮廓检测
-        if len(points) == 0:
-            contours, _ = cv2.findContours(binary, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-            points = []
-            for cnt in contours:
-                M = cv2.moments(cnt)
-                if M["m00"] != 0:
-                    cX = int(M["m10"] / M["m00"])
-                    cY = int(M["m01"] / M["m00"])
-                    points.append([cX, cY])
-            points = np.array(points) if points else np.array([])
-        
-        # 如果仍然没有点，检查是否有任何前景像素
-        if len(points) == 0:
-            ys, xs = np.where(binary > 0)
-            if len(xs) > 0:
-                points = np.column_stack((xs, ys))
-            
-        return np.array(points, dtype=np.float32) if len(points) > 0 else np.array([], dtype=np.float32).reshape(0, 2)
+        stats = {
+            "操作": "模板匹配",
+            "模式": "位姿框选",
+            "置信度 (Score)": f"{pose.score:.4f}",
+            "匹配中心": f"({pose.center[0]:.1f}, {pose.center[1]:.1f})",
+            "角度": pose.angle,
+            "缩放": pose.scale,
+            "候选位姿数": f"{pose.candidates} / {pose.variants}",
+            "模板大小": f"{template_image.shape[1]}x{template_image.shape[0]}",
+            "源图像大小": f"{source_image.shape[1]}x{source_image.shape[0]}"
+        }
+        return result_image, stats
 
     @staticmethod
-    def _draw_cluster_result(image: np.ndarray, points: np.ndarray, labels: np.ndarray, k_or_n_clusters: int) -> np.ndarray:
-        """绘制聚类结果"""
-        h, w = image.shape[:2]
-        result = np.ones((h, w, 3), dtype=np.uint8) * 255  # 白底
-        
-        # 生成颜色表
-        if k_or_n_clusters > 0:
-            # 固定随机种子以保持颜色一致
-            np.random.seed(42)
-            colors = np.random.randint(0, 255, (k_or_n_clusters, 3)).tolist()
-        else:
-            colors = []
+    def _match_instances(source_image: np.ndarray, template_image: np.ndarray, show_heatmap: bool,
+                         max_matches: int, score_threshold: float, nms_iou: float) -> Tuple[np.ndarray, Dict]:
+        """多目标模板匹配"""
+        with stage("匹配"):
+            match_result, cached = TemplateMatchingOperator._full_response(source_image, template_image)
+        
+        with stage("定位"):
+            boxes, scores = match_instances(match_result, template_image.shape, score_threshold,
+                                            max_matches, nms_iou)
+        
+        with stage("绘制"):
+            if show_heatmap:
+                result_image = HEATMAP_RENDERER.render(match_result, (source_image.shape[1], source_image.shape[0]))
+            else:
+                result_image = draw_boxes(cv2.cvtColor(source_image, cv2.COLOR_GRAY2BGR), boxes,
+                                          thickness=TemplateMatchingOperator._box_thickness(source_image))
+        
+        stats = {
+            "操作": "模板匹配",
+            "模式": "热力图" if show_heatmap else "多目标框选",
+            "匹配数量": len(boxes),
+            "置信度 (Score)": f"{scores[0]:.4f}" if len(boxes) else "无",
+            "匹配位置": f"({boxes[0][0]}, {boxes[0][1]})" if len(boxes) else "无",
+            "匹配框": [(int(x), int(y), round(float(score), 4)) for (x, y, _, _), score in zip(boxes, scores)],
+            "得分阈值": score_threshold,
+            "响应图缓存": "命中" if cached else "未命中",
+            "模板大小": f"{template_image.shape[1]}x{template_image.shape[0]}",
+            "源图像大小": f"{source_image.shape[1]}x{source_image.shape[0]}"
+        }
+        return result_image, stats
 
-        # 噪点颜色 (黑色或灰色)
-        noise_color = (128, 128, 128)
 
-        for point, label in zip(points, labels):
-            x, y = int(point[0]), int(point[1])
-            if label == -1:
-                color = noise_color
-            else:
-                # 确保 label 在颜色范围内
-                color_idx = label % len(colors)
-                color = colors[color_idx]
-                # BGR
-                color = (int(color[0]), int(color[1]), int(color[2]))
+class ClusterOperator:
+    """聚类算法类"""
 
-            cv2.circle(result, (x, y), 6, color, -1)
-            cv2.circle(result, (x, y), 7, (0, 0, 0), 1) # 描边
+    @staticmethod
+    def _extract_points(image: np.ndarray, max_points: int = MAX_EXTRACT_POINTS) -> np.ndarray:
+        """从二值图像中提取黑色点的中心坐标 (x, y)
+        每个连通域取质心，粘连的大连通域用距离变换局部极大值拆分，点数超过 max_points 时分层抽样
+        """
+        return extract_points(image, max_points)
 
-        return result
+    @staticmethod
+    def _draw_cluster_result(image: np.ndarray, points: np.ndarray, labels: np.ndarray, k_or_n_clusters: int) -> np.ndarray:
+        """绘制聚类结果（向量化绘制，颜色表使用局部随机数生成器，可在多个线程中同时调用）"""
+        return draw_clusters(image.shape, points, labels, k_or_n_clusters)
 
     @staticmethod
-    def kmeans(image: np.ndarray, k: int = 3) -> Tuple[np.ndarray, Dict]:
-        """KMeans 聚类"""
-        points = ClusterOperator._extract_points(image)
+    def kmeans(image: np.ndarray, k: int = 3, seed: int = 0, warm_start: bool = False,
+               attempts: int = 10, points: np.ndarray = None) -> Tuple[np.ndarray, Dict]:
+        """KMeans 聚类
+
+        warm_start 为 True 时，点集与上一次运行几乎相同（如只调整 K）则从上次的中心热启动
+        （读写进程内全局缓存，结果依赖之前的调用，只用于界面中的交互运行）；
+        否则并行执行 attempts 次重启取紧致度最小的结果（同一 seed 结果固定），点数较多时每次重启使用 Mini-Batch 迭代。
+        给出 points（(N, 2) 坐标）时直接聚类这些点，image 只决定结果图大小
+        """
+        if points is not None:
+            points = as_points(points)
+        else:
+            with stage("提取点"):
+                points = ClusterOperator._extract_points(image)
         
         if len(points) < k:
              stats = {"状态": "错误", "信息": f"点数量 ({len(points)}) 少于簇数量 ({k})"}
              return image, stats
 
-        # OpenCV kmeans 要求 float32
-        criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 100, 0.2)
-        _, labels, centers = cv2.kmeans(points, k, None, criteria, 10, cv2.KMEANS_RANDOM_CENTERS)
+        with stage("聚类"):
+            run = clustering.kmeans(points, k, seed=seed, warm_start=warm_start, attempts=attempts)
         
-        result_image = ClusterOperator._draw_cluster_result(image, points, labels.flatten(), k)
+        with stage("绘制"):
+            result_image = ClusterOperator._draw_cluster_result(image, points, run.labels, k)
         
         stats = {
             "操作": "KMeans",
+            "模式": run.mode,
             "点数量": len(points),
             "簇数量(K)": k,
-            "中心点": str([list(map(int, c)) for c in centers])
+            "迭代次数": run.iterations,
+            "提前终止": f"{run.aborted}/{attempts}" if run.mode.endswith("多次重启") else "-",
+            "紧致度": round(run.inertia, 2),
+            "中心点": str([list(map(int, c)) for c in run.centers])
         }
         return result_image, stats
 
     @staticmethod
     def _dbscan_impl(X, eps, min_samples):
-        """DBSCAN numpy 实现"""
+        """DBSCAN numpy 实现（网格哈希邻域索引）"""
         n = X.shape[0]
         labels = np.full(n, -1, dtype=int)  # -1 表示未分类/噪点
         cluster_id = 0
         
-        # 计算距离矩阵 (N, N)
-        dists = np.sqrt(np.sum((X[:, None, :] - X[None, :, :]) ** 2, axis=-1))
+        # 按 eps 分桶建立邻域索引，先批量算出每个点的邻居数量判断核心点
+        index = GridIndex(X, eps)
+        is_core = index.neighbor_counts() >= min_samples
         
         visited = np.zeros(n, dtype=bool)
+        queued = np.zeros(n, dtype=bool)  # 已加入过扩展队列的点（位图代替列表查重）
         
         for i in range(n):
             if visited[i]:
                 continue
             
             visited[i] = True
-            # 找到邻域内的所有点（包括自己）
-            neighbors = np.where(dists[i] <= eps)[0]
             
             # 如果邻居数量不足，标记为噪点
-            if len(neighbors) < min_samples:
-                labels[i] = -1
-            else:
-                # 是核心点，开始新簇
-                labels[i] = cluster_id
-                
-                # 使用队列扩展簇
-                seed_set = list(neighbors)
+            if not is_core[i]:
+                continue
+            
+            # 是核心点，开始新簇
+            labels[i] = cluster_id
+            
+            # 使用队列扩展簇
+            seed_set = index.query(i)
+            seed_set = seed_set[~queued[seed_set]]
+            queued[seed_set] = True
+            queue = deque(seed_set.tolist())
+            
+            while queue:
+                q = queue.popleft()
                 
-                j = 0
-                while j < len(seed_set):
-                    q = seed_set[j]
-                    j += 1
-                    
-                    # 如果 q 之前被标记为噪点，现在改为当前簇的边界点
-                    if labels[q] == -1:
-                        labels[q] = cluster_id
-                    
-                    # 如果 q 已经被访问过，跳过
-                    if visited[q]:
-                        continue
-                    
-                    visited[q] = True
+                # 如果 q 之前被标记为噪点，现在改为当前簇的边界点
+                if labels[q] == -1:
                     labels[q] = cluster_id
-                    
-                    # 检查 q 的邻域
-                    q_neighbors = np.where(dists[q] <= eps)[0]
-                    
-                    # 如果 q 也是核心点，将其邻居加入seed_set
-                    if len(q_neighbors) >= min_samples:
-                        for neighbor in q_neighbors:
-                            if neighbor not in seed_set:
-                                seed_set.append(neighbor)
                 
-                cluster_id += 1
+                # 如果 q 已经被访问过，跳过
+                if visited[q]:
+                    continue
+                
+                visited[q] = True
+                
+                # 如果 q 也是核心点，将其邻居加入队列
+                if is_core[q]:
+                    q_neighbors = index.query(q)
+                    new_neighbors = q_neighbors[~queued[q_neighbors]]
+                    queued[new_neighbors] = True
+                    queue.extend(new_neighbors.tolist())
+            
+            cluster_id += 1
         
         return labels, cluster_id
 
     @staticmethod
-    def dbscan(image: np.ndarray, eps: float = 30.0, min_samples: int = 5) -> Tuple[np.ndarray, Dict]:
-        """DBSCAN 聚类"""
-        points = ClusterOperator._extract_points(image)
+    def dbscan(image: np.ndarray, eps: float = 30.0, min_samples: int = 5,
+               points: np.ndarray = None, incremental: bool = False) -> Tuple[np.ndarray, Dict]:
+        """DBSCAN 聚类
+
+        前几次运行直接用网格 DBSCAN；同一图像（或给出的点集）和 min_samples 的 eps 被连续调整后，
+        建立并缓存 OPTICS 可达性排序（max_eps 为用过的 eps 的数倍），之后调整 eps 只需线性时间提取标签。
+        给出 points（(N, 2) 坐标）时直接聚类这些点，image 只决定结果图大小；
+        incremental 为 True 时与上一次的点集比较，只在增删点的附近局部更新（适合逐点编辑）
+        """
+        if points is not None:
+            points = as_points(points)
+            if incremental:
+                return ClusterOperator._dbscan_incremental(image, points, eps, min_samples)
+        digest = image_digest(image if points is None else points)
+        model = REACHABILITY_CACHE.lookup(digest, min_samples, eps)
+        cache_state = "命中" if model is not None else "未建立"
+        if model is None:
+            if points is None:
+                points = REACHABILITY_CACHE.points(digest)
+            if points is None:
+                with stage("提取点"):
+                    points = ClusterOperator._extract_points(image)
+            # 前几次运行直接用网格 DBSCAN，eps 被连续调整后才建立可达性排序
+            max_eps = REACHABILITY_CACHE.observe(digest, min_samples, eps, points)
+            if max_eps is not None and len(points):
+                with stage("可达性排序"):
+                    model = ReachabilityModel(points, min_samples, max_eps)
+                REACHABILITY_CACHE.store(digest, model)
+                cache_state = "新建"
+        else:
+            points = model.points
         
         if len(points) == 0:
              stats = {"状态": "错误", "信息": "没有检测到点"}
              return image, stats
 
-        labels, n_clusters = ClusterOperator._dbscan_impl(points, eps, min_samples)
+        with stage("聚类"):
+            if model is not None:
+                labels, n_clusters = model.dbscan(eps)
+            else:
+                labels, n_clusters = ClusterOperator._dbscan_impl(points, eps, min_samples)
         
-        result_image = ClusterOperator._draw_cluster_result(image, points, labels, n_clusters)
+        with stage("绘制"):
+            result_image = ClusterOperator._draw_cluster_result(image, points, labels, n_clusters)
         
         # 统计噪点
-        n_noise = list(labels).count(-1)
+        n_noise = int(np.count_nonzero(labels == -1))
+        suggested = model.suggest_eps() if model is not None else None
+        
+        stats = {
+            "操作": "DBSCAN",
+            "点数量": len(points),
+            "Epsilon": eps,
+            "Min Samples": min_samples,
+            "发现簇数量": n_clusters,
+            "噪点数量": n_noise,
+            "k-距离曲线": str([round(float(d), 1) if np.isfinite(d) else f">{model.max_eps:g}"
+                             for d in model.k_distance_curve()]) if model is not None else "-",
+            "建议Epsilon": round(suggested, 1) if suggested is not None else "-",
+            "可达性缓存": cache_state
+        }
+        return result_image, stats
+
+    @staticmethod
+    def _dbscan_incremental(image: np.ndarray, points: np.ndarray, eps: float,
+                            min_samples: int) -> Tuple[np.ndarray, Dict]:
+        """增量 DBSCAN：保留上一次的邻域索引和核心点状态，只局部更新增删的点"""
+        if len(points) == 0:
+             stats = {"状态": "错误", "信息": "没有检测到点"}
+             return image, stats
+
+        with stage("聚类"):
+            labels, n_clusters, update_mode = INCREMENTAL_DBSCAN.update(points, eps, min_samples)
+        
+        with stage("绘制"):
+            result_image = ClusterOperator._draw_cluster_result(image, points, labels, n_clusters)
         
         stats = {
             "操作": "DBSCAN",
@@ -470,7 +760,8 @@ class ClusterOperator:
             "Epsilon": eps,
             "Min Samples": min_samples,
             "发现簇数量": n_clusters,
-            "噪点数量": n_noise
+            "噪点数量": int(np.count_nonzero(labels == -1)),
+            "更新方式": update_mode
         }
         return result_image, stats
 
@@ -0,0 +1,185 @@
+"""
+OPTICS 可达性排序
+对一个点集预先计算核心距离和可达性排序（邻域半径上限为 max_eps），
+之后任意 eps <= max_eps 的 DBSCAN 标签都可以在线性时间内从排序中提取；
+结果按图像内容摘要和 min_samples 缓存，交互调整 eps 时不再重新提取点和聚类。
+建立排序比单次网格 DBSCAN 慢数倍，因此只在同一点集的 eps 被连续调整时才建立，之前的调用直接聚类。
+"""
+
+import heapq
+import threading
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+import numpy as np
+
+from .spatial import GridIndex
+
+
+# 未命中时按 eps 的倍数确定 max_eps，之后在该范围内调整 eps 都不需要重新计算
+REACHABILITY_HEADROOM = 4.0
+
+# 同一点集和 min_samples 的 eps 改变该次数后才建立可达性排序
+SWEEP_BUILD_CHANGES = 2
+
+# 统计信息中 k-距离曲线的采样点数
+K_DISTANCE_SAMPLES = 10
+
+
+class ReachabilityModel:
+    """一个点集的核心距离、可达距离和 OPTICS 排序"""
+
+    def __init__(self, points: np.ndarray, min_samples: int, max_eps: float):
+        self.points = points
+        self.min_samples = min_samples
+        self.max_eps = float(max_eps)
+        n = len(points)
+        self.reachability = np.full(n, np.inf)
+        self.ordering = np.empty(n, dtype=np.int64)
+        # 每个点作为边界点所需的最小 eps 及对应的核心点；
+        # 用于补上排序中先于其核心邻居出现、被误判为噪点的边界点
+        self.border_reach = np.full(n, np.inf)
+        self.border_core = np.full(n, -1, dtype=np.int64)
+        if n == 0:
+            self.core_distances = np.empty(0)
+            return
+        index = GridIndex(points, max_eps)
+        self.core_distances = index.kth_neighbor_distances(min_samples)
+        self._build_ordering(index)
+
+    def _build_ordering(self, index: GridIndex):
+        """按可达距离最小优先扩展（堆中的过期条目在弹出时跳过）"""
+        core = self.core_distances
+        reach = self.reachability
+        processed = np.zeros(len(core), dtype=bool)
+        pos = 0
+        for start in range(len(core)):
+            if processed[start]:
+                continue
+            heap = [(np.inf, start)]
+            while heap:
+                _, p = heapq.heappop(heap)
+                if processed[p]:
+                    continue
+                processed[p] = True
+                self.ordering[pos] = p
+                pos += 1
+                if not np.isfinite(core[p]):
+                    continue
+                neighbors, dists = index.query_distances(p)
+                via = np.maximum(dists, core[p])
+                closer = via < self.border_reach[neighbors]
+                self.border_reach[neighbors[closer]] = via[closer]
+                self.border_core[neighbors[closer]] = p
+                fresh = ~processed[neighbors]
+                neighbors = neighbors[fresh]
+                new_reach = np.maximum(dists[fresh], core[p])
+                better = new_reach < reach[neighbors]
+                neighbors, new_reach = neighbors[better], new_reach[better]
+                reach[neighbors] = new_reach
+                for r, q in zip(new_reach.tolist(), neighbors.tolist()):
+                    heapq.heappush(heap, (r, q))
+
+    def dbscan(self, eps: float) -> Tuple[np.ndarray, int]:
+        """提取 eps 下的 DBSCAN 标签 (labels, 簇数量)，噪点为 -1
+
+        核心点和噪点与 DBSCAN 完全一致；同时位于多个簇邻域内的边界点按排序归入先扩展到它的簇
+        """
+        if eps > self.max_eps:
+            raise ValueError(f"eps ({eps}) 超过预计算的上限 ({self.max_eps})")
+        reach = self.reachability[self.ordering]
+        core = self.core_distances[self.ordering]
+        far = reach > eps
+        near_core = core <= eps
+        ordered = np.cumsum(far & near_core) - 1
+        ordered[far & ~near_core] = -1
+        labels = np.empty(len(ordered), dtype=int)
+        labels[self.ordering] = ordered
+        stray = (labels == -1) & (self.border_reach <= eps)
+        labels[stray] = labels[self.border_core[stray]]
+        n_clusters = int(ordered.max()) + 1 if len(ordered) else 0
+        return labels, n_clusters
+
+    def k_distance_curve(self, samples: int = K_DISTANCE_SAMPLES) -> np.ndarray:
+        """升序 k-距离曲线（k = min_samples）的等间隔采样；超过 max_eps 的为 inf"""
+        if len(self.core_distances) == 0:
+            return np.empty(0)
+        curve = np.sort(self.core_distances)
+        ranks = np.linspace(0, len(curve) - 1, min(samples, len(curve))).round().astype(int)
+        return curve[ranks]
+
+    def suggest_eps(self) -> Optional[float]:
+        """k-距离曲线的拐点（归一化后离首尾连线最远的点），可作为 eps 的参考值"""
+        curve = np.sort(self.core_distances[np.isfinite(self.core_distances)])
+        if len(curve) < 3 or curve[-1] <= curve[0]:
+            return None
+        x = np.linspace(0, 1, len(curve))
+        y = (curve - curve[0]) / (curve[-1] - curve[0])
+        return float(curve[np.argmax(x - y)])
+
+
+class ReachabilityCache:
+    """按 (图像摘要, min_samples) 缓存可达性模型的 LRU 缓存"""
+
+    def __init__(self, max_entries: int = 4):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        # 尚未建立模型的 (图像摘要, min_samples) -> (点集, 依次用过的 eps)
+        self._sweeps = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, digest: str, min_samples: int, eps: float) -> Optional[ReachabilityModel]:
+        """max_eps 覆盖 eps 的缓存模型，没有则返回 None"""
+        with self._lock:
+            model = self._entries.get((digest, min_samples))
+            if model is None or model.max_eps < eps:
+                return None
+            self._entries.move_to_end((digest, min_samples))
+            return model
+
+    def points(self, digest: str) -> Optional[np.ndarray]:
+        """同一图像已提取过的点（min_samples 或 eps 范围变化时复用）"""
+        with self._lock:
+            for (key, _), model in self._entries.items():
+                if key == digest:
+                    return model.points
+            for (key, _), (points, _) in self._sweeps.items():
+                if key == digest:
+                    return points
+        return None
+
+    def observe(self, digest: str, min_samples: int, eps: float, points: np.ndarray) -> Optional[float]:
+        """记录一次未命中的调用，返回应当建立模型的 max_eps；还不值得建立时返回 None（调用方直接聚类）
+
+        eps 改变 SWEEP_BUILD_CHANGES 次后建立，max_eps 覆盖用过的所有 eps；
+        已有模型只是范围不够时立即重建
+        """
+        key = (digest, min_samples)
+        with self._lock:
+            if key in self._entries:
+                return eps * REACHABILITY_HEADROOM
+            points, history = self._sweeps.pop(key, (points, []))
+            if not history or history[-1] != eps:
+                history.append(eps)
+            if len(history) > SWEEP_BUILD_CHANGES:
+                return max(history) * REACHABILITY_HEADROOM
+            self._sweeps[key] = (points, history)
+            while len(self._sweeps) > self.max_entries:
+                self._sweeps.popitem(last=False)
+        return None
+
+    def store(self, digest: str, model: ReachabilityModel):
+        with self._lock:
+            self._entries[(digest, model.min_samples)] = model
+            self._entries.move_to_end((digest, model.min_samples))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._sweeps.clear()
+
+
+# 全局可达性缓存（界面中调整 eps / min_samples 时共用）
+REACHABILITY_CACHE = ReachabilityCache()
@@ -0,0 +1,256 @@
+"""
+点集
+从二值图像中提取点：每个连通域取质心，明显大于单个点的连通域（多个点粘连）再用距离变换峰值拆分；
+点数超过上限时按空间网格分层抽样，提取耗时与像素数成正比，输出点数有上限。
+另外提供以数组保存坐标的点集（画布直接把坐标交给聚类算子）、点集的 CSV / NPY 读写、栅格化显示和聚类结果绘制。
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+
+# 提取点数上限（DBSCAN / KMeans 的输入规模）
+MAX_EXTRACT_POINTS = 20000
+
+# 面积超过中位数面积的该倍数，或明显不是圆盘（面积超过按外接框短边估计的圆面积的该倍数）时拆分
+OVERSIZE_AREA_RATIO = 1.8
+OVERSIZE_DISC_RATIO = 1.5
+
+# 面积小于该值的连通域不拆分
+MIN_SPLIT_AREA = 16
+
+# 峰值检测：局部极大值窗口大小，及相对连通域内最大距离的阈值
+PEAK_KERNEL_SIZE = 7
+PEAK_THRESHOLD = 0.3
+
+
+def _oversized(areas: np.ndarray, widths: np.ndarray, heights: np.ndarray) -> np.ndarray:
+    """判断哪些连通域可能由多个点粘连而成"""
+    disc_area = np.pi / 4 * np.minimum(widths, heights).astype(np.float64) ** 2
+    large = areas > OVERSIZE_AREA_RATIO * np.median(areas)
+    elongated = areas > OVERSIZE_DISC_RATIO * disc_area
+    return (large | elongated) & (areas >= MIN_SPLIT_AREA)
+
+
+def split_component(mask: np.ndarray) -> np.ndarray:
+    """用距离变换局部极大值拆分一个连通域（mask 为该连通域的外接框区域），返回框内坐标 (x, y)
+
+    相邻的同值峰值像素合并为一个点；找不到峰值时返回空数组
+    """
+    dist = cv2.distanceTransform(mask, cv2.DIST_L2, 5)
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (PEAK_KERNEL_SIZE, PEAK_KERNEL_SIZE))
+    peaks = ((dist == cv2.dilate(dist, kernel)) & (dist > PEAK_THRESHOLD * dist.max())).astype(np.uint8)
+    n, _, _, centroids = cv2.connectedComponentsWithStats(peaks, connectivity=8)
+    return centroids[1:n]
+
+
+def stratified_subsample(points: np.ndarray, max_points: int) -> np.ndarray:
+    """按空间网格分层等间隔抽样到 max_points 个点，各格子保留的比例相同（结果确定）"""
+    n = len(points)
+    if n <= max_points:
+        return points
+    lo = points.min(axis=0)
+    extent = np.maximum(points.max(axis=0) - lo, 1e-6)
+    # 约 max_points 个格子，每格平均保留约一个点
+    cells_per_axis = max(1, int(np.sqrt(max_points)))
+    cells = np.minimum(((points - lo) / extent * cells_per_axis).astype(np.int64), cells_per_axis - 1)
+    order = np.argsort(cells[:, 0] * cells_per_axis + cells[:, 1], kind="stable")
+    pick = np.linspace(0, n - 1, max_points).round().astype(np.int64)
+    return points[np.sort(order[pick])]
+
+
+def extract_points(image: np.ndarray, max_points: int = MAX_EXTRACT_POINTS) -> np.ndarray:
+    """从二值图像中提取黑色点的中心坐标 (x, y)，返回 float32 数组 (N, 2)"""
+    # 背景为白(255)，前景为黑(0)
+    _, binary = cv2.threshold(image, 127, 255, cv2.THRESH_BINARY_INV)
+    n, labels, stats, centroids = cv2.connectedComponentsWithStats(binary, connectivity=8)
+    if n <= 1:
+        return np.empty((0, 2), dtype=np.float32)
+
+    stats, centroids = stats[1:], centroids[1:]
+    areas = stats[:, cv2.CC_STAT_AREA]
+    oversized = _oversized(areas, stats[:, cv2.CC_STAT_WIDTH], stats[:, cv2.CC_STAT_HEIGHT])
+
+    parts = [centroids[~oversized]]
+    for i in np.flatnonzero(oversized):
+        x, y, w, h = stats[i, :4]
+        mask = (labels[y:y + h, x:x + w] == i + 1).astype(np.uint8)
+        peaks = split_component(mask)
+        parts.append(peaks + (x, y) if len(peaks) else centroids[i:i + 1])
+
+    points = np.concatenate(parts).astype(np.float32)
+    return stratified_subsample(points, max_points)
+
+
+# ===== 点集模型 =====
+
+class PointSet:
+    """按坐标保存的点集 (N, 2) float32
+
+    追加写在已有数据之后（容量不足时按倍数扩容到新数组），已有数据从不原地修改，
+    因此 array 返回的只读视图可以直接交给后台线程，不需要复制。
+    """
+
+    def __init__(self, points: np.ndarray = None):
+        self._buffer = np.empty((0, 2), dtype=np.float32)
+        self._count = 0
+        if points is not None:
+            self.set(points)
+
+    def __len__(self):
+        return self._count
+
+    @property
+    def array(self) -> np.ndarray:
+        view = self._buffer[:self._count]
+        view.flags.writeable = False
+        return view
+
+    def set(self, points: np.ndarray):
+        """替换全部点"""
+        self._buffer = as_points(points).copy()
+        self._count = len(self._buffer)
+
+    def append(self, x: float, y: float):
+        self.extend(np.array([[x, y]], dtype=np.float32))
+
+    def extend(self, points: np.ndarray):
+        points = as_points(points)
+        end = self._count + len(points)
+        if end > len(self._buffer):
+            grown = np.empty((max(end, 2 * len(self._buffer), 64), 2), dtype=np.float32)
+            grown[:self._count] = self._buffer[:self._count]
+            self._buffer = grown
+        self._buffer[self._count:end] = points
+        self._count = end
+
+    def remove(self, index: int):
+        """删除一个点（复制到新数组，之前返回的视图不受影响）"""
+        self._buffer = np.delete(self._buffer[:self._count], index, axis=0)
+        self._count -= 1
+
+    def nearest(self, x: float, y: float, max_distance: float) -> int:
+        """距离 (x, y) 最近且不超过 max_distance 的点的下标，没有则返回 -1"""
+        if self._count == 0:
+            return -1
+        d2 = np.sum((self._buffer[:self._count] - (x, y)) ** 2, axis=1)
+        index = int(np.argmin(d2))
+        return index if d2[index] <= max_distance * max_distance else -1
+
+    def clear(self):
+        self._buffer = np.empty((0, 2), dtype=np.float32)
+        self._count = 0
+
+
+def as_points(points) -> np.ndarray:
+    """转换为 (N, 2) float32 坐标数组；多于两列时只取前两列"""
+    points = np.asarray(points, dtype=np.float32)
+    if points.size == 0:
+        return np.empty((0, 2), dtype=np.float32)
+    if points.ndim != 2 or points.shape[1] < 2:
+        raise ValueError(f"点集应为 (N, 2) 数组，实际形状为 {points.shape}")
+    return np.ascontiguousarray(points[:, :2])
+
+
+def load_points(path: str) -> np.ndarray:
+    """读取点集：.npy 为 (N, 2) 数组；.csv 每行 x,y（可以有一行表头）"""
+    if path.lower().endswith(".npy"):
+        return as_points(np.load(path))
+    with open(path, encoding="utf-8") as f:
+        first = f.readline()
+    try:
+        [float(v) for v in first.split(",")[:2]]
+        skip = 0
+    except ValueError:
+        skip = 1
+    return as_points(np.loadtxt(path, delimiter=",", skiprows=skip, ndmin=2))
+
+
+def save_points(path: str, points: np.ndarray):
+    """保存点集，扩展名为 .npy 时保存为数组，否则保存为带表头的 CSV"""
+    points = as_points(points)
+    if os.path.splitext(path)[1].lower() == ".npy":
+        np.save(path, points)
+    else:
+        np.savetxt(path, points, fmt="%.3f", delimiter=",", header="x,y", comments="")
+
+
+def rasterize_points(points: np.ndarray, shape, radius: int = 5) -> np.ndarray:
+    """把点画成白底上的黑色实心圆：先标记圆心像素，再用圆形核一次膨胀，超出范围的点忽略"""
+    h, w = shape[:2]
+    mask = np.zeros((h, w), dtype=np.uint8)
+    xy = np.round(as_points(points)).astype(np.int64)
+    inside = (xy[:, 0] >= 0) & (xy[:, 0] < w) & (xy[:, 1] >= 0) & (xy[:, 1] < h)
+    mask[xy[inside, 1], xy[inside, 0]] = 255
+    if radius > 0:
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (2 * radius + 1, 2 * radius + 1))
+        mask = cv2.dilate(mask, kernel)
+    return 255 - mask
+
+
+# ===== 聚类结果绘制 =====
+
+# 点的填充半径和描边半径（与逐点 cv2.circle 绘制时相同）
+POINT_FILL_RADIUS = 6
+POINT_OUTLINE_RADIUS = 7
+
+NOISE_COLOR = (128, 128, 128)
+OUTLINE_COLOR = (0, 0, 0)
+
+
+def _point_kernels():
+    """圆点的填充区域和整体区域（填充 + 描边）对应的膨胀核"""
+    size = 2 * POINT_OUTLINE_RADIUS + 1
+    center = (POINT_OUTLINE_RADIUS, POINT_OUTLINE_RADIUS)
+    fill = np.zeros((size, size), dtype=np.uint8)
+    cv2.circle(fill, center, POINT_FILL_RADIUS, 1, -1)
+    full = fill.copy()
+    cv2.circle(full, center, POINT_OUTLINE_RADIUS, 1, 1)
+    return fill, full
+
+
+FILL_KERNEL, FULL_KERNEL = _point_kernels()
+
+
+def cluster_palette(n: int, seed: int = 42) -> np.ndarray:
+    """n 个簇的颜色表 (BGR)，使用局部随机数生成器，不影响全局随机状态"""
+    return np.random.default_rng(seed).integers(0, 255, (max(n, 1), 3), dtype=np.uint8)
+
+
+def draw_clusters(shape, points: np.ndarray, labels: np.ndarray, n_clusters: int) -> np.ndarray:
+    """在白底上绘制按簇着色、黑色描边的圆点，噪点 (-1) 为灰色
+
+    与按顺序逐点画圆的结果相同（后画的点覆盖先画的点）：把点的序号写入圆心像素后做最大值膨胀，
+    每个像素得到覆盖它的最后一个点；若该点的填充区域也覆盖此像素则取簇颜色，否则为描边。
+    耗时与图像大小成正比，与点数基本无关。
+    """
+    h, w = shape[:2]
+    pad = POINT_OUTLINE_RADIUS
+    if len(points) == 0:
+        return np.full((h, w, 3), 255, dtype=np.uint8)
+
+    # 序号 + 1 写入圆心像素（float32 可精确表示 2^24 以内的整数）；四周留出描边半径，使部分越界的点也能画出
+    xy = np.trunc(as_points(points)).astype(np.int64) + pad
+    inside = (xy[:, 0] >= 0) & (xy[:, 0] < w + 2 * pad) & (xy[:, 1] >= 0) & (xy[:, 1] < h + 2 * pad)
+    order = np.zeros((h + 2 * pad, w + 2 * pad), dtype=np.float32)
+    order[xy[inside, 1], xy[inside, 0]] = np.flatnonzero(inside) + 1
+
+    top = cv2.dilate(order, FULL_KERNEL)[pad:pad + h, pad:pad + w]
+    top_fill = cv2.dilate(order, FILL_KERNEL)[pad:pad + h, pad:pad + w]
+
+    # 颜色表（BGRA 打包为 uint32，一次 take 查表）：0 为背景，1..N 为各点的簇颜色，N + 1 为描边
+    point_labels = np.asarray(labels).ravel()
+    palette = cluster_palette(n_clusters)
+    lut = np.empty((len(point_labels) + 2, 4), dtype=np.uint8)
+    lut[:, 3] = 255
+    lut[0, :3] = (255, 255, 255)
+    lut[1:-1, :3] = palette[point_labels % len(palette)]
+    lut[1:-1, :3][point_labels == -1] = NOISE_COLOR
+    lut[-1, :3] = OUTLINE_COLOR
+
+    index = top.astype(np.int32)
+    index[top_fill != top] = len(lut) - 1
+    bgra = np.take(lut.view(np.uint32).ravel(), index)
+    return cv2.cvtColor(bgra.view(np.uint8).reshape(h, w, 4), cv2.COLOR_BGRA2BGR)
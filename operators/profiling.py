@@ -0,0 +1,127 @@
+"""
+算子性能剖析
+记录每次算子调用各内部阶段的耗时和峰值内存，合并到统计信息中，并可追加写入 JSONL 跟踪文件
+"""
+
+import json
+import threading
+import time
+import tracemalloc
+from functools import wraps
+from typing import Callable, Dict, Optional
+
+
+_local = threading.local()
+
+
+class _Stage:
+    """阶段计时上下文；当前线程没有正在剖析的调用时不做任何事"""
+
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = None
+
+    def __enter__(self):
+        if getattr(_local, "trace", None) is not None:
+            self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        if self.start is not None:
+            trace = _local.trace
+            trace[self.name] = trace.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+def stage(name: str) -> _Stage:
+    """标记算子内部的一个阶段：with stage("提取点"): ..."""
+    return _Stage(name)
+
+
+class OperatorProfiler:
+    """算子剖析器
+
+    track_memory 开启时用 tracemalloc 统计峰值内存（进程级，并发调用时互相叠加，且有明显开销）；
+    trace_path 不为空时每次调用追加一行 JSON 记录。
+    """
+
+    def __init__(self, trace_path: Optional[str] = None, track_memory: bool = False):
+        self.trace_path = trace_path
+        self.track_memory = track_memory
+        self._lock = threading.Lock()
+
+    def configure(self, trace_path: Optional[str] = None, track_memory: bool = False):
+        self.trace_path = trace_path
+        self.track_memory = track_memory
+
+    def _write_trace(self, record: Dict):
+        line = json.dumps(record, ensure_ascii=False) + "\n"
+        with self._lock:
+            with open(self.trace_path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+    def wrap(self, name: str, func: Callable) -> Callable:
+        """包装一个算子函数，返回带剖析的版本"""
+        @wraps(func)
+        def profiled(*args, **kwargs):
+            outer = getattr(_local, "trace", None)
+            trace = {}
+            _local.trace = trace
+
+            track_memory = self.track_memory
+            started_tracing = False
+            if track_memory:
+                if not tracemalloc.is_tracing():
+                    tracemalloc.start()
+                    started_tracing = True
+                tracemalloc.reset_peak()
+                base, _ = tracemalloc.get_traced_memory()
+
+            start = time.perf_counter()
+            try:
+                image, stats = func(*args, **kwargs)
+            finally:
+                total = time.perf_counter() - start
+                _local.trace = outer
+                if track_memory:
+                    _, peak = tracemalloc.get_traced_memory()
+                    if started_tracing:
+                        tracemalloc.stop()
+
+            stats = dict(stats)
+            stats["总耗时"] = f"{total * 1000:.2f} ms"
+            for stage_name, seconds in trace.items():
+                stats[f"耗时({stage_name})"] = f"{seconds * 1000:.2f} ms"
+            if track_memory:
+                stats["峰值内存"] = f"{max(0, peak - base) / (1024 * 1024):.2f} MB"
+
+            if self.trace_path:
+                record = {
+                    "operator": name,
+                    "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "total_ms": round(total * 1000, 3),
+                    "stages_ms": {k: round(v * 1000, 3) for k, v in trace.items()},
+                }
+                if track_memory:
+                    record["peak_bytes"] = max(0, peak - base)
+                self._write_trace(record)
+            return image, stats
+        return profiled
+
+
+# 全局剖析器
+PROFILER = OperatorProfiler()
+
+
+def instrument_registry(registry: Dict[str, Dict[str, Callable]],
+                        profiler: OperatorProfiler = PROFILER) -> Dict[str, Dict[str, Callable]]:
+    """为结构与 OPERATORS 相同的注册表中的每个算子加上剖析"""
+    return {
+        category: {
+            op_name: profiler.wrap(f"{category}/{op_name}", op_func)
+            for op_name, op_func in operators.items()
+        }
+        for category, operators in registry.items()
+    }
@@ -0,0 +1,194 @@
+"""
+批量模板搜索
+模板只加载一次；解码线程把目标图像读入有界预取队列，匹配在线程池中执行
+（OpenCV 解码和匹配时都释放 GIL，线程即可并行，且模板不需要在进程间复制），
+解码与匹配重叠进行，结果按完成顺序逐条以 JSONL 输出
+"""
+
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Dict, Iterator, List, Optional
+
+import numpy as np
+
+from .image_io import collect_inputs, read_image
+from .operators import TemplateMatchingOperator
+
+
+# 默认预取队列长度（已解码、等待匹配的图像数）
+DEFAULT_PREFETCH = 8
+
+# 默认解码线程数
+DEFAULT_DECODERS = 2
+
+_END = object()
+
+
+def _decode_loop(paths: Iterator[str], lock: threading.Lock, decoded: queue.Queue, stop: threading.Event):
+    """解码线程：从共享的路径迭代器取文件，解码后放入有界队列（队列满时阻塞）"""
+    try:
+        while not stop.is_set():
+            with lock:
+                path = next(paths, None)
+            if path is None:
+                break
+            try:
+                item = (path, read_image(path), None)
+            except Exception as e:
+                item = (path, None, str(e))
+            while not stop.is_set():
+                try:
+                    decoded.put(item, timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+    finally:
+        decoded.put(_END)
+
+
+def _match_one(path: str, image: Optional[np.ndarray], error: Optional[str], template: np.ndarray,
+               params: Dict[str, Any]) -> Dict[str, Any]:
+    """匹配单个目标图像，返回结果记录"""
+    record = {"file": path, "status": "ok"}
+    if image is None:
+        record["status"] = "error"
+        record["error"] = error
+        return record
+    start = time.perf_counter()
+    try:
+        boxes, scores = TemplateMatchingOperator.find(image, template, **params)
+        if len(boxes):
+            record["score"] = round(float(scores[0]), 6)
+            record["box"] = [int(v) for v in boxes[0]]
+        else:
+            record["score"] = None
+            record["box"] = None
+        record["found"] = bool(len(scores)) and float(scores[0]) >= params.get("score_threshold", 0.8)
+        if params.get("max_matches", 1) != 1:
+            record["matches"] = [[int(v) for v in box] + [round(float(score), 6)]
+                                 for box, score in zip(boxes, scores)]
+    except Exception as e:
+        record["status"] = "error"
+        record["error"] = str(e)
+    record["time_ms"] = round((time.perf_counter() - start) * 1000, 3)
+    return record
+
+
+def search_images(paths: List[str], template: np.ndarray, workers: Optional[int] = None,
+                  prefetch: int = DEFAULT_PREFETCH, decoders: int = DEFAULT_DECODERS,
+                  **params) -> Iterator[Dict[str, Any]]:
+    """在多个目标图像中搜索同一模板，按完成顺序逐条产出结果记录
+
+    params 传给 TemplateMatchingOperator.find（pyramid_levels、max_matches、score_threshold、nms_iou）。
+    同时在途的匹配任务不超过 2 × workers，已解码的图像不超过 prefetch 幅，内存占用有界。
+    """
+    workers = workers or os.cpu_count() or 1
+    decoded = queue.Queue(maxsize=max(1, prefetch))
+    stop = threading.Event()
+    path_iter, path_lock = iter(paths), threading.Lock()
+    threads = [threading.Thread(target=_decode_loop, args=(path_iter, path_lock, decoded, stop), daemon=True)
+               for _ in range(max(1, decoders))]
+    for thread in threads:
+        thread.start()
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = set()
+            running_decoders = len(threads)
+            while running_decoders:
+                item = decoded.get()
+                if item is _END:
+                    running_decoders -= 1
+                    continue
+                pending.add(executor.submit(_match_one, *item, template, params))
+                # 已完成的结果立即输出；在途任务达到上限时等待至少一个完成
+                done, pending = wait(pending, timeout=0 if len(pending) < 2 * workers else None,
+                                     return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    yield future.result()
+    finally:
+        # 提前结束（如调用方停止迭代）时取走剩余图像，避免解码线程阻塞在满队列上
+        stop.set()
+        for thread in threads:
+            while thread.is_alive():
+                try:
+                    decoded.get_nowait()
+                except queue.Empty:
+                    thread.join(0.05)
+
+
+def run_search(inputs: List[str], template: np.ndarray, output, workers: Optional[int] = None,
+               prefetch: int = DEFAULT_PREFETCH, decoders: int = DEFAULT_DECODERS, **params) -> Dict[str, Any]:
+    """搜索并把结果逐行写入 output（文本文件对象），返回汇总信息"""
+    counts = {"ok": 0, "found": 0, "error": 0}
+    start = time.perf_counter()
+    for record in search_images(inputs, template, workers, prefetch, decoders, **params):
+        output.write(json.dumps(record, ensure_ascii=False) + "\n")
+        output.flush()
+        if record["status"] == "ok":
+            counts["ok"] += 1
+            counts["found"] += bool(record.get("found"))
+        else:
+            counts["error"] += 1
+    elapsed = time.perf_counter() - start
+
+    return {
+        "文件数": len(inputs),
+        "成功": counts["ok"],
+        "找到": counts["found"],
+        "失败": counts["error"],
+        "线程数": workers or os.cpu_count() or 1,
+        "总耗时(s)": round(elapsed, 3),
+        "吞吐量(文件/s)": round(len(inputs) / elapsed, 2) if elapsed > 0 else 0,
+    }
+
+
+def add_parser(subparsers):
+    """注册 search 子命令"""
+    parser = subparsers.add_parser("search", help="在图像目录中批量搜索模板")
+    parser.add_argument("template", help="模板图像路径")
+    parser.add_argument("input", help="输入目录或通配符模式（如 'parts/**/*.png'）")
+    parser.add_argument("-o", "--output", default=None, help="结果 JSONL 文件（默认输出到标准输出）")
+    parser.add_argument("-j", "--workers", type=int, default=None, help="匹配线程数（默认 CPU 核数）")
+    parser.add_argument("--prefetch", type=int, default=DEFAULT_PREFETCH, help="预取队列长度")
+    parser.add_argument("--decoders", type=int, default=DEFAULT_DECODERS, help="解码线程数")
+    parser.add_argument("--pyramid", type=int, default=-1, help="金字塔层数（-1 自动，0 原分辨率整图匹配）")
+    parser.add_argument("--max-matches", type=int, default=1, help="每幅图像最多匹配数（1 只取最佳，0 不限）")
+    parser.add_argument("--threshold", type=float, default=0.8, help="得分阈值")
+    parser.set_defaults(func=main)
+    return parser
+
+
+def main(args) -> int:
+    """search 子命令入口"""
+    inputs = collect_inputs(args.input)
+    if not inputs:
+        print(f"没有找到输入文件: {args.input}", file=sys.stderr)
+        return 1
+    template = read_image(args.template)
+
+    params = dict(pyramid_levels=args.pyramid, max_matches=args.max_matches, score_threshold=args.threshold)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output:
+            summary = run_search(inputs, template, output, args.workers, args.prefetch, args.decoders, **params)
+    else:
+        try:
+            summary = run_search(inputs, template, sys.stdout, args.workers, args.prefetch, args.decoders, **params)
+        except BrokenPipeError:
+            # 下游（如 head）提前关闭了管道：把标准输出重定向到 devnull，
+            # 避免解释器退出时刷新缓冲区再次报错，然后正常退出
+            devnull = os.open(os.devnull, os.O_WRONLY)
+            os.dup2(devnull, sys.stdout.fileno())
+            return 1
+    for key, value in summary.items():
+        print(f"{key}: {value}", file=sys.stderr)
+    return 0 if summary["失败"] == 0 else 2
@@ -0,0 +1,108 @@
+"""
+空间索引
+按邻域半径分桶的网格哈希索引，供 DBSCAN 等基于半径的聚类算法使用
+"""
+
+import numpy as np
+
+
+class GridIndex:
+    """网格哈希邻域索引
+
+    以半径为边长把平面划分成格子，半径内的邻居只可能落在相邻的 3x3 个格子里，
+    因此每次查询只需比较少量候选点，内存占用与点数成正比。
+    """
+
+    # 分块计算距离时单块最多的元素个数，用于限制峰值内存
+    BLOCK_ELEMENTS = 1 << 20
+
+    def __init__(self, points: np.ndarray, radius: float):
+        self.points = np.asarray(points).reshape(-1, 2)
+        self.radius = float(radius)
+        n = len(self.points)
+
+        # 格子边长略大于半径，避免浮点舍入把边界上的邻居分到隔一格的位置
+        cell_size = max(self.radius, 1e-6) * (1 + 1e-6)
+        cells = np.floor(self.points.astype(np.float64) / cell_size).astype(np.int64)
+        if n > 0:
+            # 平移到从 1 开始，使 ±1 的相邻格子坐标都非负
+            cells -= cells.min(axis=0) - 1
+            self._stride = int(cells[:, 1].max()) + 2
+        else:
+            self._stride = 1
+        keys = cells[:, 0] * self._stride + cells[:, 1]
+
+        self._order = np.argsort(keys, kind="stable")
+        self._cell_keys, starts, counts = np.unique(keys[self._order], return_index=True, return_counts=True)
+        self._starts = starts
+        self._ends = starts + counts
+        self._cell_of = np.searchsorted(self._cell_keys, keys)
+        self._candidates = {}
+        self._offsets = np.array([dx * self._stride + dy for dx in (-1, 0, 1) for dy in (-1, 0, 1)], dtype=np.int64)
+
+    def __len__(self):
+        return len(self.points)
+
+    @property
+    def n_cells(self) -> int:
+        """非空格子数量"""
+        return len(self._cell_keys)
+
+    def cell_members(self, cell: int) -> np.ndarray:
+        """格子内的点索引"""
+        return self._order[self._starts[cell]:self._ends[cell]]
+
+    def candidates(self, cell: int) -> np.ndarray:
+        """格子及其 8 邻域内的全部点索引（按格子缓存）"""
+        cand = self._candidates.get(cell)
+        if cand is None:
+            keys = self._cell_keys[cell] + self._offsets
+            pos = np.searchsorted(self._cell_keys, keys)
+            valid = pos < len(self._cell_keys)
+            pos, keys = pos[valid], keys[valid]
+            pos = pos[self._cell_keys[pos] == keys]
+            cand = np.concatenate([self._order[self._starts[p]:self._ends[p]] for p in pos])
+            self._candidates[cell] = cand
+        return cand
+
+    def query(self, i: int) -> np.ndarray:
+        """返回与第 i 个点距离不超过半径的所有点索引（包括自己）"""
+        return self.query_distances(i)[0]
+
+    def query_distances(self, i: int):
+        """返回与第 i 个点距离不超过半径的所有点索引（包括自己）及对应距离"""
+        cand = self.candidates(self._cell_of[i])
+        dists = np.sqrt(np.sum((self.points[cand] - self.points[i]) ** 2, axis=-1))
+        within = dists <= self.radius
+        return cand[within], dists[within]
+
+    def neighbor_counts(self) -> np.ndarray:
+        """按格子分块批量统计每个点的邻居数量（包括自己）"""
+        counts = np.zeros(len(self.points), dtype=np.int64)
+        for cell in range(self.n_cells):
+            members = self.cell_members(cell)
+            cand = self.candidates(cell)
+            step = max(1, self.BLOCK_ELEMENTS // len(cand))
+            cand_points = self.points[cand]
+            for s in range(0, len(members), step):
+                block = members[s:s + step]
+                dists = np.sqrt(np.sum((self.points[block][:, None, :] - cand_points[None, :, :]) ** 2, axis=-1))
+                counts[block] = np.count_nonzero(dists <= self.radius, axis=1)
+        return counts
+
+    def kth_neighbor_distances(self, k: int) -> np.ndarray:
+        """每个点到第 k 近邻（包括自己）的距离；半径内邻居不足 k 个时为 inf"""
+        result = np.full(len(self.points), np.inf)
+        for cell in range(self.n_cells):
+            members = self.cell_members(cell)
+            cand = self.candidates(cell)
+            if len(cand) < k:
+                continue
+            step = max(1, self.BLOCK_ELEMENTS // len(cand))
+            cand_points = self.points[cand]
+            for s in range(0, len(members), step):
+                block = members[s:s + step]
+                dists = np.sqrt(np.sum((self.points[block][:, None, :] - cand_points[None, :, :]) ** 2, axis=-1))
+                kth = np.partition(dists, k - 1, axis=1)[:, k - 1]
+                result[block] = np.where(kth <= self.radius, kth, np.inf)
+        return result
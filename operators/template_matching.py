@@ -0,0 +1,636 @@
+"""
+模板匹配
+金字塔由粗到精搜索：在最粗层整图匹配得到候选位置，逐层放大后只在候选附近的小窗口内重新匹配，
+最终得分是原分辨率下的 TM_CCOEFF_NORMED 值，与整图匹配的得分含义相同。
+TemplateBank 缓存源图像的分块频谱和积分图，多个模板对同一源图像匹配时每个模板只需频谱乘积和逆变换。
+响应图按源图像/模板缓冲区的身份缓存，切换框选/热力图显示时只重新渲染。
+旋转/缩放容忍匹配：预先生成（并按模板摘要缓存）旋转缩放后的模板变体，在最粗层并行评分、
+剪除低分角度后，只对少数候选逐层细化。
+"""
+
+import math
+import os
+import threading
+import weakref
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+from .image_io import image_digest
+
+
+# 最粗层模板的最小边长，层数过多时自动减少
+MIN_PYRAMID_TEMPLATE = 8
+
+# 最粗层保留的候选数量
+PYRAMID_CANDIDATES = 5
+
+# 细化时候选位置向四周扩展的搜索半径（像素）
+REFINE_RADIUS = 3
+
+
+def build_pyramid(image: np.ndarray, levels: int) -> List[np.ndarray]:
+    """构建高斯金字塔，第 0 层为原图"""
+    pyramid = [image]
+    for _ in range(levels):
+        pyramid.append(cv2.pyrDown(pyramid[-1]))
+    return pyramid
+
+
+# 自动选择层数时最粗层源图像的目标边长（与界面显示尺寸相当）
+AUTO_PYRAMID_SIZE = 600
+
+
+def auto_levels(source_shape: Tuple[int, int], target: int = AUTO_PYRAMID_SIZE) -> int:
+    """使最粗层源图像边长不超过 target 的层数"""
+    size, levels = max(source_shape[:2]), 0
+    while size > target:
+        size = (size + 1) // 2
+        levels += 1
+    return levels
+
+
+def usable_levels(template_shape: Tuple[int, int], levels: int) -> int:
+    """在保证最粗层模板边长不小于 MIN_PYRAMID_TEMPLATE 的前提下可用的层数"""
+    size = min(template_shape[:2])
+    used = 0
+    while used < levels and (size + 1) // 2 >= MIN_PYRAMID_TEMPLATE:
+        size = (size + 1) // 2
+        used += 1
+    return used
+
+
+def top_peaks(response: np.ndarray, count: int, suppress: Tuple[int, int]) -> List[Tuple[float, int, int]]:
+    """依次取响应图的最大值，并屏蔽其周围 suppress=(宽, 高) 范围，返回 [(得分, x, y), ...]"""
+    work = response.copy()
+    half_w, half_h = max(1, suppress[0] // 2), max(1, suppress[1] // 2)
+    peaks = []
+    for _ in range(count):
+        _, max_val, _, (x, y) = cv2.minMaxLoc(work)
+        if peaks and not max_val > -1.0:
+            break
+        peaks.append((float(max_val), x, y))
+        work[max(0, y - half_h):y + half_h + 1, max(0, x - half_w):x + half_w + 1] = -1.0
+    return peaks
+
+
+def refine_match(source: np.ndarray, template: np.ndarray, x: int, y: int,
+                 radius: int = REFINE_RADIUS) -> Tuple[float, int, int]:
+    """在 (x, y) 附近 radius 范围内匹配，返回 (得分, x, y)"""
+    th, tw = template.shape[:2]
+    sh, sw = source.shape[:2]
+    x0, y0 = max(0, x - radius), max(0, y - radius)
+    x1, y1 = min(sw - tw, x + radius), min(sh - th, y + radius)
+    window = source[y0:y1 + th, x0:x1 + tw]
+    response = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+    _, max_val, _, (dx, dy) = cv2.minMaxLoc(response)
+    return float(max_val), x0 + dx, y0 + dy
+
+
+def pyramid_match(source: np.ndarray, template: np.ndarray, levels: int,
+                  candidates: int = PYRAMID_CANDIDATES) -> Tuple[float, Tuple[int, int], np.ndarray, int]:
+    """金字塔由粗到精匹配
+
+    返回 (得分, 左上角位置, 最粗层响应图, 实际使用的层数)。
+    层数为 0 时退化为整图匹配。
+    """
+    levels = usable_levels(template.shape, levels)
+    sources = build_pyramid(source, levels)
+    templates = build_pyramid(template, levels)
+
+    coarse = cv2.matchTemplate(sources[-1], templates[-1], cv2.TM_CCOEFF_NORMED)
+    th, tw = templates[-1].shape[:2]
+    peaks = top_peaks(coarse, candidates if levels else 1, (tw, th))
+
+    for level in range(levels - 1, -1, -1):
+        peaks = [refine_match(sources[level], templates[level], 2 * x, 2 * y) for _, x, y in peaks]
+        # 越往细层候选越可靠，只保留得分最高的一半继续细化
+        peaks.sort(key=lambda p: p[0], reverse=True)
+        peaks = peaks[:max(1, len(peaks) // 2)] if level else peaks[:1]
+
+    score, x, y = peaks[0]
+    return score, (x, y), coarse, levels
+
+
+# ===== 多目标匹配 =====
+
+# NMS 前保留的最大候选峰值数（平坦区域可能产生大量等值极大值）
+MAX_PEAK_CANDIDATES = 10000
+
+
+def find_peaks(response: np.ndarray, score_threshold: float,
+               max_candidates: int = MAX_PEAK_CANDIDATES) -> Tuple[np.ndarray, np.ndarray]:
+    """提取响应图中不低于阈值的 3x3 局部极大值，返回 (坐标 (n, 2) 的 x/y, 得分)，按得分降序"""
+    dilated = cv2.dilate(response, np.ones((3, 3), np.uint8))
+    ys, xs = np.nonzero((response >= dilated) & (response >= score_threshold))
+    scores = response[ys, xs]
+    if scores.size > max_candidates:
+        top = np.argpartition(-scores, max_candidates - 1)[:max_candidates]
+        ys, xs, scores = ys[top], xs[top], scores[top]
+    order = np.argsort(-scores, kind="stable")
+    return np.stack([xs[order], ys[order]], axis=1), scores[order]
+
+
+def non_max_suppression(boxes: np.ndarray, iou_threshold: float, max_count: int = 0) -> np.ndarray:
+    """贪心 NMS，boxes 为按得分降序排列的 (n, 4) 数组 [x, y, w, h]，返回保留的下标
+
+    max_count > 0 时最多保留 max_count 个
+    """
+    x1, y1 = boxes[:, 0].astype(np.float64), boxes[:, 1].astype(np.float64)
+    x2, y2 = x1 + boxes[:, 2], y1 + boxes[:, 3]
+    areas = boxes[:, 2].astype(np.float64) * boxes[:, 3]
+    order = np.arange(len(boxes))
+    keep = []
+    while order.size and (max_count <= 0 or len(keep) < max_count):
+        i, rest = order[0], order[1:]
+        keep.append(i)
+        iw = np.clip(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0, None)
+        ih = np.clip(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0, None)
+        inter = iw * ih
+        iou = inter / (areas[i] + areas[rest] - inter)
+        order = rest[iou <= iou_threshold]
+    return np.asarray(keep, dtype=np.intp)
+
+
+def match_instances(response: np.ndarray, template_shape: Tuple[int, int], score_threshold: float,
+                    max_count: int = 0, iou_threshold: float = 0.3) -> Tuple[np.ndarray, np.ndarray]:
+    """从一次计算的响应图中提取所有匹配实例
+
+    返回 (框 (n, 4) 的 [x, y, w, h], 得分)，按得分降序；max_count > 0 时只取前 max_count 个
+    """
+    th, tw = template_shape[:2]
+    positions, scores = find_peaks(response, score_threshold)
+    boxes = np.empty((len(positions), 4), dtype=np.int32)
+    boxes[:, :2] = positions
+    boxes[:, 2], boxes[:, 3] = tw, th
+    keep = non_max_suppression(boxes, iou_threshold, max_count)
+    return boxes[keep], scores[keep]
+
+
+def draw_boxes(image: np.ndarray, boxes: np.ndarray, color=(0, 255, 0), thickness: int = 2) -> np.ndarray:
+    """一次 polylines 调用绘制所有 [x, y, w, h] 框"""
+    if len(boxes):
+        x, y, w, h = (boxes[:, i] for i in range(4))
+        corners = np.stack([np.stack([x, y], 1), np.stack([x + w, y], 1),
+                            np.stack([x + w, y + h], 1), np.stack([x, y + h], 1)], axis=1)
+        cv2.polylines(image, list(corners.astype(np.int32).reshape(-1, 4, 1, 2)), True, color, thickness)
+    return image
+
+
+# ===== 模板库（频域匹配）=====
+
+# 频域分块：图块 DFT 边长至少为 MIN_DFT_BLOCK，且不小于模板边长的 DFT_BLOCK_SCALE 倍
+MIN_DFT_BLOCK = 256
+DFT_BLOCK_SCALE = 8
+
+# 窗口平方和低于 n · scale² 的该倍数时视为纯色窗口
+VARIANCE_FLOOR = 1e-12
+
+# 每个 TemplateBank 缓存的窗口统计量数量（按模板尺寸，位姿变体的尺寸各不相同）
+WINDOW_CACHE_SIZE = 16
+
+
+def _axis_plan(length: int, template_length: int) -> Tuple[int, int]:
+    """单个方向的分块方案 (DFT 尺寸, 步长)
+
+    同一档 DFT 尺寸适用于边长不超过 尺寸 / DFT_BLOCK_SCALE 的所有模板，
+    因此不同大小的模板可以共用缓存的源图像图块频谱。
+    """
+    size = MIN_DFT_BLOCK
+    while size // DFT_BLOCK_SCALE < template_length:
+        size *= 2
+    if size >= length:
+        # 整个方向放进一个图块；循环相关在有效区域内不会回绕
+        return cv2.getOptimalDFTSize(length), length
+    return size, size - size // DFT_BLOCK_SCALE + 1
+
+
+class TemplateBank:
+    """对同一源图像批量匹配模板
+
+    源图像按模板尺寸档位切成重叠图块，各图块的 DFT 以及求和/平方和积分图只计算一次并缓存，
+    之后每个模板只需一次（图块大小的）模板 DFT，以及每个图块一次频谱乘积和一次逆变换；
+    归一化用积分图得到的窗口统计量（按模板尺寸缓存）。
+    响应图与 cv2.matchTemplate(TM_CCOEFF_NORMED) 的定义相同：相关在单精度频域中计算，
+    窗口统计量在双精度中对去均值数据计算，低对比度窗口上比 OpenCV 更接近精确值。
+    OpenCV 调用期间释放 GIL，match_all 用线程池并行。
+    """
+
+    def __init__(self, source: np.ndarray, workers: Optional[int] = None):
+        if source.ndim != 2:
+            raise ValueError("源图像必须为单通道")
+        self.source = source
+        self.shape = source.shape
+        self.workers = workers or os.cpu_count() or 1
+        # 窗口统计量和频谱都基于减去（取整的）全局均值后的数据：零均值模板的相关不受常数平移影响，
+        # 亮区的单精度相关不再是大数相消；整数图像平移后仍为整数，双精度积分图和窗口和保持精确
+        self._offset = float(np.round(source.mean()))
+        shifted = source.astype(np.float64) - self._offset
+        self._sum, self._sqsum = cv2.integral2(shifted, sdepth=cv2.CV_64F, sqdepth=cv2.CV_64F)
+        self._scale = float(np.abs(shifted).max())
+        self._window_cache: "OrderedDict[Tuple[int, int], np.ndarray]" = OrderedDict()
+        self._tile_cache: Dict[tuple, List[Tuple[int, int, np.ndarray]]] = {}
+        self._lock = threading.Lock()
+
+    def _plan(self, th: int, tw: int) -> tuple:
+        return _axis_plan(self.shape[0], th) + _axis_plan(self.shape[1], tw)
+
+    def _tile_spectra(self, plan: tuple) -> List[Tuple[int, int, np.ndarray]]:
+        """按分块方案计算（或取缓存的）源图像图块频谱 [(y0, x0, 频谱), ...]"""
+        tiles = self._tile_cache.get(plan)
+        if tiles is None:
+            with self._lock:
+                tiles = self._tile_cache.get(plan)
+                if tiles is None:
+                    dft_h, step_h, dft_w, step_w = plan
+                    h, w = self.shape
+                    tiles = []
+                    for y0 in range(0, h, step_h):
+                        for x0 in range(0, w, step_w):
+                            block = self.source[y0:y0 + dft_h, x0:x0 + dft_w]
+                            padded = np.zeros((dft_h, dft_w), dtype=np.float32)
+                            padded[:block.shape[0], :block.shape[1]] = block
+                            padded[:block.shape[0], :block.shape[1]] -= self._offset
+                            tiles.append((y0, x0, cv2.dft(padded, nonzeroRows=block.shape[0])))
+                    self._tile_cache[plan] = tiles
+        return tiles
+
+    def _window_norm(self, th: int, tw: int) -> np.ndarray:
+        """每个匹配位置窗口内源图像的 sqrt(Σ(S - 均值)²)，单精度"""
+        with self._lock:
+            norm = self._window_cache.get((th, tw))
+            if norm is not None:
+                self._window_cache.move_to_end((th, tw))
+        if norm is None:
+            h, w = self.shape
+
+            def window(integral):
+                return (integral[th:h + 1, tw:w + 1] - integral[:h - th + 1, tw:w + 1]
+                        - integral[th:h + 1, :w - tw + 1] + integral[:h - th + 1, :w - tw + 1])
+
+            n = th * tw
+            total = window(self._sum)
+            variance = window(self._sqsum) - total * total / n
+            # 剩余的舍入误差在 n · scale² 的双精度相对误差量级，低于该值视为纯色窗口（分母为 0）
+            variance[variance < VARIANCE_FLOOR * n * self._scale * self._scale] = 0
+            norm = np.sqrt(variance).astype(np.float32)
+            with self._lock:
+                self._window_cache[(th, tw)] = norm
+                while len(self._window_cache) > WINDOW_CACHE_SIZE:
+                    self._window_cache.popitem(last=False)
+        return norm
+
+    @property
+    def nbytes(self) -> int:
+        """积分图和已缓存的图块频谱、窗口统计量占用的字节数（不含源图像）"""
+        with self._lock:
+            spectra = sum(spectrum.nbytes for tiles in self._tile_cache.values() for _, _, spectrum in tiles)
+            windows = sum(norm.nbytes for norm in self._window_cache.values())
+        return self._sum.nbytes + self._sqsum.nbytes + spectra + windows
+
+    def response(self, template: np.ndarray) -> np.ndarray:
+        """模板的 TM_CCOEFF_NORMED 响应图，尺寸为 (H - h + 1, W - w + 1)"""
+        h, w = self.shape
+        th, tw = template.shape[:2]
+        if th > h or tw > w:
+            raise ValueError("模板图像大于源图像，无法进行匹配")
+        out_h, out_w = h - th + 1, w - tw + 1
+
+        centered = template.astype(np.float64)
+        centered -= centered.mean()
+        templ_norm = np.sqrt(np.sum(centered * centered))
+        if templ_norm < np.finfo(np.float64).eps:
+            # 与 OpenCV 一致：纯色模板的响应恒为 1
+            return np.ones((out_h, out_w), dtype=np.float32)
+
+        # 零均值模板与源图像的相关即为去均值后的相关（Σ(T - 均值) = 0）
+        plan = self._plan(th, tw)
+        dft_h, step_h, dft_w, step_w = plan
+        padded = np.zeros((dft_h, dft_w), dtype=np.float32)
+        padded[:th, :tw] = centered
+        templ_spectrum = cv2.dft(padded, nonzeroRows=th)
+
+        result = np.empty((out_h, out_w), dtype=np.float32)
+        for y0, x0, spectrum in self._tile_spectra(plan):
+            rows, cols = min(step_h, out_h - y0), min(step_w, out_w - x0)
+            if rows <= 0 or cols <= 0:
+                continue
+            corr = cv2.idft(cv2.mulSpectrums(spectrum, templ_spectrum, 0, conjB=True),
+                            flags=cv2.DFT_REAL_OUTPUT | cv2.DFT_SCALE, nonzeroRows=rows)
+            result[y0:y0 + rows, x0:x0 + cols] = corr[:rows, :cols]
+
+        # 与 OpenCV 相同的退化窗口处理：比值在 [1, 1.125) 内截断为 ±1，更大（含分母为 0）时置 0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            np.divide(result, self._window_norm(th, tw) * np.float32(templ_norm), out=result)
+        degenerate = ~(np.abs(result) < 1.125)
+        np.clip(result, -1.0, 1.0, out=result)
+        result[degenerate] = 0.0
+        return result
+
+    def match(self, template: np.ndarray) -> Tuple[float, Tuple[int, int]]:
+        """返回 (最高得分, 左上角位置)"""
+        _, max_val, _, max_loc = cv2.minMaxLoc(self.response(template))
+        return float(max_val), max_loc
+
+    def match_all(self, templates: Sequence[np.ndarray]) -> List[Tuple[float, Tuple[int, int]]]:
+        """并行匹配多个模板，结果顺序与输入一致"""
+        if self.workers == 1 or len(templates) <= 1:
+            return [self.match(t) for t in templates]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(self.match, templates))
+
+
+# ===== 响应图缓存与热力图渲染 =====
+
+# 响应图缓存的默认容量（字节）
+DEFAULT_RESPONSE_CACHE_BYTES = 256 * 1024 * 1024
+
+
+def _value_nbytes(value: Any) -> int:
+    """估算缓存值占用的字节数（数组、带 nbytes 的对象如 TemplateBank，以及它们组成的列表/元组）"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (list, tuple)):
+        return sum(_value_nbytes(item) for item in value)
+    return int(getattr(value, "nbytes", 0))
+
+
+class ResponseCache:
+    """按源图像和模板缓冲区的身份缓存匹配响应（LRU，按字节预算淘汰）
+
+    以对象身份（弱引用）加数据指针、形状和步长判断是否为同一缓冲区，不计算内容摘要，
+    因此缓冲区被原地修改时缓存不会失效——调用方需保证图像在匹配期间不被原地修改。
+    源图像或模板被回收时由弱引用回调立即删除对应条目；缓存值不能引用源图像或模板本身，否则条目不会随之释放。
+    缓存的数组标记为只读。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_RESPONSE_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        # 键 -> (源图像弱引用, 模板弱引用, 值, 字节数)
+        self._entries: "OrderedDict[tuple, tuple]" = OrderedDict()
+        # 弱引用回调可能在持有锁的线程中触发，使用可重入锁
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _buffer_key(array: np.ndarray) -> tuple:
+        return (id(array), array.__array_interface__["data"][0], array.shape, array.strides, array.dtype.str)
+
+    def get_or_compute(self, source: np.ndarray, template: Optional[np.ndarray], variant: Any,
+                       compute: Callable[[], Any]) -> Tuple[Any, bool]:
+        """返回 (缓存或新计算的值, 是否命中)；variant 区分同一对缓冲区的不同计算方式
+
+        template 为 None 时缓存只与源图像有关的中间结果
+        """
+        key = (self._buffer_key(source), None if template is None else self._buffer_key(template), variant)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0]() is source and (template is None or entry[1]() is template):
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[2], True
+
+        value = compute()
+        for item in value if isinstance(value, tuple) else (value,):
+            if isinstance(item, np.ndarray):
+                item.setflags(write=False)
+        nbytes = _value_nbytes(value)
+        with self._lock:
+            self.misses += 1
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.current_bytes -= old[3]
+            if nbytes > self.max_bytes:
+                return value, False
+            discard = lambda ref, key=key: self._discard(key, ref)
+            self._entries[key] = (weakref.ref(source, discard),
+                                  None if template is None else weakref.ref(template, discard), value, nbytes)
+            self.current_bytes += nbytes
+            self._evict()
+        return value, False
+
+    def _discard(self, key: tuple, ref: weakref.ref):
+        """弱引用回调：源图像或模板被回收时删除对应条目（同一键已被新条目替换时不删除）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (entry[0] is ref or entry[1] is ref):
+                del self._entries[key]
+                self.current_bytes -= entry[3]
+
+    def _evict(self):
+        """重新估算各条目大小（TemplateBank 使用中会缓存更多频谱），淘汰最久未使用的条目直到不超过预算"""
+        for key, entry in list(self._entries.items()):
+            nbytes = _value_nbytes(entry[2])
+            if nbytes != entry[3] and key in self._entries:
+                self._entries[key] = entry[:3] + (nbytes,)
+                self.current_bytes += nbytes - entry[3]
+        while self.current_bytes > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self.current_bytes -= evicted[3]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+class HeatmapRenderer:
+    """把响应图渲染为伪彩色热力图
+
+    归一化和缩放的 8 位中间结果使用复用的缓冲区（按尺寸分配，加锁保护），
+    缩放在单通道上完成，伪彩色由 256 项查找表一次映射。
+    输出默认新分配，因为结果图像会被结果缓存和界面持有；传入 out 时直接写入。
+    """
+
+    def __init__(self, colormap: int = cv2.COLORMAP_JET):
+        self.lut = cv2.applyColorMap(np.arange(256, dtype=np.uint8).reshape(256, 1), colormap)
+        self._normalized = None
+        self._resized = None
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _reuse(buffer: Optional[np.ndarray], shape: Tuple[int, ...]) -> np.ndarray:
+        return buffer if buffer is not None and buffer.shape == shape else np.empty(shape, dtype=np.uint8)
+
+    def render(self, response: np.ndarray, size: Optional[Tuple[int, int]] = None,
+               out: Optional[np.ndarray] = None) -> np.ndarray:
+        """size 为 (宽, 高)，响应图小于该尺寸时放大到该尺寸（与原热力图显示一致）"""
+        with self._lock:
+            self._normalized = self._reuse(self._normalized, response.shape)
+            gray = cv2.normalize(response, self._normalized, 0, 255, cv2.NORM_MINMAX, cv2.CV_8U)
+            if size is not None and (gray.shape[1] < size[0] or gray.shape[0] < size[1]):
+                self._resized = self._reuse(self._resized, (size[1], size[0]))
+                gray = cv2.resize(gray, size, dst=self._resized)
+            if out is None:
+                out = np.empty(gray.shape + (3,), dtype=np.uint8)
+            return cv2.applyColorMap(gray, self.lut, dst=out)
+
+
+# 全局响应图缓存和热力图渲染器
+RESPONSE_CACHE = ResponseCache()
+HEATMAP_RENDERER = HeatmapRenderer()
+
+
+# ===== 旋转/缩放容忍匹配 =====
+
+# 最粗层评分后保留的候选位姿数量，以及相对最高分的得分余量
+POSE_CANDIDATES = 4
+POSE_PRUNE_MARGIN = 0.15
+
+# 缓存的模板变体组数
+VARIANT_CACHE_SIZE = 8
+
+
+class TemplateVariant(NamedTuple):
+    """旋转缩放后的模板变体；pyramid[0] 为原分辨率"""
+    angle: float
+    scale: float
+    pyramid: List[np.ndarray]
+
+
+class PoseMatch(NamedTuple):
+    """位姿匹配结果：中心位置、角度（度，逆时针为正）和缩放比例"""
+    score: float
+    center: Tuple[float, float]
+    angle: float
+    scale: float
+    variants: int
+    candidates: int
+
+
+def pose_grid(rotation_range: float, angle_step: float,
+              scale_range: float, scale_step: float) -> Tuple[List[float], List[float]]:
+    """生成以 0° / 1.0 为中心的角度和缩放网格"""
+    n_angles = int(rotation_range // angle_step) if rotation_range > 0 and angle_step > 0 else 0
+    n_scales = int(round(scale_range / scale_step, 6)) if scale_range > 0 and scale_step > 0 else 0
+    angles = [round(angle_step * i, 6) for i in range(-n_angles, n_angles + 1)]
+    scales = [round(1.0 + scale_step * i, 6) for i in range(-n_scales, n_scales + 1)]
+    return angles, scales
+
+
+def inscribed_size(w: float, h: float, angle: float) -> Tuple[float, float]:
+    """w×h 矩形旋转 angle 度后，完全位于其内部的最大轴对齐矩形的尺寸"""
+    sin_a, cos_a = abs(math.sin(math.radians(angle))), abs(math.cos(math.radians(angle)))
+    long_side, short_side = max(w, h), min(w, h)
+    if short_side <= 2 * sin_a * cos_a * long_side or abs(sin_a - cos_a) < 1e-10:
+        half = 0.5 * short_side
+        return (half / sin_a, half / cos_a) if w >= h else (half / cos_a, half / sin_a)
+    cos_2a = cos_a * cos_a - sin_a * sin_a
+    return (w * cos_a - h * sin_a) / cos_2a, (h * cos_a - w * sin_a) / cos_2a
+
+
+def build_variants(template: np.ndarray, angles: Sequence[float], scales: Sequence[float],
+                   levels: int) -> List[TemplateVariant]:
+    """生成旋转缩放后的模板变体及其金字塔
+
+    每个变体裁剪为该角度下旋转后模板内部的最大轴对齐矩形（不含填充的边角），
+    0° 变体保留完整模板；得分为归一化相关系数，不同尺寸的变体之间可以直接比较。
+    金字塔层数按最小的变体确定，所有变体层数相同。
+    """
+    h, w = template.shape[:2]
+    cx, cy = (w - 1) / 2, (h - 1) / 2
+    crop = {angle: inscribed_size(w, h, angle) for angle in angles}
+    min_w, min_h = min(c[0] for c in crop.values()), min(c[1] for c in crop.values())
+    levels = usable_levels((int(min_h * min(scales)), int(min_w * min(scales))), levels)
+
+    variants = []
+    for scale in scales:
+        for angle in angles:
+            cw, ch = max(1, int(crop[angle][0] * scale + 1e-6)), max(1, int(crop[angle][1] * scale + 1e-6))
+            matrix = cv2.getRotationMatrix2D((cx, cy), angle, scale)
+            matrix[0, 2] += (cw - 1) / 2 - cx
+            matrix[1, 2] += (ch - 1) / 2 - cy
+            variant = cv2.warpAffine(template, matrix, (cw, ch), flags=cv2.INTER_LINEAR,
+                                     borderMode=cv2.BORDER_REPLICATE)
+            variants.append(TemplateVariant(angle, scale, build_pyramid(variant, levels)))
+    return variants
+
+
+_variant_cache: "OrderedDict[tuple, List[TemplateVariant]]" = OrderedDict()
+_variant_lock = threading.Lock()
+
+
+def cached_variants(template: np.ndarray, angles: Sequence[float], scales: Sequence[float],
+                    levels: int) -> List[TemplateVariant]:
+    """按模板内容摘要缓存的 build_variants"""
+    key = (image_digest(template), tuple(angles), tuple(scales), levels)
+    with _variant_lock:
+        variants = _variant_cache.get(key)
+        if variants is not None:
+            _variant_cache.move_to_end(key)
+            return variants
+    variants = build_variants(template, angles, scales, levels)
+    with _variant_lock:
+        _variant_cache[key] = variants
+        while len(_variant_cache) > VARIANT_CACHE_SIZE:
+            _variant_cache.popitem(last=False)
+    return variants
+
+
+def _pose_source(source: np.ndarray, levels: int, workers: Optional[int]) -> Tuple[List[np.ndarray], TemplateBank]:
+    """源图像金字塔第 1 层起的各层和最粗层的 TemplateBank
+
+    缓存值不引用源图像本身（否则缓存条目不会随源图像释放），不分层时 TemplateBank 使用源图像的副本
+    """
+    coarser = build_pyramid(source, levels)[1:]
+    return coarser, TemplateBank(coarser[-1] if coarser else source.copy(), workers)
+
+
+def pose_match(source: np.ndarray, template: np.ndarray, angles: Sequence[float], scales: Sequence[float],
+               levels: int = -1, workers: Optional[int] = None) -> PoseMatch:
+    """旋转/缩放容忍匹配，返回得分最高的位姿
+
+    所有变体先在最粗层用 TemplateBank 并行评分，只保留得分接近最高分的前 POSE_CANDIDATES 个，
+    再逐层在候选附近的小窗口内细化；最终得分为原分辨率下的归一化相关系数。
+    levels < 0 时自动选择层数。
+    """
+    if levels < 0:
+        levels = auto_levels(source.shape)
+    variants = cached_variants(template, angles, scales, levels)
+    levels = len(variants[0].pyramid) - 1
+    # 源图像金字塔和最粗层的 TemplateBank 按源图像缓冲区缓存，同一源图像重复搜索时不再重算频谱
+    (coarser, bank), _ = RESPONSE_CACHE.get_or_compute(
+        source, None, ("位姿", levels), lambda: _pose_source(source, levels, workers))
+    sources = [source] + coarser
+    coarse_source = sources[-1]
+
+    fitting = [v for v in variants
+               if v.pyramid[0].shape[0] <= source.shape[0] and v.pyramid[0].shape[1] <= source.shape[1]
+               and v.pyramid[-1].shape[0] <= coarse_source.shape[0]
+               and v.pyramid[-1].shape[1] <= coarse_source.shape[1]]
+    if not fitting:
+        raise ValueError("模板图像大于源图像，无法进行匹配")
+
+    coarse_scores = bank.match_all([v.pyramid[-1] for v in fitting])
+    order = sorted(range(len(fitting)), key=lambda i: coarse_scores[i][0], reverse=True)
+    best_coarse = coarse_scores[order[0]][0]
+    survivors = [i for i in order[:POSE_CANDIDATES] if coarse_scores[i][0] >= best_coarse - POSE_PRUNE_MARGIN]
+
+    best = None
+    for i in survivors:
+        variant = fitting[i]
+        score, (x, y) = coarse_scores[i]
+        for level in range(levels - 1, -1, -1):
+            score, x, y = refine_match(sources[level], variant.pyramid[level], 2 * x, 2 * y)
+        if best is None or score > best[0]:
+            best = (score, x, y, variant)
+
+    score, x, y, variant = best
+    ch, cw = variant.pyramid[0].shape[:2]
+    return PoseMatch(score, (x + (cw - 1) / 2, y + (ch - 1) / 2), variant.angle, variant.scale,
+                     len(fitting), len(survivors))
+
+
+def draw_pose(image: np.ndarray, template_shape: Tuple[int, int], pose: PoseMatch,
+              color=(0, 255, 0), thickness: int = 2) -> np.ndarray:
+    """按位姿绘制模板的旋转外框"""
+    h, w = template_shape[:2]
+    # RotatedRect 的角度以顺时针为正
+    corners = cv2.boxPoints((pose.center, (w * pose.scale, h * pose.scale), -pose.angle))
+    cv2.polylines(image, [np.round(corners).astype(np.int32).reshape(-1, 1, 2)], True, color, thickness)
+    return image
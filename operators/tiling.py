@@ -0,0 +1,221 @@
+"""
+分块处理
+把大图切成带重叠边（halo）的图块，在线程池中并行计算后无缝拼接。
+halo 按算子的邻域大小确定，峰值内存约为 图块大小 × 线程数（不含输出图像本身）。
+OpenCV 在计算时会释放 GIL，因此线程池即可利用多核。
+"""
+
+import os
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from .operators import MorphologyOperator, EdgeDetectionOperator, DistanceOperator
+
+
+DEFAULT_TILE_SIZE = 1024
+
+# Canny 的滞后阈值连接不是局部操作，分块时只在该 halo 范围内保证边缘连接一致
+CANNY_HALO = 32
+
+# 分块距离变换的默认截断距离（同时作为 halo）
+DEFAULT_MAX_DISTANCE = 64
+
+
+def iter_tiles(shape: Tuple[int, int], tile_size: int) -> Iterator[Tuple[int, int, int, int]]:
+    """按行优先枚举图块范围 (y0, y1, x0, x1)"""
+    h, w = shape[:2]
+    for y0 in range(0, h, tile_size):
+        for x0 in range(0, w, tile_size):
+            yield y0, min(y0 + tile_size, h), x0, min(x0 + tile_size, w)
+
+
+def run_tiles(image: np.ndarray, halo: int, compute: Callable[[np.ndarray], np.ndarray],
+              out: Optional[np.ndarray], tile_size: int = DEFAULT_TILE_SIZE, workers: Optional[int] = None,
+              reduce: Optional[Callable[[np.ndarray], tuple]] = None) -> List[tuple]:
+    """分块执行 compute 并把结果写入 out
+
+    每个图块向四周扩展 halo 像素（在图像边界处截断，使边界行为与整图计算一致），
+    计算后只保留中心部分写回输出（out 为 None 时不写回）。同时在途的图块数不超过 2 × workers。
+    返回每个图块 reduce(中心结果) 的列表。
+    """
+    workers = workers or os.cpu_count() or 1
+    h, w = image.shape[:2]
+
+    def process(y0, y1, x0, x1):
+        py0, py1 = max(0, y0 - halo), min(h, y1 + halo)
+        px0, px1 = max(0, x0 - halo), min(w, x1 + halo)
+        result = compute(image[py0:py1, px0:px1])
+        interior = result[y0 - py0:y1 - py0, x0 - px0:x1 - px0]
+        if out is not None:
+            out[y0:y1, x0:x1] = interior
+        return reduce(interior) if reduce is not None else None
+
+    reductions = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        for tile in iter_tiles(image.shape, tile_size):
+            pending.append(executor.submit(process, *tile))
+            if len(pending) >= 2 * workers:
+                reductions.append(pending.popleft().result())
+        while pending:
+            reductions.append(pending.popleft().result())
+    return reductions
+
+
+def _count_nonzero(tile: np.ndarray) -> tuple:
+    return (cv2.countNonZero(tile),)
+
+
+def _prepare_out(image: np.ndarray, out: Optional[np.ndarray], dtype=np.uint8) -> np.ndarray:
+    if out is None:
+        return np.empty(image.shape[:2], dtype=dtype)
+    if out.shape[:2] != image.shape[:2]:
+        raise ValueError("输出数组尺寸与输入图像不一致")
+    return out
+
+
+def _size_text(image: np.ndarray) -> str:
+    return f"{image.shape[0]}x{image.shape[1]}"
+
+
+# ===== 形态学操作 =====
+
+def _tiled_morphology(morph_op: int, name: str, passes: int):
+    """构造分块形态学算子；passes 为邻域叠加次数（开/闭运算为 2）"""
+    def tiled(image: np.ndarray, kernel_size: int = 5, *, tile_size: int = DEFAULT_TILE_SIZE,
+              workers: Optional[int] = None, out: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Dict]:
+        kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
+        out = _prepare_out(image, out)
+        counts = run_tiles(image, passes * (kernel_size // 2),
+                           lambda region: cv2.morphologyEx(region, morph_op, kernel),
+                           out, tile_size, workers, _count_nonzero)
+        stats = {
+            "操作": name,
+            "核大小": f"{kernel_size}x{kernel_size}",
+            "白色像素数": sum(c[0] for c in counts),
+            "图像大小": _size_text(image),
+            "分块大小": tile_size,
+        }
+        return out, stats
+    return tiled
+
+
+# ===== 边缘检测 =====
+
+def _tiled_gradient(name: str, dx: int, dy: int):
+    """构造分块 Sobel / Laplacian 算子（dx=dy=0 表示 Laplacian）"""
+    def tiled(image: np.ndarray, ksize: int = 3, *, tile_size: int = DEFAULT_TILE_SIZE,
+              workers: Optional[int] = None, out: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Dict]:
+        if dx or dy:
+            compute = lambda region: EdgeDetectionOperator._abs_response(
+                cv2.Sobel(region, cv2.CV_32F, dx, dy, ksize=ksize))
+        else:
+            compute = lambda region: EdgeDetectionOperator._abs_response(
+                cv2.Laplacian(region, cv2.CV_32F, ksize=ksize))
+        out = _prepare_out(image, out)
+        run_tiles(image, max(1, ksize // 2), compute, out, tile_size, workers)
+        # 归一化依赖全局最小/最大值，在拼接后的结果上原地完成
+        cv2.normalize(out, out, 0, 255, cv2.NORM_MINMAX)
+        stats = {
+            "操作": name,
+            "核大小": ksize,
+            "平均灰度值": float(np.mean(out)),
+            "图像大小": _size_text(image),
+            "分块大小": tile_size,
+        }
+        return out, stats
+    return tiled
+
+
+def tiled_canny(image: np.ndarray, threshold1: int = 100, threshold2: int = 200, *,
+                tile_size: int = DEFAULT_TILE_SIZE, workers: Optional[int] = None,
+                out: Optional[np.ndarray] = None, halo: int = CANNY_HALO) -> Tuple[np.ndarray, Dict]:
+    """分块 Canny（滞后阈值连接只在 halo 范围内与整图结果一致）"""
+    out = _prepare_out(image, out)
+    counts = run_tiles(image, halo, lambda region: cv2.Canny(region, threshold1, threshold2),
+                       out, tile_size, workers, _count_nonzero)
+    stats = {
+        "操作": "Canny边缘检测",
+        "低阈值": threshold1,
+        "高阈值": threshold2,
+        "白色像素数": sum(c[0] for c in counts),
+        "图像大小": _size_text(image),
+        "分块大小": tile_size,
+    }
+    return out, stats
+
+
+# ===== 距离变换 =====
+
+def tiled_distance_transform(image: np.ndarray, kernel_size: int = 5, *, max_distance: int = DEFAULT_MAX_DISTANCE,
+                             tile_size: int = DEFAULT_TILE_SIZE, workers: Optional[int] = None,
+                             out: Optional[np.ndarray] = None) -> Tuple[np.ndarray, Dict]:
+    """分块欧氏距离变换，距离截断到 max_distance（也是 halo）
+
+    最近背景点在 max_distance 以内的像素结果与整图计算完全一致。
+    第一遍统计全局最大值/均值，第二遍按全局范围归一化写出，避免保存整幅浮点结果。
+    """
+    limit = float(max_distance)
+
+    def distance(region):
+        dist = cv2.distanceTransform(region, cv2.DIST_L2, cv2.DIST_MASK_PRECISE)
+        return np.minimum(dist, limit, out=dist)
+
+    def summarize(tile):
+        positive = tile[tile > 0]
+        return float(tile.min()), float(tile.max()), float(positive.sum()), positive.size
+
+    summaries = run_tiles(image, max_distance, distance, None, tile_size, workers, summarize)
+    lo = min(s[0] for s in summaries)
+    hi = max(s[1] for s in summaries)
+    total = sum(s[2] for s in summaries)
+    count = sum(s[3] for s in summaries)
+
+    scale = 255.0 / (hi - lo) if hi > lo else 0.0
+    out = _prepare_out(image, out)
+    run_tiles(image, max_distance,
+              lambda region: ((distance(region) - lo) * scale).astype(np.uint8),
+              out, tile_size, workers)
+
+    stats = {
+        "操作": "距离变换",
+        "最大距离": hi,
+        "平均距离": total / count if count else 0,
+        "截断距离": max_distance,
+        "图像大小": _size_text(image),
+        "分块大小": tile_size,
+    }
+    return out, stats
+
+
+# 支持分块执行的算子：原算子函数 -> 分块版本
+TILED_OPERATORS = {
+    MorphologyOperator.erode: _tiled_morphology(cv2.MORPH_ERODE, "腐蚀", 1),
+    MorphologyOperator.dilate: _tiled_morphology(cv2.MORPH_DILATE, "膨胀", 1),
+    MorphologyOperator.open: _tiled_morphology(cv2.MORPH_OPEN, "开运算", 2),
+    MorphologyOperator.close: _tiled_morphology(cv2.MORPH_CLOSE, "闭运算", 2),
+    MorphologyOperator.gradient: _tiled_morphology(cv2.MORPH_GRADIENT, "形态学梯度", 1),
+    EdgeDetectionOperator.canny: tiled_canny,
+    EdgeDetectionOperator.sobel_x: _tiled_gradient("Sobel X", 1, 0),
+    EdgeDetectionOperator.sobel_y: _tiled_gradient("Sobel Y", 0, 1),
+    EdgeDetectionOperator.laplacian: _tiled_gradient("Laplacian", 0, 0),
+    DistanceOperator.distance_transform: tiled_distance_transform,
+}
+
+
+def supports_tiling(func: Callable) -> bool:
+    """算子是否有分块版本"""
+    return func in TILED_OPERATORS
+
+
+def tiled_apply(func: Callable, image: np.ndarray, *args, **kwargs) -> Tuple[np.ndarray, Dict]:
+    """以分块方式执行 OPERATORS 中的算子，位置参数与原算子相同，
+    另外接受仅限关键字的 tile_size、workers 和 out（可为 np.memmap），距离变换还接受 max_distance"""
+    tiled = TILED_OPERATORS.get(func)
+    if tiled is None:
+        raise ValueError(f"算子 {getattr(func, '__qualname__', func)} 不支持分块处理")
+    return tiled(image, *args, **kwargs)
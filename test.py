@@ -36,6 +36,425 @@ def test_operators():
                 print(f"  ✗ {op_name}: 失败 - {str(e)}")
 
 
+def test_dbscan():
+    """测试 DBSCAN 网格索引实现"""
+    print("测试 DBSCAN...")
+    
+    from operators.operators import ClusterOperator
+    
+    rng = np.random.default_rng(0)
+    blob1 = rng.normal(loc=[100, 100], scale=5, size=(50, 2))
+    blob2 = rng.normal(loc=[400, 400], scale=5, size=(50, 2))
+    noise = np.array([[250, 250], [50, 500]])
+    points = np.vstack([blob1, blob2, noise]).astype(np.float32)
+    
+    labels, n_clusters = ClusterOperator._dbscan_impl(points, 20.0, 5)
+    if n_clusters == 2 and list(labels[-2:]) == [-1, -1] and len(set(labels[:50])) == 1:
+        print(f"  ✓ DBSCAN: 成功 (簇数量 {n_clusters})")
+    else:
+        print(f"  ✗ DBSCAN: 失败 - 簇数量 {n_clusters}")
+
+
+def test_optics():
+    """测试可达性排序提取的 DBSCAN 标签与直接计算一致"""
+    print("测试 OPTICS 可达性排序...")
+    
+    from operators.operators import ClusterOperator
+    from operators.optics import ReachabilityModel
+    
+    rng = np.random.default_rng(1)
+    points = np.vstack([rng.normal(loc=[100, 100], scale=8, size=(60, 2)),
+                        rng.normal(loc=[160, 120], scale=8, size=(60, 2)),
+                        rng.uniform(0, 300, size=(30, 2))]).astype(np.float32)
+    
+    model = ReachabilityModel(points, 5, 60.0)
+    for eps in (10.0, 20.0, 40.0):
+        expected, n_expected = ClusterOperator._dbscan_impl(points, eps, 5)
+        labels, n_clusters = model.dbscan(eps)
+        if n_clusters != n_expected or not np.array_equal(labels == -1, expected == -1):
+            print(f"  ✗ OPTICS: 失败 - eps={eps} 簇数量 {n_clusters}/{n_expected}")
+            return
+    print("  ✓ OPTICS: 成功")
+
+
+def test_incremental_dbscan():
+    """测试增量 DBSCAN 逐点增删后与直接计算一致"""
+    print("测试增量 DBSCAN...")
+    
+    from operators.operators import ClusterOperator
+    from operators.incremental import IncrementalDBSCAN
+    
+    rng = np.random.default_rng(2)
+    points = rng.uniform(0, 300, size=(150, 2)).astype(np.float32)
+    engine = IncrementalDBSCAN()
+    engine.update(points, 20.0, 4)
+    for step in range(40):
+        if step % 3 == 2:
+            points = np.delete(points, rng.integers(len(points)), axis=0)
+        else:
+            points = np.vstack([points, rng.uniform(0, 300, size=(1, 2)).astype(np.float32)])
+        labels, n_clusters, mode = engine.update(points, 20.0, 4)
+        expected, n_expected = ClusterOperator._dbscan_impl(points, 20.0, 4)
+        if not mode.startswith("增量") or n_clusters != n_expected or not np.array_equal(labels == -1, expected == -1):
+            print(f"  ✗ 增量 DBSCAN: 失败 - 第 {step} 步 {mode} 簇数量 {n_clusters}/{n_expected}")
+            return
+    print("  ✓ 增量 DBSCAN: 成功")
+
+
+def test_thinning():
+    """测试骨架细化的整图和候选像素两种方式都与逐轮整图计算的 Zhang-Suen 一致"""
+    print("测试骨架细化...")
+    import cv2
+    from operators.operators import SkeletonOperator
+
+    def reference(binary):
+        img = np.pad(binary.astype(np.uint8), 1)
+        while True:
+            changed = False
+            for step in (0, 1):
+                p2, p3, p4 = img[:-2, 1:-1], img[:-2, 2:], img[1:-1, 2:]
+                p5, p6, p7 = img[2:, 2:], img[2:, 1:-1], img[2:, :-2]
+                p8, p9 = img[1:-1, :-2], img[:-2, :-2]
+                ring = [p2, p3, p4, p5, p6, p7, p8, p9, p2]
+                b = sum(p.astype(int) for p in ring[:8])
+                a = sum(((ring[i] == 0) & (ring[i + 1] == 1)).astype(int) for i in range(8))
+                if step == 0:
+                    cond = (p2 * p4 * p6 == 0) & (p4 * p6 * p8 == 0)
+                else:
+                    cond = (p2 * p4 * p8 == 0) & (p2 * p6 * p8 == 0)
+                delete = (img[1:-1, 1:-1] == 1) & (b >= 2) & (b <= 6) & (a == 1) & cond
+                if delete.any():
+                    img[1:-1, 1:-1][delete] = 0
+                    changed = True
+            if not changed:
+                return img[1:-1, 1:-1]
+
+    rng = np.random.default_rng(0)
+    masks = []
+    for size in (64, 97, 160):
+        field = cv2.GaussianBlur(rng.random((size, size + 13)).astype(np.float32), (0, 0), 3)
+        masks.append((field > np.quantile(field, 0.5)).astype(np.uint8))
+        masks.append((rng.random((size, size)) < 0.3).astype(np.uint8))
+
+    original = SkeletonOperator._DENSE_RATIO
+    # 默认阈值、始终整图处理、第一轮后即只检查候选像素
+    try:
+        for ratio in (original, 1e9, 1e-9):
+            SkeletonOperator._DENSE_RATIO = ratio
+            for mask in masks:
+                result, _ = SkeletonOperator._thinning(mask)
+                if not np.array_equal(result, reference(mask)):
+                    print(f"  ✗ 骨架细化: 失败 - 阈值 {ratio} 尺寸 {mask.shape} 与参考结果不一致")
+                    return
+    finally:
+        SkeletonOperator._DENSE_RATIO = original
+    print("  ✓ 骨架细化: 成功")
+
+
+def test_load_array():
+    """测试 .npy / .raw 数组文件的内存映射加载"""
+    print("测试数组文件加载...")
+    import json
+    import os
+    import tempfile
+    from operators.image_io import load_array, write_raw
+
+    rng = np.random.default_rng(0)
+    mask = np.where(rng.random((37, 53)) < 0.3, 255, 0).astype(np.uint8)
+    with tempfile.TemporaryDirectory() as tmp:
+        npy_path = os.path.join(tmp, "mask.npy")
+        np.save(npy_path, mask)
+        loaded = load_array(npy_path)
+        bool_path = os.path.join(tmp, "flags.npy")
+        np.save(bool_path, mask > 0)
+        if (isinstance(loaded, np.memmap) and not loaded.flags.writeable and np.array_equal(loaded, mask)
+                and np.array_equal(load_array(bool_path), mask)):
+            print("  ✓ NPY 内存映射: 成功")
+        else:
+            print("  ✗ NPY 内存映射: 失败 - 数据或只读属性不一致")
+        del loaded
+
+        raw_path = os.path.join(tmp, "mask.raw")
+        write_raw(raw_path, mask)
+        # 带文件头偏移的原始数据
+        offset_path = os.path.join(tmp, "offset.raw")
+        with open(offset_path, "wb") as f:
+            f.write(b"HEADER!!" + mask.tobytes())
+        with open(offset_path + ".json", "w", encoding="utf-8") as f:
+            json.dump({"shape": list(mask.shape), "dtype": "uint8", "offset": 8}, f)
+        raw, shifted = load_array(raw_path), load_array(offset_path)
+        if (isinstance(raw, np.memmap) and not raw.flags.writeable
+                and np.array_equal(raw, mask) and np.array_equal(shifted, mask)):
+            print("  ✓ RAW 头文件加载: 成功")
+        else:
+            print("  ✗ RAW 头文件加载: 失败 - 数据或只读属性不一致")
+        del raw, shifted
+
+        missing_path = os.path.join(tmp, "missing.raw")
+        mask.tofile(missing_path)
+        try:
+            load_array(missing_path)
+            print("  ✗ RAW 缺少头文件: 失败 - 没有报错")
+        except ValueError:
+            print("  ✓ RAW 缺少头文件: 成功")
+
+
+def test_profiling():
+    """测试阶段计时合并到统计信息并写出 JSONL 跟踪记录"""
+    print("测试性能剖析...")
+    import json
+    import os
+    import tempfile
+    from operators.operators import MorphologyOperator
+    from operators.profiling import OperatorProfiler
+
+    image = np.zeros((100, 100), dtype=np.uint8)
+    image[25:75, 25:75] = 255
+    with tempfile.TemporaryDirectory() as tmp:
+        trace_path = os.path.join(tmp, "trace.jsonl")
+        profiler = OperatorProfiler(trace_path=trace_path)
+        erode = profiler.wrap("形态学操作/腐蚀", MorphologyOperator.erode)
+        _, stats = erode(image, 5)
+        erode(image, 3)
+
+        expected = {"总耗时", "耗时(构建核)", "耗时(计算)", "耗时(统计)"}
+        if expected <= set(stats) and stats["总耗时"].endswith(" ms"):
+            print("  ✓ 阶段耗时: 成功")
+        else:
+            print(f"  ✗ 阶段耗时: 失败 - 统计信息键为 {list(stats)}")
+
+        with open(trace_path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f]
+        if (len(records) == 2 and records[0]["operator"] == "形态学操作/腐蚀"
+                and set(records[0]["stages_ms"]) == {"构建核", "计算", "统计"} and records[0]["total_ms"] >= 0):
+            print("  ✓ JSONL 跟踪: 成功")
+        else:
+            print(f"  ✗ JSONL 跟踪: 失败 - {records}")
+
+    # 未经剖析器包装时 stage 不记录，也不改变统计信息
+    _, stats = MorphologyOperator.erode(image, 5)
+    if "总耗时" not in stats:
+        print("  ✓ 未剖析调用: 成功")
+    else:
+        print("  ✗ 未剖析调用: 失败 - 统计信息中出现耗时")
+
+
+def test_tiling():
+    """测试分块执行与整图计算的结果逐字节一致"""
+    print("测试分块处理...")
+    import cv2
+    from operators.operators import MorphologyOperator, EdgeDetectionOperator, DistanceOperator
+    from operators.tiling import tiled_apply
+
+    rng = np.random.default_rng(0)
+    image = np.zeros((700, 900), dtype=np.uint8)
+    for _ in range(60):
+        center = tuple(int(v) for v in rng.integers(0, 900, 2))
+        cv2.circle(image, center, int(rng.integers(5, 40)), 255, -1)
+
+    cases = [
+        ("腐蚀", MorphologyOperator.erode, (5,)),
+        ("开运算", MorphologyOperator.open, (5,)),
+        ("闭运算", MorphologyOperator.close, (7,)),
+        ("形态学梯度", MorphologyOperator.gradient, (5,)),
+        ("Sobel X", EdgeDetectionOperator.sobel_x, (3,)),
+        ("Sobel Y", EdgeDetectionOperator.sobel_y, (5,)),
+        ("Laplacian", EdgeDetectionOperator.laplacian, (3,)),
+        # 圆半径不超过 40，距离都在截断距离以内；kernel_size 按原算子的位置传入
+        ("距离变换", DistanceOperator.distance_transform, (5,)),
+    ]
+    for name, func, args in cases:
+        expected, _ = func(image, *args)
+        result, _ = tiled_apply(func, image, *args, tile_size=256, workers=2)
+        if result.dtype == expected.dtype and np.array_equal(result, expected):
+            print(f"  ✓ 分块{name}: 成功")
+        else:
+            print(f"  ✗ 分块{name}: 失败 - 与整图结果不一致")
+
+
+def test_result_cache():
+    """测试结果缓存的命中、淘汰和只读保护"""
+    print("测试结果缓存...")
+    from operators.cache import OperatorCache
+    from operators.operators import DistanceOperator
+
+    image = np.zeros((100, 100), dtype=np.uint8)
+    image[25:75, 25:75] = 255
+    cache = OperatorCache(max_bytes=2 * image.nbytes + 1024)
+    cached = cache.wrap("距离变换/欧氏距离变换", DistanceOperator.distance_transform)
+
+    first, _ = cached(image)
+    second, _ = cached(image.copy(), kernel_size=5)
+    info = cache.info()
+    if second is first and info["命中"] == 1 and info["未命中"] == 1:
+        print("  ✓ 缓存命中: 成功")
+    else:
+        print(f"  ✗ 缓存命中: 失败 - {info}")
+
+    try:
+        first[0, 0] = 1
+        print("  ✗ 缓存只读: 失败 - 缓存结果可以被修改")
+    except ValueError:
+        print("  ✓ 缓存只读: 成功")
+
+    # 预算只够两条结果，第三幅图像写入后最久未使用的第一条被淘汰
+    for offset in (1, 2):
+        cached(np.roll(image, offset, axis=1))
+    cached(image)
+    info = cache.info()
+    if info["条目数"] == 2 and info["未命中"] == 4 and info["占用字节"] <= cache.max_bytes:
+        print("  ✓ 缓存淘汰: 成功")
+    else:
+        print(f"  ✗ 缓存淘汰: 失败 - {info}")
+
+
+def test_pyramid_match():
+    """测试金字塔匹配找回已知位置"""
+    print("测试金字塔匹配...")
+    import cv2
+    from operators.template_matching import pyramid_match
+
+    rng = np.random.default_rng(0)
+    source = cv2.GaussianBlur(rng.integers(0, 256, (480, 640), dtype=np.uint8), (5, 5), 0)
+    x, y = 213, 147
+    template = source[y:y + 64, x:x + 80].copy()
+    score, position, _, levels = pyramid_match(source, template, 2)
+    if position == (x, y) and levels == 2 and score > 0.99:
+        print(f"  ✓ 金字塔匹配: 成功 (位置 {position})")
+    else:
+        print(f"  ✗ 金字塔匹配: 失败 - 位置 {position} 得分 {score:.3f} 层数 {levels}")
+
+
+def test_nms():
+    """测试 NMS 去除重复框"""
+    print("测试 NMS...")
+    from operators.template_matching import non_max_suppression
+
+    boxes = np.array([[10, 10, 50, 50], [12, 11, 50, 50], [100, 100, 50, 50], [11, 9, 50, 50],
+                      [130, 100, 50, 50]], dtype=np.int32)
+    keep = non_max_suppression(boxes, 0.3)
+    if list(keep) == [0, 2, 4] and list(non_max_suppression(boxes, 0.3, max_count=2)) == [0, 2]:
+        print("  ✓ NMS: 成功")
+    else:
+        print(f"  ✗ NMS: 失败 - 保留 {list(keep)}")
+
+
+def test_template_bank():
+    """测试 TemplateBank 的响应图与 cv2.matchTemplate (TM_CCOEFF_NORMED) 一致"""
+    print("测试模板库匹配...")
+    import cv2
+    from numpy.lib.stride_tricks import sliding_window_view
+    from operators.template_matching import TemplateBank
+
+    rng = np.random.default_rng(0)
+    source = cv2.GaussianBlur(rng.integers(0, 256, (300, 400), dtype=np.uint8), (7, 7), 0)
+    bank = TemplateBank(source)
+
+    boxes = [(40, 50, 16, 16), (120, 200, 33, 21), (10, 10, 96, 80), (150, 60, 24, 64)]
+    templates = [source[y:y + h, x:x + w].copy() for y, x, h, w in boxes]
+    matches = bank.match_all(templates)
+    for (y, x, h, w), template, (score, loc) in zip(boxes, templates, matches):
+        response = bank.response(template)
+        expected = cv2.matchTemplate(source, template, cv2.TM_CCOEFF_NORMED)
+        error = float(np.abs(response - expected).max())
+        _, _, _, expected_loc = cv2.minMaxLoc(expected)
+        if error > 5e-3 or loc != expected_loc or loc != (x, y) or score < 0.999:
+            print(f"  ✗ 模板库 {h}x{w}: 失败 - 最大误差 {error:.2e} 位置 {loc}/{expected_loc}")
+            return
+    print("  ✓ 模板库与 matchTemplate 一致: 成功")
+
+    # 高亮、低对比度图像（240~243）与双精度逐窗口计算的精确值比较：
+    # 不减去全局均值时单精度相关的相消误差约为 1e-5，OpenCV 约为 1e-2
+    bright = cv2.GaussianBlur(240 + rng.integers(0, 4, (300, 400), dtype=np.uint8), (3, 3), 0)
+    template = bright[150:182, 200:240].copy()
+    response = TemplateBank(bright).response(template)
+    windows = sliding_window_view(bright[110:221, 160:279].astype(np.float64), template.shape)
+    windows = windows - windows.mean(axis=(2, 3), keepdims=True)
+    centered = template - template.mean()
+    numerator = (windows * centered).sum(axis=(2, 3))
+    denominator = np.sqrt((windows * windows).sum(axis=(2, 3)) * (centered * centered).sum())
+    exact = numerator / np.where(denominator > 0, denominator, 1)
+    error = float(np.abs(response[110:190, 160:240] - exact).max())
+    _, _, _, loc = cv2.minMaxLoc(response)
+    if error < 1e-6 and loc == (200, 150):
+        print(f"  ✓ 模板库低对比度精度: 成功 (最大误差 {error:.1e})")
+    else:
+        print(f"  ✗ 模板库低对比度精度: 失败 - 最大误差 {error:.2e} 位置 {loc}")
+
+
+def test_kmeans_workers():
+    """测试 KMeans 多次重启的结果与线程数无关"""
+    print("测试 KMeans 并行重启...")
+    from operators.clustering import kmeans
+
+    rng = np.random.default_rng(0)
+    centers = rng.uniform(0, 500, size=(6, 2))
+    points = np.vstack([rng.normal(c, 25, size=(200, 2)) for c in centers])
+    results = [kmeans(points, 6, seed=3, warm_start=False, workers=workers) for workers in (1, 2, 8)]
+    if all(np.array_equal(r.labels, results[0].labels) and np.array_equal(r.centers, results[0].centers)
+           for r in results[1:]):
+        print("  ✓ KMeans 线程数无关: 成功")
+    else:
+        print("  ✗ KMeans 线程数无关: 失败 - 不同线程数得到不同标签")
+
+
+def test_draw_clusters():
+    """测试向量化的聚类绘制与逐点画圆结果一致"""
+    print("测试聚类结果绘制...")
+    import cv2
+    from operators.points import draw_clusters, cluster_palette
+
+    rng = np.random.default_rng(0)
+    h, w = 240, 320
+    # 包含重叠点、越界点和噪点
+    points = rng.uniform(-10, [w + 10, h + 10], size=(400, 2)).astype(np.float32)
+    labels = rng.integers(-1, 5, size=len(points))
+
+    expected = np.full((h, w, 3), 255, dtype=np.uint8)
+    palette = cluster_palette(5)
+    for (px, py), label in zip(points, labels):
+        color = (128, 128, 128) if label == -1 else tuple(int(c) for c in palette[label % len(palette)])
+        cv2.circle(expected, (int(px), int(py)), 6, color, -1)
+        cv2.circle(expected, (int(px), int(py)), 7, (0, 0, 0), 1)
+
+    result = draw_clusters((h, w), points, labels, 5)
+    if np.array_equal(result, expected):
+        print("  ✓ 聚类绘制: 成功")
+    else:
+        print(f"  ✗ 聚类绘制: 失败 - {np.count_nonzero((result != expected).any(axis=2))} 个像素不一致")
+
+
+def test_image_bridge():
+    """测试 NumPy / QImage 桥接的往返一致性和写时复制"""
+    print("测试图像桥接...")
+    try:
+        from ui.image_bridge import array_to_qimage, qimage_view
+    except Exception as e:
+        print(f"  ✗ 图像桥接导入失败: {str(e)}")
+        return
+
+    rng = np.random.default_rng(0)
+    array = rng.integers(0, 256, (40, 50, 3), dtype=np.uint8)
+    gray = array[..., 0].copy()
+    # ROI 切片带行跨度，不复制直接引用
+    roi = array[5:30, 7:40]
+    image = array_to_qimage(roi)
+    view = qimage_view(image)
+    if (np.array_equal(view, roi) and not view.flags.writeable
+            and np.array_equal(qimage_view(array_to_qimage(gray)), gray)):
+        print("  ✓ 图像桥接往返: 成功")
+    else:
+        print("  ✗ 图像桥接往返: 失败 - 像素不一致")
+
+    original, snapshot = array.copy(), view.copy()
+    image.fill(0)
+    if (np.array_equal(array, original) and np.array_equal(view, snapshot)
+            and not qimage_view(image).any()):
+        print("  ✓ 写时复制: 成功")
+    else:
+        print("  ✗ 写时复制: 失败 - 修改 QImage 影响了数组或已有视图")
+
+
 def test_import():
     """测试模块导入"""
     print("测试模块导入...")
@@ -66,6 +485,20 @@ if __name__ == "__main__":
     
     test_import()
     test_operators()
+    test_dbscan()
+    test_optics()
+    test_incremental_dbscan()
+    test_thinning()
+    test_tiling()
+    test_load_array()
+    test_profiling()
+    test_result_cache()
+    test_pyramid_match()
+    test_nms()
+    test_template_bank()
+    test_kmeans_workers()
+    test_draw_clusters()
+    test_image_bridge()
     
     print("\n" + "=" * 50)
     print("测试完成!")
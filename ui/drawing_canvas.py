@@ -9,6 +9,8 @@ from PyQt5.QtCore import Qt, pyqtSignal, QPoint
 import numpy as np
 import cv2
 from config import *
+from operators.points import PointSet, rasterize_points
+from .image_bridge import array_to_qimage, qimage_view
 
 
 class DrawingCanvas(QWidget):
@@ -31,6 +33,9 @@ class DrawingCanvas(QWidget):
         # 聚类模式（白底黑字）
         self.cluster_mode = False
         
+        # 点模式下点击的坐标（与栅格图同步，聚类算子直接使用坐标，无需从图像中提取）
+        self.point_set = PointSet()
+        
         # 标尺显示
         self.show_ruler = False
         self.ruler_spacing = RULER_SPACING  # 标尺间距（像素）
@@ -47,7 +52,10 @@ class DrawingCanvas(QWidget):
     
     def mousePressEvent(self, event):
         """鼠标按下事件"""
-        if event.button() == Qt.LeftButton:
+        if event.button() == Qt.RightButton and self.point_mode:
+            # 点模式：右键删除最近的点
+            self.remove_point(event.pos())
+        elif event.button() == Qt.LeftButton:
             if self.point_mode:
                 # 点模式：直接在点击位置绘制一个固定大小的圆点
                 self.draw_point(event.pos())
@@ -86,6 +94,17 @@ class DrawingCanvas(QWidget):
         painter.setBrush(QBrush(point_color))
         painter.drawEllipse(pos, self.point_radius, self.point_radius)
         painter.end()
+        self.point_set.append(pos.x(), pos.y())
+        self.update()
+        self.image_changed.emit()
+    
+    def remove_point(self, pos):
+        """删除点击位置附近的点，并按剩余的点重新栅格化"""
+        index = self.point_set.nearest(pos.x(), pos.y(), 2 * self.point_radius)
+        if index < 0:
+            return
+        self.point_set.remove(index)
+        self._rasterize_points()
         self.update()
         self.image_changed.emit()
     
@@ -105,6 +124,7 @@ class DrawingCanvas(QWidget):
         """设置聚类模式（白底黑字）"""
         self.cluster_mode = enabled
         self.show_ruler = enabled  # 聚类模式自动显示标尺
+        self.point_set.clear()
         if enabled:
             # 切换到白底
             self.image.fill(QColor(255, 255, 255))
@@ -164,6 +184,7 @@ class DrawingCanvas(QWidget):
     
     def clear_canvas(self):
         """清空画布"""
+        self.point_set.clear()
         if self.cluster_mode:
             self.image.fill(QColor(255, 255, 255))  # 聚类模式用白底
         else:
@@ -180,27 +201,40 @@ class DrawingCanvas(QWidget):
         self.brush_color = color
     
     def get_image_array(self) -> np.ndarray:
-        """获取画布内容为NumPy数组"""
-        width = self.image.width()
-        height = self.image.height()
-        ptr = self.image.bits()
-        ptr.setsize(self.image.byteCount())
-        arr = np.array(ptr).reshape(height, self.image.bytesPerLine())
-        # 移除行填充，只保留实际的宽度数据
-        arr = arr[:, :width]
-        return arr
+        """获取画布内容为NumPy数组（只读视图，不复制；之后在画布上绘制时 Qt 先复制，返回的数组保持不变）"""
+        return qimage_view(self.image)
     
     def set_image_array(self, arr: np.ndarray):
-        """从NumPy数组设置画布内容"""
+        """从NumPy数组设置画布内容（之前的点坐标作废）
+
+        画布直接引用该数组，首次在画布上绘制时才复制，数组本身不会被修改
+        """
         if len(arr.shape) == 2:
-            height, width = arr.shape
-            arr = np.ascontiguousarray(arr)
-            bytes_per_line = width
-            q_image = QImage(arr.data, width, height, bytes_per_line, QImage.Format_Grayscale8)
-            self.image = q_image.copy()
+            self.point_set.clear()
+            self._load_raster(arr)
             self.update()
             self.image_changed.emit()
     
+    def _load_raster(self, arr: np.ndarray, writable: bool = False):
+        self.image = array_to_qimage(arr, writable=writable)
+    
+    def _rasterize_points(self):
+        """按点坐标重画画布"""
+        # 栅格图为新建数组，画布独占，绘制时直接写入
+        self._load_raster(rasterize_points(self.point_set.array, (self.image.height(), self.image.width()),
+                                           self.point_radius), writable=True)
+    
+    def get_points(self) -> np.ndarray:
+        """点模式下的点坐标 (N, 2)，只读视图"""
+        return self.point_set.array
+    
+    def set_points(self, points: np.ndarray):
+        """设置点集坐标，并把画布内容替换为这些点（画布范围外的点只保留坐标）"""
+        self.point_set.set(points)
+        self._rasterize_points()
+        self.update()
+        self.image_changed.emit()
+    
     def undo(self):
         """撤销操作 - 简单实现，清空画布"""
         self.clear_canvas()
@@ -0,0 +1,84 @@
+"""
+NumPy / QImage 缓冲区桥接
+两个方向都只建立视图、不复制像素：
+- array_to_qimage：QImage 直接引用数组内存（支持任意行跨度），并持有数组引用保证其生命周期；
+  默认在 Qt 的写时复制下使用，只有在 QImage 上绘制时才复制一次，数组本身不会被修改
+- qimage_view：QImage 像素的只读 NumPy 视图，行跨度由 strides 表示，不去除行填充；
+  视图引用图像的一个浅拷贝，原图之后被绘制时由 Qt 先分离，视图保持调用时的内容，可以直接交给后台线程
+单通道为 Grayscale8，三通道为 OpenCV 的 BGR 顺序（Format_BGR888），四通道为 BGRA（小端下即 Format_ARGB32）。
+"""
+
+import numpy as np
+from PyQt5 import sip
+from PyQt5.QtGui import QImage
+
+
+# 通道数与 QImage 格式的对应关系（字节顺序与 OpenCV 一致）
+_FORMATS = {
+    1: QImage.Format_Grayscale8,
+    3: QImage.Format_BGR888,
+    4: QImage.Format_ARGB32,
+}
+_CHANNELS = {fmt: channels for channels, fmt in _FORMATS.items()}
+
+# 引用外部内存的 QImage 上保存数组引用和写时复制用浅拷贝的属性名
+_BUFFER_ATTR = "_bridge_buffer"
+_GUARD_ATTR = "_bridge_guard"
+
+
+class _ImageBuffer:
+    """通过 __array_interface__ 把 QImage 的像素交给 NumPy，数组的 base 持有本对象，从而持有 QImage"""
+
+    def __init__(self, image: QImage, shape, strides, keep=None):
+        self.image = image
+        # image 引用外部数组时，连同该数组一起保持存活
+        self.keep = keep
+        self.__array_interface__ = {
+            "version": 3,
+            "shape": shape,
+            "strides": strides,
+            "typestr": "|u1",
+            "data": (int(image.constBits()), True),
+        }
+
+
+def array_to_qimage(array: np.ndarray, writable: bool = False) -> QImage:
+    """引用数组内存的 QImage（(H, W) 灰度、(H, W, 3) BGR 或 (H, W, 4) BGRA，uint8）
+
+    只要求每行内的像素连续，行跨度任意（ROI 切片等视图不需要复制）；否则先复制为连续数组。
+    writable=False 时额外保留一个浅拷贝，使 QImage 的数据处于共享状态，
+    在其上绘制会先由 Qt 复制（写时复制），数组不会被修改，只读数组（内存映射）也可以安全使用；
+    writable=True 时绘制直接写入数组，仅用于调用方独占的数组。
+    """
+    if array.dtype != np.uint8:
+        raise ValueError(f"仅支持 uint8 图像，实际类型为 {array.dtype}")
+    channels = 1 if array.ndim == 2 else array.shape[2] if array.ndim == 3 else 0
+    if channels not in _FORMATS:
+        raise ValueError(f"不支持的图像形状: {array.shape}")
+    if array.strides[1] != channels or array.strides[-1] != 1 or array.strides[0] < array.shape[1] * channels:
+        array = np.ascontiguousarray(array)
+    height, width = array.shape[:2]
+    image = QImage(sip.voidptr(array.ctypes.data), width, height, array.strides[0], _FORMATS[channels])
+    setattr(image, _BUFFER_ATTR, array)
+    if not writable:
+        setattr(image, _GUARD_ATTR, QImage(image))
+    return image
+
+
+def qimage_view(image: QImage) -> np.ndarray:
+    """QImage 像素的只读视图（不复制），形状为 (H, W) 或 (H, W, C)，行跨度为 bytesPerLine
+
+    需要修改时由调用方自行复制。其他像素格式先转换为 ARGB32（此时会复制一次）。
+    """
+    if image.format() not in _CHANNELS:
+        image = image.convertToFormat(QImage.Format_ARGB32)
+    # 浅拷贝共享像素数据；constBits 不会触发分离
+    snapshot = QImage(image)
+    channels = _CHANNELS[snapshot.format()]
+    height, width = snapshot.height(), snapshot.width()
+    if channels == 1:
+        shape, strides = (height, width), (snapshot.bytesPerLine(), 1)
+    else:
+        shape, strides = (height, width, channels), (snapshot.bytesPerLine(), channels, 1)
+    buffer = _ImageBuffer(snapshot, shape, strides, keep=getattr(image, _BUFFER_ATTR, None))
+    return np.asarray(buffer)
@@ -7,7 +7,7 @@ from PyQt5.QtWidgets import (QMainWindow, QWidget, QHBoxLayout, QVBoxLayout,
                              QStackedLayout, QPushButton, QLabel, QComboBox, QSpinBox,
                              QGroupBox, QFormLayout, QMessageBox, QFileDialog, QCheckBox,
                              QDoubleSpinBox)
-from PyQt5.QtCore import Qt
+from PyQt5.QtCore import Qt, QThreadPool, QTimer, pyqtSignal
 from PyQt5.QtGui import QFont
 import numpy as np
 import cv2
@@ -15,7 +15,11 @@ import cv2
 from .drawing_canvas import DrawingCanvas
 from .result_display import ResultDisplay
 from .roi_canvas import ROICanvas
-from operators import OPERATORS
+from .worker import OperatorWorker
+from operators import OPERATORS, CACHED_OPERATORS, RESULT_CACHE
+from operators.profiling import PROFILER, instrument_registry
+from operators.image_io import is_array_file, load_array
+from operators.points import load_points, save_points
 from config import *
 
 
@@ -158,7 +162,7 @@ OPERATOR_PARAMS = {
         "距离变换": [],
     },
     "模板匹配": {
-        "模板匹配": ["show_heatmap"],
+        "模板匹配": ["show_heatmap", "pyramid_levels", "max_matches", "score_threshold", "rotation_range", "scale_range"],
     },
     "聚类算法": {
         "KMeans": ["k_value"],
@@ -170,6 +174,8 @@ OPERATOR_PARAMS = {
 class MainWindow(QMainWindow):
     """主窗口类"""
     
+    result_ready = pyqtSignal(object)  # 最新一次算子结果图像
+    
     def __init__(self):
         super().__init__()
         self.setWindowTitle(APP_TITLE)
@@ -181,6 +187,24 @@ class MainWindow(QMainWindow):
         self.source_image = None
         self.is_template_matching = False
         
+        # 后台算子执行：每次提交任务递增代号，过期任务的结果直接丢弃
+        self.thread_pool = QThreadPool(self)
+        self.job_generation = 0
+        self.jobs_in_flight = 0
+        self.job_interactive = True
+        self.current_worker = None
+        
+        # 算子调用链：剖析（最外层，缓存命中也计时）-> 结果缓存 -> 原算子
+        PROFILER.configure(OPERATOR_TRACE_FILE, PROFILE_MEMORY)
+        self.operators = instrument_registry(CACHED_OPERATORS)
+        
+        # 实时预览：参数变化经防抖合并后重新运行，同一时刻最多一个任务在执行
+        self.preview_timer = QTimer(self)
+        self.preview_timer.setSingleShot(True)
+        self.preview_timer.setInterval(LIVE_PREVIEW_DEBOUNCE_MS)
+        self.preview_timer.timeout.connect(self.run_preview)
+        self.preview_pending = False
+        
         # 创建中央控件
         central_widget = QWidget()
         self.setCentralWidget(central_widget)
@@ -249,11 +273,22 @@ class MainWindow(QMainWindow):
         canvas_layout = QVBoxLayout(self.canvas_container)
         canvas_layout.addWidget(self.canvas)
         
-        # 聚类数据生成按钮
+        # 聚类数据按钮（生成预设点集、导入/导出点集）
+        self.cluster_data_widget = QWidget()
+        cluster_data_layout = QHBoxLayout(self.cluster_data_widget)
+        cluster_data_layout.setContentsMargins(0, 0, 0, 0)
+        cluster_data_layout.setSpacing(10)
         self.generate_data_btn = QPushButton("🎲 生成预设点集")
         self.generate_data_btn.clicked.connect(self.generate_cluster_data)
-        self.generate_data_btn.hide()
-        canvas_layout.addWidget(self.generate_data_btn)
+        self.import_points_btn = QPushButton("📁 导入点集")
+        self.import_points_btn.clicked.connect(self.import_points)
+        self.export_points_btn = QPushButton("💾 导出点集")
+        self.export_points_btn.clicked.connect(self.export_points)
+        cluster_data_layout.addWidget(self.generate_data_btn)
+        cluster_data_layout.addWidget(self.import_points_btn)
+        cluster_data_layout.addWidget(self.export_points_btn)
+        self.cluster_data_widget.hide()
+        canvas_layout.addWidget(self.cluster_data_widget)
         
         canvas_layout.addStretch()
         
@@ -399,6 +434,94 @@ class MainWindow(QMainWindow):
         self.params_layout.addWidget(heatmap_container)
         heatmap_container.hide() # 初始隐藏
         
+        # 金字塔层数 - 使用子容器
+        pyramid_container = QWidget()
+        pyramid_h_layout = QHBoxLayout(pyramid_container)
+        pyramid_h_layout.setSpacing(10)
+        self.pyramid_label = QLabel("🔺 金字塔层数:")
+        self.pyramid_label.setStyleSheet("color: #34495e; font-weight: bold;")
+        self.pyramid_spinbox = QSpinBox()
+        self.pyramid_spinbox.setMinimum(-1)
+        self.pyramid_spinbox.setSpecialValueText("自动")
+        self.pyramid_spinbox.setMaximum(MAX_PYRAMID_LEVELS)
+        self.pyramid_spinbox.setValue(DEFAULT_PYRAMID_LEVELS)
+        self.pyramid_spinbox.setToolTip("自动：最粗层不超过显示尺寸；0 表示原分辨率整图匹配")
+        pyramid_h_layout.addWidget(self.pyramid_label)
+        pyramid_h_layout.addWidget(self.pyramid_spinbox)
+        self.pyramid_container = pyramid_container
+        self.params_layout.addWidget(pyramid_container)
+        pyramid_container.hide()
+        
+        # 最多匹配数 - 使用子容器
+        max_matches_container = QWidget()
+        max_matches_h_layout = QHBoxLayout(max_matches_container)
+        max_matches_h_layout.setSpacing(10)
+        self.max_matches_label = QLabel("🎯 最多匹配数:")
+        self.max_matches_label.setStyleSheet("color: #34495e; font-weight: bold;")
+        self.max_matches_spinbox = QSpinBox()
+        self.max_matches_spinbox.setMinimum(0)
+        self.max_matches_spinbox.setMaximum(1000)
+        self.max_matches_spinbox.setValue(1)
+        self.max_matches_spinbox.setToolTip("1 表示只取最佳匹配，0 表示不限数量")
+        max_matches_h_layout.addWidget(self.max_matches_label)
+        max_matches_h_layout.addWidget(self.max_matches_spinbox)
+        self.max_matches_container = max_matches_container
+        self.params_layout.addWidget(max_matches_container)
+        max_matches_container.hide()
+        
+        # 多目标匹配得分阈值 - 使用子容器
+        score_threshold_container = QWidget()
+        score_threshold_h_layout = QHBoxLayout(score_threshold_container)
+        score_threshold_h_layout.setSpacing(10)
+        self.score_threshold_label = QLabel("📶 得分阈值:")
+        self.score_threshold_label.setStyleSheet("color: #34495e; font-weight: bold;")
+        self.score_threshold_spinbox = QDoubleSpinBox()
+        self.score_threshold_spinbox.setMinimum(-1.0)
+        self.score_threshold_spinbox.setMaximum(1.0)
+        self.score_threshold_spinbox.setValue(0.8)
+        self.score_threshold_spinbox.setSingleStep(0.05)
+        score_threshold_h_layout.addWidget(self.score_threshold_label)
+        score_threshold_h_layout.addWidget(self.score_threshold_spinbox)
+        self.score_threshold_container = score_threshold_container
+        self.params_layout.addWidget(score_threshold_container)
+        score_threshold_container.hide()
+        
+        # 旋转范围 - 使用子容器
+        rotation_container = QWidget()
+        rotation_h_layout = QHBoxLayout(rotation_container)
+        rotation_h_layout.setSpacing(10)
+        self.rotation_label = QLabel("🔄 旋转范围(±°):")
+        self.rotation_label.setStyleSheet("color: #34495e; font-weight: bold;")
+        self.rotation_spinbox = QDoubleSpinBox()
+        self.rotation_spinbox.setMinimum(0.0)
+        self.rotation_spinbox.setMaximum(180.0)
+        self.rotation_spinbox.setValue(0.0)
+        self.rotation_spinbox.setSingleStep(POSE_ANGLE_STEP)
+        self.rotation_spinbox.setToolTip(f"大于 0 时按 {POSE_ANGLE_STEP}° 步长搜索旋转角度")
+        rotation_h_layout.addWidget(self.rotation_label)
+        rotation_h_layout.addWidget(self.rotation_spinbox)
+        self.rotation_container = rotation_container
+        self.params_layout.addWidget(rotation_container)
+        rotation_container.hide()
+        
+        # 缩放范围 - 使用子容器
+        scale_container = QWidget()
+        scale_h_layout = QHBoxLayout(scale_container)
+        scale_h_layout.setSpacing(10)
+        self.scale_label = QLabel("🔍 缩放范围(±%):")
+        self.scale_label.setStyleSheet("color: #34495e; font-weight: bold;")
+        self.scale_spinbox = QSpinBox()
+        self.scale_spinbox.setMinimum(0)
+        self.scale_spinbox.setMaximum(50)
+        self.scale_spinbox.setValue(0)
+        self.scale_spinbox.setSingleStep(round(POSE_SCALE_STEP * 100))
+        self.scale_spinbox.setToolTip(f"大于 0 时按 {round(POSE_SCALE_STEP * 100)}% 步长搜索缩放比例")
+        scale_h_layout.addWidget(self.scale_label)
+        scale_h_layout.addWidget(self.scale_spinbox)
+        self.scale_container = scale_container
+        self.params_layout.addWidget(scale_container)
+        scale_container.hide()
+        
         # KMeans K值 - 使用子容器
         k_container = QWidget()
         k_h_layout = QHBoxLayout(k_container)
@@ -459,11 +582,27 @@ class MainWindow(QMainWindow):
         run_btn.clicked.connect(self.run_operator)
         middle_content_layout.addWidget(run_btn)
         
+        # 实时预览开关
+        self.live_preview_checkbox = QCheckBox("⚡ 实时预览")
+        self.live_preview_checkbox.setStyleSheet("color: #2c3e50; font-weight: bold;")
+        self.live_preview_checkbox.toggled.connect(self.schedule_preview)
+        middle_content_layout.addWidget(self.live_preview_checkbox)
+        
+        # 参数或画布变化时触发实时预览
+        for spinbox in (self.kernel_spinbox, self.threshold1_spinbox, self.threshold2_spinbox,
+                        self.pyramid_spinbox, self.max_matches_spinbox, self.score_threshold_spinbox,
+                        self.rotation_spinbox, self.scale_spinbox, self.k_spinbox, self.eps_spinbox, self.min_samples_spinbox):
+            spinbox.valueChanged.connect(self.schedule_preview)
+        self.heatmap_checkbox.toggled.connect(self.schedule_preview)
+        self.canvas.image_changed.connect(self.schedule_preview)
+        self.roi_canvas.roi_changed.connect(self.schedule_preview)
+        
         middle_content_layout.addStretch()
         
         # ===== 右侧：结果显示区域 =====
         right_content_layout = QVBoxLayout()
         self.result_display = ResultDisplay(CANVAS_WIDTH, CANVAS_HEIGHT)
+        self.result_ready.connect(self.result_display.set_image)
         right_content_layout.addWidget(self.result_display)
         right_content_layout.addStretch()
         
@@ -504,26 +643,29 @@ class MainWindow(QMainWindow):
         self.is_template_matching = (category == "模板匹配")
         self.is_clustering = (category == "聚类算法")
         
+        # 切换分类后旧任务的结果不再显示
+        self.cancel_operator_jobs()
+        
         # 切换左侧面板
         if self.is_template_matching:
             self.left_label.setText("模板选择（导入图片并指定模板区域）")
             self.left_stack_layout.setCurrentWidget(self.roi_container)
             self.brush_group.hide()
-            self.generate_data_btn.hide()
+            self.cluster_data_widget.hide()
             # 关闭标尺
             self.result_display.set_ruler_visible(False)
             # 清空右侧显示和统计信息
             self.result_display.clear()
             self.update_stats_display({})
         elif self.is_clustering:
-             self.left_label.setText("数据绘制区（点击绘制点集或使用预设）")
+             self.left_label.setText("数据绘制区（左键添加点、右键删除点，或使用预设点集）")
              self.left_stack_layout.setCurrentWidget(self.canvas_container)
              # 启用点绘制模式和聚类模式（白底黑字）
              self.canvas.set_cluster_mode(True)
              self.canvas.set_point_mode(True)
              self.brush_group.setTitle("🎯 点绘制设置")
              self.brush_group.show()
-             self.generate_data_btn.show()
+             self.cluster_data_widget.show()
              # 启用标尺
              self.result_display.set_ruler_visible(True)
              self.result_display.clear()
@@ -532,7 +674,7 @@ class MainWindow(QMainWindow):
             self.left_stack_layout.setCurrentWidget(self.canvas_container)
             self.brush_group.setTitle("🖌️ 笔刷设置")
             self.brush_group.show()
-            self.generate_data_btn.hide()
+            self.cluster_data_widget.hide()
             # 关闭点绘制模式和聚类模式
             self.canvas.set_point_mode(False)
             self.canvas.set_cluster_mode(False)
@@ -541,10 +683,12 @@ class MainWindow(QMainWindow):
         
         self.update_operator_combo()
         self.update_params_display()
+        self.schedule_preview()
     
     def on_operator_changed(self, operator_name):
         """当算子改变时更新参数显示"""
         self.update_params_display()
+        self.schedule_preview()
     
     def update_operator_combo(self):
         """更新算子下拉框"""
@@ -593,6 +737,31 @@ class MainWindow(QMainWindow):
             self.heatmap_container.show()
         else:
             self.heatmap_container.hide()
+        
+        if "pyramid_levels" in required_params:
+            self.pyramid_container.show()
+        else:
+            self.pyramid_container.hide()
+        
+        if "max_matches" in required_params:
+            self.max_matches_container.show()
+        else:
+            self.max_matches_container.hide()
+        
+        if "score_threshold" in required_params:
+            self.score_threshold_container.show()
+        else:
+            self.score_threshold_container.hide()
+        
+        if "rotation_range" in required_params:
+            self.rotation_container.show()
+        else:
+            self.rotation_container.hide()
+        
+        if "scale_range" in required_params:
+            self.scale_container.show()
+        else:
+            self.scale_container.hide()
 
         # KMeans参数
         if "k_value" in required_params:
@@ -637,6 +806,28 @@ class MainWindow(QMainWindow):
     
     def run_operator(self):
         """运行选定的算子"""
+        self.start_operator(interactive=True)
+    
+    def schedule_preview(self, *args):
+        """参数变化时（重新）启动防抖计时器"""
+        if self.live_preview_checkbox.isChecked():
+            self.preview_timer.start()
+    
+    def run_preview(self):
+        """防抖结束后运行实时预览；已有任务在执行时等它结束再运行"""
+        if not self.live_preview_checkbox.isChecked():
+            return
+        if self.jobs_in_flight > 0:
+            self.preview_pending = True
+            return
+        self.preview_pending = False
+        self.start_operator(interactive=False)
+    
+    def start_operator(self, interactive: bool = True):
+        """收集参数并提交选定的算子
+        
+        interactive 为 False 时（实时预览）不弹出提示框
+        """
         try:
             category = self.category_combo.currentText()
             operator_name = self.operator_combo.currentText()
@@ -644,19 +835,24 @@ class MainWindow(QMainWindow):
             # 模板匹配逻辑
             if category == "模板匹配":
                 if self.template_image is None or self.template_image.size == 0:
-                    QMessageBox.warning(self, "警告", "请先指定模板区域")
+                    if interactive:
+                        QMessageBox.warning(self, "警告", "请先指定模板区域")
                     return
                 
                 if self.source_image is None or self.source_image.size == 0:
-                    QMessageBox.warning(self, "警告", "请先导入源图像")
+                    if interactive:
+                        QMessageBox.warning(self, "警告", "请先导入源图像")
                     return
                 
                 show_heatmap = self.heatmap_checkbox.isChecked()
-                operator_func = OPERATORS[category][operator_name]
-                result_image, stats = operator_func(self.source_image, self.template_image, show_heatmap)
-                
-                self.result_display.set_image(result_image)
-                self.update_stats_display(stats)
+                pyramid_levels = self.pyramid_spinbox.value()
+                max_matches = self.max_matches_spinbox.value()
+                score_threshold = self.score_threshold_spinbox.value()
+                operator_func = self.operators[category][operator_name]
+                self.submit_operator(interactive, operator_func, self.source_image, self.template_image, show_heatmap,
+                                     pyramid_levels, max_matches, score_threshold,
+                                     rotation_range=self.rotation_spinbox.value(), angle_step=POSE_ANGLE_STEP,
+                                     scale_range=self.scale_spinbox.value() / 100, scale_step=POSE_SCALE_STEP)
                 return
             
             # 其他算子逻辑
@@ -665,10 +861,11 @@ class MainWindow(QMainWindow):
             
             # if np.sum(input_image) == 255:
             if np.sum(input_image) == 0:
-                QMessageBox.warning(self, "警告", "请先在画布上绘画")
+                if interactive:
+                    QMessageBox.warning(self, "警告", "请先在画布上绘画")
                 return
             
-            operator_func = OPERATORS[category][operator_name]
+            operator_func = self.operators[category][operator_name]
             
             required_params = set()
             if category in OPERATOR_PARAMS:
@@ -686,32 +883,83 @@ class MainWindow(QMainWindow):
             k_value = self.k_spinbox.value()
             eps_value = self.eps_spinbox.value()
             min_samples = self.min_samples_spinbox.value()
+            # 画布上有点坐标时直接交给聚类算子，不再从图像中提取
+            points = self.canvas.get_points() if len(self.canvas.point_set) > 0 else None
             
             if "threshold1" in required_params and "threshold2" in required_params:
-                result_image, stats = operator_func(input_image, threshold1, threshold2)
+                self.submit_operator(interactive, operator_func, input_image, threshold1, threshold2)
             elif "kernel_size" in required_params:
-                result_image, stats = operator_func(input_image, kernel_size)
+                self.submit_operator(interactive, operator_func, input_image, kernel_size)
             elif "k_value" in required_params: # KMeans
-                result_image, stats = operator_func(input_image, k=k_value)
+                # 界面中连续调整 K 时从上一次的中心热启动
+                self.submit_operator(interactive, operator_func, input_image, k=k_value, points=points,
+                                     warm_start=True)
             elif "eps_value" in required_params: # DBSCAN
-                result_image, stats = operator_func(input_image, eps=eps_value, min_samples=min_samples)
+                self.submit_operator(interactive, operator_func, input_image, eps=eps_value, min_samples=min_samples,
+                                     points=points, incremental=points is not None)
             else:
-                result_image, stats = operator_func(input_image, kernel_size)
-            
-            self.result_display.set_image(result_image)
-            self.update_stats_display(stats)
+                self.submit_operator(interactive, operator_func, input_image, kernel_size)
             
         except Exception as e:
             QMessageBox.critical(self, "错误", f"处理过程中出错:\n{str(e)}")
+    
+    def submit_operator(self, interactive: bool, operator_func, *args, **kwargs):
+        """提交算子到后台线程池执行，并取代之前所有未完成的任务"""
+        self.cancel_operator_jobs()
+        self.job_interactive = interactive
+        
+        worker = OperatorWorker(self.job_generation, operator_func, args, kwargs,
+                                is_current=lambda generation: generation == self.job_generation)
+        worker.signals.finished.connect(self.on_operator_finished)
+        worker.signals.failed.connect(self.on_operator_failed)
+        worker.signals.done.connect(self.on_operator_done)
+        self.current_worker = worker
+        self.jobs_in_flight += 1
+        self.thread_pool.start(worker)
+    
+    def cancel_operator_jobs(self):
+        """作废所有已提交的任务
+        
+        尚未开始的旧任务在开始时会直接跳过；已在运行的旧任务完成后其结果会被丢弃
+        """
+        self.job_generation += 1
+    
+    def on_operator_finished(self, generation, result_image, stats):
+        """算子执行完成（GUI 线程）"""
+        if generation != self.job_generation:
+            return
+        cache_info = RESULT_CACHE.info()
+        stats["结果缓存"] = f"命中 {cache_info['命中']} / 未命中 {cache_info['未命中']}"
+        self.result_ready.emit(result_image)
+        self.update_stats_display(stats)
+    
+    def on_operator_failed(self, generation, message):
+        """算子执行出错（GUI 线程）"""
+        if generation != self.job_generation:
+            return
+        if self.job_interactive:
+            QMessageBox.critical(self, "错误", f"处理过程中出错:\n{message}")
+        else:
+            self.update_stats_display({"状态": "错误", "信息": message})
+    
+    def on_operator_done(self, generation):
+        """任务结束后运行被推迟的实时预览"""
+        self.jobs_in_flight -= 1
+        if self.jobs_in_flight == 0 and self.preview_pending:
+            self.run_preview()
+    
+    def closeEvent(self, event):
+        """关闭窗口前等待后台任务结束"""
+        self.preview_timer.stop()
+        self.cancel_operator_jobs()
+        self.thread_pool.waitForDone()
+        super().closeEvent(event)
 
     def generate_cluster_data(self):
         """生成预设的聚类数据（随机点集）"""
         # 使用 numpy 生成一些随机点
         h, w = CANVAS_HEIGHT, CANVAS_WIDTH
         
-        # 创建白色背景图
-        img = np.ones((h, w), dtype=np.uint8) * 255
-        
         points = []
         np.random.seed(None)  # 重置随机种子
         
@@ -727,22 +975,42 @@ class MainWindow(QMainWindow):
         points.append(np.column_stack((x, y)))
         
         all_points = np.vstack(points)
+        # 只保留画布范围内的点
+        inside = (all_points[:, 0] >= 0) & (all_points[:, 0] < w) & (all_points[:, 1] >= 0) & (all_points[:, 1] < h)
         
-        # 使用 OpenCV 在 numpy 数组上绘制点
-        for p in all_points:
-            x, y = int(p[0]), int(p[1])
-            # 确保点在画布范围内
-            if 0 <= x < w and 0 <= y < h:
-                cv2.circle(img, (x, y), 5, 0, -1)  # 黑色实心圆
-        
-        # 使用 set_image_array 设置到画布
-        self.canvas.set_image_array(img)
+        # 点坐标交给画布，画布据此栅格化显示
+        self.canvas.set_points(all_points[inside])
+    
+    def import_points(self):
+        """导入点集（CSV 每行 x,y，或 (N, 2) 的 .npy），坐标单位为画布像素"""
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, "选择点集文件", "", "点集文件 (*.csv *.npy);;所有文件 (*)"
+        )
+        if file_path:
+            try:
+                self.canvas.set_points(load_points(file_path))
+            except Exception as e:
+                QMessageBox.critical(self, "错误", f"加载点集失败:\n{str(e)}")
+    
+    def export_points(self):
+        """导出画布上的点集"""
+        if len(self.canvas.point_set) == 0:
+            QMessageBox.warning(self, "警告", "画布上没有点")
+            return
+        file_path, _ = QFileDialog.getSaveFileName(
+            self, "保存点集", "points.csv", "CSV 文件 (*.csv);;NumPy 数组 (*.npy)"
+        )
+        if file_path:
+            try:
+                save_points(file_path, self.canvas.get_points())
+            except Exception as e:
+                QMessageBox.critical(self, "错误", f"保存点集失败:\n{str(e)}")
     
     def import_template_image(self):
         """导入模板图像"""
         file_path, _ = QFileDialog.getOpenFileName(
             self, "选择模板图像", "",
-            "图像文件 (*.jpg *.jpeg *.png *.bmp *.tiff);;所有文件 (*)"
+            "图像文件 (*.jpg *.jpeg *.png *.bmp *.tiff *.npy *.raw);;所有文件 (*)"
         )
         
         if file_path:
@@ -787,28 +1055,26 @@ class MainWindow(QMainWindow):
         """导入源图像用于匹配"""
         file_path, _ = QFileDialog.getOpenFileName(
             self, "选择源图像", "",
-            "图像文件 (*.jpg *.jpeg *.png *.bmp *.tiff);;所有文件 (*)"
+            "图像文件 (*.jpg *.jpeg *.png *.bmp *.tiff *.npy *.raw);;所有文件 (*)"
         )
         
         if file_path:
             try:
-                # 使用 PIL 读取图像以支持中文路径
-                from PIL import Image
-                pil_image = Image.open(file_path).convert('L')  # 转换为灰度图
-                image = np.array(pil_image)
+                if is_array_file(file_path):
+                    # .npy / .raw 以内存映射方式加载，不经过解码
+                    image = load_array(file_path)
+                else:
+                    # 使用 PIL 读取图像以支持中文路径
+                    from PIL import Image
+                    pil_image = Image.open(file_path).convert('L')  # 转换为灰度图
+                    image = np.array(pil_image)
                 
                 if image is None or image.size == 0:
                     raise ValueError("无法加载图像")
                 
-                # 应用与 ROI 画布相同的缩放逻辑，确保尺寸一致
-                # 如果图像大于 ROI 画布的显示区域，按比例缩放
-                roi_canvas = self.roi_canvas
-                if image.shape[0] > roi_canvas.height or image.shape[1] > roi_canvas.width:
-                    scale = min(roi_canvas.width / image.shape[1], roi_canvas.height / image.shape[0])
-                    new_size = (int(image.shape[1] * scale), int(image.shape[0] * scale))
-                    image = cv2.resize(image, new_size)
-                
+                # 保持原始分辨率作为匹配源，显示时由结果控件缩小
                 self.source_image = image
+                self.cancel_operator_jobs()
                 
                 # 在右侧立即显示导入的源图像
                 self.result_display.set_image(image)
@@ -9,6 +9,7 @@ from PyQt5.QtCore import Qt
 import numpy as np
 import cv2
 from config import RULER_SPACING
+from .image_bridge import array_to_qimage
 
 class ResultDisplay(QWidget):
     """结果显示控件"""
@@ -102,30 +103,16 @@ class ResultDisplay(QWidget):
         if image_array is None:
             return
         
-        # 确保数据是连续的
-        if not image_array.flags['C_CONTIGUOUS']:
-            image_array = np.ascontiguousarray(image_array)
-        
-        height = image_array.shape[0]
-        width = image_array.shape[1]
-        
-        # 处理不同格式的图像
-        if len(image_array.shape) == 2:
-            # 灰度图像 - 需要反转以显示为白底黑字
-            # image_array = 255 - image_array
-            bytes_per_line = width
-            q_image = QImage(image_array.data, width, height, bytes_per_line, QImage.Format_Grayscale8)
-        elif len(image_array.shape) == 3:
-            if image_array.shape[2] == 3:
-                # BGR 彩色图像 - 转换为 RGB 以显示正确的颜色（绿色框）
-                rgb_image = cv2.cvtColor(image_array, cv2.COLOR_BGR2RGB)
-                rgb_image = np.ascontiguousarray(rgb_image)
-                q_image = QImage(rgb_image.data, width, height, 3 * width, QImage.Format_RGB888)
-            else:
-                # BGRA 或其他格式
-                q_image = QImage(image_array.data, width, height, image_array.shape[2] * width, QImage.Format_RGBA8888)
-        else:
+        # 大图先缩小到显示尺寸（仅用于显示），避免整幅转换为 QPixmap
+        if image_array.shape[0] > self.height or image_array.shape[1] > self.width:
+            scale = min(self.width / image_array.shape[1], self.height / image_array.shape[0])
+            new_size = (max(1, round(image_array.shape[1] * scale)), max(1, round(image_array.shape[0] * scale)))
+            image_array = cv2.resize(image_array, new_size, interpolation=cv2.INTER_AREA)
+        
+        # 灰度 / BGR / BGRA 直接按原生格式引用数组内存，不做颜色转换和复制
+        if image_array.ndim not in (2, 3):
             return
+        q_image = array_to_qimage(image_array)
         
         # 缩放到标签大小
         pixmap = QPixmap.fromImage(q_image)
@@ -1,14 +1,19 @@
 """
 ROI（感兴趣区域）选择画布
-用于图像导入和矩形框选择
+用于图像导入和矩形框选择。
+图像以原始分辨率保存用于处理，显示时使用单独缓存的缩小副本，ROI 坐标映射回原始像素。
 """
 
+import math
+
 from PyQt5.QtWidgets import QWidget
 from PyQt5.QtGui import QImage, QPixmap, QPainter, QPen, QColor
 from PyQt5.QtCore import Qt, pyqtSignal, QPoint, QRect
 import numpy as np
 import cv2
 from PIL import Image
+from operators.image_io import is_array_file, load_array
+from .image_bridge import array_to_qimage
 
 
 class ROICanvas(QWidget):
@@ -21,7 +26,7 @@ class ROICanvas(QWidget):
         self.width = width
         self.height = height
         
-        # 原始图像
+        # 原始分辨率图像（处理用）和缓存的显示副本
         self.original_image = None
         self.display_pixmap = None
         
@@ -43,41 +48,49 @@ class ROICanvas(QWidget):
     def load_image(self, image_path: str):
         """加载图像"""
         try:
-            # 使用 PIL 读取图像以支持中文路径
-            pil_image = Image.open(image_path).convert('L')  # 转换为灰度图
-            image = np.array(pil_image)
+            if is_array_file(image_path):
+                # .npy / .raw 以内存映射方式加载，不经过解码
+                image = load_array(image_path)
+            else:
+                # 使用 PIL 读取图像以支持中文路径
+                pil_image = Image.open(image_path).convert('L')  # 转换为灰度图
+                image = np.array(pil_image)
         except Exception as e:
             raise ValueError(f"无法加载图像: {str(e)}")
         
-        # 缩放图像到指定大小
-        if image.shape[0] > self.height or image.shape[1] > self.width:
-            scale = min(self.width / image.shape[1], self.height / image.shape[0])
-            new_size = (int(image.shape[1] * scale), int(image.shape[0] * scale))
-            image = cv2.resize(image, new_size)
-        
-        self.original_image = image
-        self.roi_rect = None  # 重置 ROI
-        self.display_pixmap = None
-        self.update()
-        self.roi_changed.emit()
+        self._set_image(image)
     
     def load_image_array(self, image_array: np.ndarray):
         """从 NumPy 数组加载图像"""
         if len(image_array.shape) != 2:
             raise ValueError("仅支持灰度图像")
         
-        # 缩放图像到指定大小
-        if image_array.shape[0] > self.height or image_array.shape[1] > self.width:
-            scale = min(self.width / image_array.shape[1], self.height / image_array.shape[0])
-            new_size = (int(image_array.shape[1] * scale), int(image_array.shape[0] * scale))
-            image_array = cv2.resize(image_array, new_size)
+        self._set_image(image_array)
+    
+    def _set_image(self, image: np.ndarray):
+        """保存原始分辨率图像，并生成缓存的显示副本"""
+        self.original_image = image
+        self.display_pixmap = self._build_display_pixmap(image)
+        
+        # 显示信息：居中偏移和 显示像素 / 原始像素 的比例
+        self.display_offset_x = (self.width - self.display_pixmap.width()) // 2
+        self.display_offset_y = (self.height - self.display_pixmap.height()) // 2
+        self.display_scale = self.display_pixmap.width() / image.shape[1]
         
-        self.original_image = image_array
-        self.roi_rect = None
-        self.display_pixmap = None
+        self.roi_rect = None  # 重置 ROI
         self.update()
         self.roi_changed.emit()
     
+    def _build_display_pixmap(self, image: np.ndarray) -> QPixmap:
+        """生成适应画布大小的显示副本；大图先用 INTER_AREA 缩小，避免整幅转换为 QPixmap"""
+        h, w = image.shape[:2]
+        if h > self.height or w > self.width:
+            scale = min(self.width / w, self.height / h)
+            new_size = (max(1, round(w * scale)), max(1, round(h * scale)))
+            image = cv2.resize(image, new_size, interpolation=cv2.INTER_AREA)
+        pixmap = QPixmap.fromImage(array_to_qimage(image))
+        return pixmap.scaled(self.width, self.height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+    
     def mousePressEvent(self, event):
         """鼠标按下事件"""
         if self.original_image is None or not self.drawing_enabled:
@@ -117,64 +130,40 @@ class ROICanvas(QWidget):
             painter.drawText(self.rect(), Qt.AlignCenter, "点击 '导入图片' 加载图像")
             return
         
-        # 转换图像为 QImage 并显示
-        if len(self.original_image.shape) == 2:
-            h, w = self.original_image.shape
-            bytes_per_line = w
-            q_image = QImage(self.original_image.data, w, h, bytes_per_line, QImage.Format_Grayscale8)
-        
-        pixmap = QPixmap.fromImage(q_image)
-        scaled_pixmap = pixmap.scaled(self.width, self.height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        
-        # 计算实际显示位置（考虑 KeepAspectRatio 导致的偏移）
-        x_offset = (self.width - scaled_pixmap.width()) // 2
-        y_offset = (self.height - scaled_pixmap.height()) // 2
-        
-        painter.drawPixmap(x_offset, y_offset, scaled_pixmap)
-        
-        # 保存显示信息供 get_roi_image 使用
-        self.display_offset_x = x_offset
-        self.display_offset_y = y_offset
-        self.display_scale = scaled_pixmap.width() / self.original_image.shape[1]
+        # 显示缓存的缩放副本（居中，考虑 KeepAspectRatio 导致的偏移）
+        painter.drawPixmap(self.display_offset_x, self.display_offset_y, self.display_pixmap)
         
         # 绘制 ROI 矩形框
         if self.roi_rect:
             painter.setPen(QPen(QColor(255, 0, 0), 2))
             painter.drawRect(self.roi_rect)
     
-    def get_roi_image(self) -> np.ndarray:
-        """获取 ROI 区域的图像"""
+    def get_roi_bounds(self):
+        """ROI 在原始图像中的像素范围 (x1, y1, x2, y2)，右/下边界不包含；无有效 ROI 时返回 None"""
         if self.original_image is None or self.roi_rect is None or self.roi_rect.width() <= 0 or self.roi_rect.height() <= 0:
             return None
         
-        # 获取原始图像尺寸
-        if len(self.original_image.shape) == 2:
-            h, w = self.original_image.shape
-        else:
-            h, w = self.original_image.shape[:2]
-        
-        # 使用保存的显示信息进行坐标转换
-        # 如果还没有绘制过，先计算显示参数
-        if not hasattr(self, 'display_scale'):
-            # 计算缩放因子
-            scale_x = min(self.width / w, self.height / h)
-            self.display_scale = scale_x
-            self.display_offset_x = (self.width - int(w * scale_x)) // 2
-            self.display_offset_y = (self.height - int(h * scale_x)) // 2
-        
-        # 将屏幕坐标转换回原始图像坐标
-        # 先移除显示偏移，再除以缩放因子
-        x1 = max(0, int((self.roi_rect.left() - self.display_offset_x) / self.display_scale))
-        y1 = max(0, int((self.roi_rect.top() - self.display_offset_y) / self.display_scale))
-        x2 = min(w, int((self.roi_rect.right() - self.display_offset_x) / self.display_scale))
-        y2 = min(h, int((self.roi_rect.bottom() - self.display_offset_y) / self.display_scale))
+        h, w = self.original_image.shape[:2]
+        
+        # 将屏幕坐标转换回原始图像坐标：先移除显示偏移，再除以缩放因子；
+        # 左上角向下取整、右下角向上取整，使 ROI 覆盖框选到的全部原始像素
+        x1 = max(0, math.floor((self.roi_rect.left() - self.display_offset_x) / self.display_scale))
+        y1 = max(0, math.floor((self.roi_rect.top() - self.display_offset_y) / self.display_scale))
+        x2 = min(w, math.ceil((self.roi_rect.right() + 1 - self.display_offset_x) / self.display_scale))
+        y2 = min(h, math.ceil((self.roi_rect.bottom() + 1 - self.display_offset_y) / self.display_scale))
         
         # 确保坐标有效
         if x1 >= x2 or y1 >= y2:
             return None
-        
-        roi_image = self.original_image[y1:y2, x1:x2]
-        return roi_image
+        return x1, y1, x2, y2
+    
+    def get_roi_image(self) -> np.ndarray:
+        """获取 ROI 区域的图像（原始分辨率）"""
+        bounds = self.get_roi_bounds()
+        if bounds is None:
+            return None
+        x1, y1, x2, y2 = bounds
+        return self.original_image[y1:y2, x1:x2]
     
     def get_image_array(self) -> np.ndarray:
         """获取整个图像"""
@@ -0,0 +1,42 @@
+"""
+后台算子执行
+在 QThreadPool 中运行算子，避免阻塞 GUI 线程
+"""
+
+from PyQt5.QtCore import QObject, QRunnable, pyqtSignal
+
+
+class WorkerSignals(QObject):
+    """工作线程信号（在 GUI 线程中创建，跨线程发射时自动排队）"""
+
+    finished = pyqtSignal(int, object, object)  # 任务代号, 结果图像, 统计信息
+    failed = pyqtSignal(int, str)  # 任务代号, 错误信息
+    done = pyqtSignal(int)  # 任务结束（包括被跳过的过期任务）
+
+
+class OperatorWorker(QRunnable):
+    """算子任务"""
+
+    def __init__(self, generation: int, func, args=(), kwargs=None, is_current=None):
+        super().__init__()
+        self.generation = generation
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs or {}
+        # 用于判断任务是否已被新任务取代，开始执行前被取代的任务直接丢弃
+        self.is_current = is_current
+        self.signals = WorkerSignals()
+
+    def run(self):
+        """在线程池中执行算子"""
+        try:
+            if self.is_current is not None and not self.is_current(self.generation):
+                return
+            try:
+                result_image, stats = self.func(*self.args, **self.kwargs)
+            except Exception as e:
+                self.signals.failed.emit(self.generation, str(e))
+            else:
+                self.signals.finished.emit(self.generation, result_image, stats)
+        finally:
+            self.signals.done.emit(self.generation)